@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.core import checks
+from django.db.backends.signals import connection_created
 
 
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        # Registers the cache-invalidation signal handlers
+        from . import signals  # noqa: F401
+        from .db import configure_sqlite
+        from .metrics import add_query_wrapper
+        from .spoonacular import check_api_key
+
+        connection_created.connect(configure_sqlite, dispatch_uid='api.configure_sqlite')
+        connection_created.connect(add_query_wrapper, dispatch_uid='api.metrics')
+        checks.register(check_api_key)
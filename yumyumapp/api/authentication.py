@@ -0,0 +1,139 @@
+"""
+Token authentication with a cache in front of the authtoken table.
+
+DRF's TokenAuthentication joins authtoken_token and auth_user on every
+request. CachedTokenAuthentication keeps the result of that join in a
+TieredCache keyed by token key, as plain field values. The password hash is
+left out: on a cached user it is a deferred field, loaded from the database
+only if something reads it.
+
+An entry is dropped as soon as its token is deleted (logout, rotation) or its
+user is saved (deactivation, profile changes); see api.signals. That can
+only reach the shared tier of other workers, not their process memory, so
+tokens are kept in the shared tier alone unless TOKEN_AUTH["LOCAL_TTL"]
+accepts revoked tokens in other workers for that many seconds. The shared
+tier must be shared for revocation to reach every worker (Redis, Memcached;
+LocMem is per process).
+
+TOKEN_AUTH["EXPIRY"] limits the lifetime of a token. Expiry is checked on
+every request, cache hits included, so a cached entry never outlives its
+token. Expired tokens are deleted and login hands out a fresh one
+(rotate_token).
+"""
+import datetime
+import functools
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .cache import TieredCache
+
+_cache_settings = getattr(settings, 'TOKEN_AUTH', {})
+
+_local_ttl = _cache_settings.get('LOCAL_TTL', 0)
+
+token_cache = TieredCache(
+    'auth-tokens',
+    maxsize=_cache_settings.get('LOCAL_MAXSIZE', 4096) if _local_ttl else 0,  # 0: no in-process tier
+    ttl=_local_ttl,
+    alias=_cache_settings.get('ALIAS', 'default'),
+    shared_ttl=_cache_settings.get('TTL', 60 * 5),
+)
+
+
+def _token_setting(name):
+    # Read on every call rather than at import, so tests can override them
+    return getattr(settings, 'TOKEN_AUTH', {}).get(name)
+
+
+def token_expired(token):
+    expiry = _token_setting('EXPIRY')
+    return expiry is not None and token.created + datetime.timedelta(seconds=expiry) <= timezone.now()
+
+
+def token_needs_rotation(token):
+    """
+    Whether login should replace the token: it expired or is older than TOKEN_AUTH["ROTATE_AFTER"].
+    """
+    rotate_after = _token_setting('ROTATE_AFTER')
+    if rotate_after is not None and token.created + datetime.timedelta(seconds=rotate_after) <= timezone.now():
+        return True
+    return token_expired(token)
+
+
+def rotate_token(user):
+    """
+    Replace the user's token with one under a new key. The old key stops working immediately.
+    """
+    with transaction.atomic():
+        Token.objects.filter(user=user).delete()
+        return Token.objects.create(user=user)
+
+
+@functools.cache
+def _user_fields():
+    User = get_user_model()
+    return tuple(field.attname for field in User._meta.concrete_fields if field.attname != 'password')
+
+
+def _cache_entry(token):
+    return {
+        'user': [getattr(token.user, name) for name in _user_fields()],
+        'created': token.created,
+    }
+
+
+def _from_cache_entry(key, entry):
+    User = get_user_model()
+    user = User.from_db(router.db_for_read(User), _user_fields(), entry['user'])
+    token = Token.from_db(router.db_for_read(Token), ['key', 'user_id', 'created'], [key, user.pk, entry['created']])
+    token.user = user
+    return user, token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that skips the database when the token is cached, and enforces TOKEN_AUTH["EXPIRY"].
+    """
+
+    def authenticate_credentials(self, key):
+        entry = token_cache.get(key)
+        if entry is None:
+            # Raises AuthenticationFailed for unknown keys and inactive users
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, _cache_entry(token))
+        else:
+            user, token = _from_cache_entry(key, entry)
+
+        if token_expired(token):
+            token.delete()
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        return user, token
+
+
+async def aget_token_user(key):
+    """
+    Async counterpart for the ASGI views: the active user owning the token, or None.
+    """
+    entry = await token_cache.aget(key)
+    if entry is None:
+        try:
+            token = await Token.objects.select_related('user').aget(key=key)
+        except Token.DoesNotExist:
+            return None
+        if not token.user.is_active:
+            return None
+        await token_cache.aset(key, _cache_entry(token))
+    else:
+        _, token = _from_cache_entry(key, entry)
+
+    if token_expired(token):
+        await token.adelete()
+        return None
+    return token.user
@@ -0,0 +1,339 @@
+"""
+Caching helpers shared by the API views.
+
+``LRUCache`` is a small thread-safe in-process LRU with per-entry expiry.
+``TieredCache`` puts one in front of a Django cache alias, so a lookup is
+answered from process memory first, then from the shared backend (LocMem,
+Redis, Memcached, ... whatever ``CACHES`` points at), and only then misses.
+``SingleFlight`` makes concurrent misses for the same key wait for one
+computation instead of each running their own.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+# Sentinel so that falsy values (empty lists, 0) can still be cached
+MISSING = object()
+
+# Every TieredCache registers itself here so stats and resets can reach them
+_registry = {}
+
+
+class LRUCache:
+    """
+    Bounded, thread-safe LRU mapping whose entries also expire after ``ttl`` seconds.
+    """
+
+    def __init__(self, maxsize=256, ttl=300, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key) is not MISSING
+
+
+class TieredCache:
+    """
+    In-process LRU in front of a shared Django cache, with hit/miss counters.
+
+    Values written here are pickled by the shared tier, so they should be plain
+    data (dicts, lists, strings, numbers).
+    """
+
+    def __init__(self, name, maxsize=256, ttl=300, alias='default', shared_ttl=None):
+        self.name = name
+        self.alias = alias
+        self.ttl = ttl
+        self.shared_ttl = ttl if shared_ttl is None else shared_ttl
+        self.local = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'sets': 0}
+        _registry[name] = self
+
+    @property
+    def shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def _key(self, key):
+        return f'{self.name}:{key}'
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def get(self, key, default=None):
+        value = self.local.get(key)
+        if value is not MISSING:
+            self._count('local_hits')
+            return value
+
+        if self.shared is not None:
+            value = self.shared.get(self._key(key), MISSING)
+            if value is not MISSING:
+                # Promote into the local tier so the next lookup skips the backend
+                self.local.set(key, value)
+                self._count('shared_hits')
+                return value
+
+        self._count('misses')
+        return default
+
+    def set(self, key, value, ttl=None):
+        self.local.set(key, value, ttl=ttl)
+        if self.shared is not None:
+            self.shared.set(self._key(key), value, self.shared_ttl if ttl is None else ttl)
+        self._count('sets')
+
+    async def aget(self, key, default=None):
+        """
+        Like get(), but uses the async API of the shared tier.
+        """
+        value = self.local.get(key)
+        if value is not MISSING:
+            self._count('local_hits')
+            return value
+
+        if self.shared is not None:
+            value = await self.shared.aget(self._key(key), MISSING)
+            if value is not MISSING:
+                self.local.set(key, value)
+                self._count('shared_hits')
+                return value
+
+        self._count('misses')
+        return default
+
+    async def aset(self, key, value, ttl=None):
+        self.local.set(key, value, ttl=ttl)
+        if self.shared is not None:
+            await self.shared.aset(self._key(key), value, self.shared_ttl if ttl is None else ttl)
+        self._count('sets')
+
+    def shared_get(self, key, default=None):
+        """
+        The value in the shared tier, skipping the local one: what other
+        processes wrote since this one cached its own copy. Found, it replaces
+        the local copy.
+        """
+        if self.shared is None:
+            value = self.local.get(key)
+            return default if value is MISSING else value
+        value = self.shared.get(self._key(key), MISSING)
+        if value is MISSING:
+            return default
+        self.local.set(key, value)
+        return value
+
+    async def ashared_get(self, key, default=None):
+        """
+        Like shared_get(), but uses the async API of the shared tier.
+        """
+        if self.shared is None:
+            value = self.local.get(key)
+            return default if value is MISSING else value
+        value = await self.shared.aget(self._key(key), MISSING)
+        if value is MISSING:
+            return default
+        self.local.set(key, value)
+        return value
+
+    def delete(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(self._key(key))
+
+    def clear_local(self):
+        self.local.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        hits = stats['local_hits'] + stats['shared_hits']
+        lookups = hits + stats['misses']
+        stats['hits'] = hits
+        stats['hit_rate'] = hits / lookups if lookups else 0.0
+        stats['local_size'] = len(self.local)
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            for stat in self._stats:
+                self._stats[stat] = 0
+
+
+def get_cache_stats():
+    """
+    Hit/miss counters for every registered TieredCache, keyed by cache name.
+    """
+    return {name: cache.stats() for name, cache in _registry.items()}
+
+
+def reset_caches():
+    """
+    Empty the in-process tiers and zero the counters of every TieredCache.
+    The shared tiers are left alone; clear those through django.core.cache.
+    """
+    for cache in _registry.values():
+        cache.clear_local()
+        cache.reset_stats()
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs one computation at a time per key; concurrent callers share its result.
+
+    Within the process, callers of do() that find a computation of their key
+    in flight wait for it and get its result (or its exception). ado() does
+    the same for coroutines on one event loop; the two don't wait for each
+    other. Across processes, the computing caller holds a lock in the shared
+    cache (``alias``, taken with cache.add). Callers in other processes poll
+    ``lookup`` meanwhile and return what it finds; they compute the value
+    themselves only when the lock is released without one, or after
+    ``timeout`` seconds (which is also how long a crashed holder blocks them).
+    """
+
+    def __init__(self, name, alias='default', timeout=15, poll_interval=0.05):
+        self.name = name
+        self.alias = alias
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = {}
+
+    @property
+    def shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def _lock_key(self, key):
+        return f'{self.name}:lock:{key}'
+
+    def do(self, key, compute, lookup=None):
+        """
+        ``compute()``, unless a call for ``key`` is already computing it. ``lookup()``
+        returns the value once another process has stored it, None until then.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._compute_locked(key, compute, lookup)
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _compute_locked(self, key, compute, lookup):
+        shared = self.shared
+        if shared is None:
+            return compute()
+        lock_key = self._lock_key(key)
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        while not shared.add(lock_key, True, self.timeout):
+            # Another process is computing it
+            waited = True
+            value = lookup() if lookup is not None else None
+            if value is not None:
+                return value
+            if time.monotonic() >= deadline:
+                return compute()
+            time.sleep(self.poll_interval)
+        try:
+            # The holder may have stored the value just before releasing the lock
+            value = lookup() if waited and lookup is not None else None
+            return compute() if value is None else value
+        finally:
+            shared.delete(lock_key)
+
+    async def ado(self, key, compute, lookup=None):
+        """
+        Async do(): ``compute`` and ``lookup`` are coroutine functions.
+        """
+        task_key = (asyncio.get_running_loop(), key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            if task is None:
+                task = self._tasks[task_key] = asyncio.ensure_future(self._acompute_locked(key, compute, lookup))
+                task.add_done_callback(lambda _: self._tasks.pop(task_key, None))
+        # A cancelled caller doesn't cancel the computation the others wait for
+        return await asyncio.shield(task)
+
+    async def _acompute_locked(self, key, compute, lookup):
+        shared = self.shared
+        if shared is None:
+            return await compute()
+        lock_key = self._lock_key(key)
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        while not await shared.aadd(lock_key, True, self.timeout):
+            waited = True
+            value = await lookup() if lookup is not None else None
+            if value is not None:
+                return value
+            if time.monotonic() >= deadline:
+                return await compute()
+            await asyncio.sleep(self.poll_interval)
+        try:
+            value = await lookup() if waited and lookup is not None else None
+            return await compute() if value is None else value
+        finally:
+            await shared.adelete(lock_key)
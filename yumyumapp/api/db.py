@@ -0,0 +1,51 @@
+"""
+Connection setup for SQLite.
+
+configure_sqlite runs on every new SQLite connection (connection_created,
+connected in ApiConfig.ready) and applies settings.SQLITE_PRAGMAS:
+  - journal_mode=wal: readers no longer block behind a writer, nor it
+    behind them.
+  - busy_timeout: a writer waits this many milliseconds for the write
+    lock instead of failing with "database is locked".
+  - synchronous=normal: with WAL, commits skip an fsync; the database stays
+    consistent, a power loss may drop the last transactions.
+  - mmap_size, cache_size, temp_store: memory for reads and temporary
+    tables.
+Together with the "IMMEDIATE" transaction mode (DATABASES OPTIONS), which
+takes the write lock when a transaction starts rather than failing when a
+read lock can't be upgraded, and persistent connections (CONN_MAX_AGE),
+which run this once per connection rather than per request.
+"""
+import re
+
+from django.conf import settings
+
+_VALUE = re.compile(r'-?\d+|\w+')
+
+
+def sqlite_pragmas():
+    """
+    The PRAGMA statements for settings.SQLITE_PRAGMAS, in order.
+    """
+    statements = []
+    for name, value in (getattr(settings, 'SQLITE_PRAGMAS', None) or {}).items():
+        if value is None:
+            continue
+        value = str(value)
+        if not name.isidentifier() or not _VALUE.fullmatch(value):
+            raise ValueError(f'Invalid SQLite pragma: {name}={value!r}')
+        statements.append(f'PRAGMA {name} = {value}')
+    return statements
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    # On the DB-API connection: these are connection setup, not queries of
+    # the request that happened to open it (see api.metrics)
+    cursor = connection.connection.cursor()
+    try:
+        for statement in sqlite_pragmas():
+            cursor.execute(statement)
+    finally:
+        cursor.close()
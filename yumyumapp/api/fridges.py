@@ -0,0 +1,160 @@
+"""
+Per-user cache of the serialized default fridge returned by view_fridge.
+
+Payloads live in a TieredCache under "<user id>:<generation>". The generation
+is a random token kept in the shared cache; every fridge mutation replaces
+it, which orphans the old payload in every process at once (the in-process
+tiers of other workers included). A hot read is two cache lookups and no
+database queries.
+
+Invalidation happens immediately and once more when the surrounding
+transaction commits, so a reader that raced the write cannot leave a payload
+built from pre-commit data under the new generation.
+
+Each mutation also bumps Fridge.version in the database. "<fridge id>-<version>"
+is the fridge's strong ETag, so a conditional GET can be answered from the
+fridge row alone.
+
+The id of each user's default fridge is cached too (it is created at
+registration and practically never changes), so the item endpoints filter
+by fridge_id without a round-trip to the fridge table.
+"""
+import contextvars
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.utils.http import quote_etag
+
+from .cache import TieredCache
+from .models import Fridge
+from .precompute import schedule_recompute
+from .routers import pin_primary
+
+_cache_settings = getattr(settings, 'FRIDGE_CACHE', {})
+
+fridge_cache = TieredCache(
+    'fridge',
+    maxsize=_cache_settings.get('LOCAL_MAXSIZE', 1024),
+    ttl=_cache_settings.get('TTL', 60 * 5),
+    alias=_cache_settings.get('ALIAS', 'default'),
+)
+
+DEFAULT_FRIDGE_NAME = 'Main Fridge'
+
+# user id -> id of their default fridge. The short in-process TTL bounds how long
+# another worker keeps using the id of a default fridge that was deleted or renamed.
+default_fridge_ids = TieredCache(
+    'default-fridge-ids',
+    maxsize=_cache_settings.get('LOCAL_MAXSIZE', 1024),
+    ttl=_cache_settings.get('DEFAULT_ID_LOCAL_TTL', 60),
+    alias=_cache_settings.get('ALIAS', 'default'),
+    shared_ttl=_cache_settings.get('DEFAULT_ID_TTL', 60 * 60 * 24),
+)
+
+
+def _generation_key(user_id):
+    return f'fridge-generation:{user_id}'
+
+
+def fridge_cache_key(user_id):
+    """
+    Key of the user's current cached fridge payload.
+    """
+    shared = caches[fridge_cache.alias]
+    key = _generation_key(user_id)
+    generation = shared.get(key)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        if not shared.add(key, generation, None):
+            # Another request created it first
+            generation = shared.get(key, generation)
+    return f'{user_id}:{generation}'
+
+
+def _bump_generation(user_id):
+    caches[fridge_cache.alias].set(_generation_key(user_id), uuid.uuid4().hex, None)
+
+
+def invalidate_fridge_cache(user_id):
+    """
+    Drop the user's cached fridge now and again after the current transaction commits.
+    """
+    _bump_generation(user_id)
+    pin_primary(user_id)
+    transaction.on_commit(lambda: (_bump_generation(user_id), pin_primary(user_id)))
+
+
+def fridge_etag(fridge):
+    """
+    Strong ETag of the fridge's serialized contents.
+    """
+    return quote_etag(f'{fridge.pk}-{fridge.version}')
+
+
+# Fridges whose per-item change signals are ignored in the current context
+_deferred_fridges = contextvars.ContextVar('deferred_fridges', default=frozenset())
+
+
+@contextmanager
+def deferred_fridge_changes(fridge_id):
+    """
+    Ignore the item signals of the fridge inside the block, so that deleting
+    many items doesn't bump its version once per item. The caller calls
+    fridge_changed() once afterwards.
+    """
+    token = _deferred_fridges.set(_deferred_fridges.get() | {fridge_id})
+    try:
+        yield
+    finally:
+        _deferred_fridges.reset(token)
+
+
+def fridge_changes_deferred(fridge_id):
+    return fridge_id in _deferred_fridges.get()
+
+
+def fridge_changed(fridge_id, user_id=None):
+    """
+    Record a change to the fridge or its items: bump its version, drop the
+    owner's cached payload and have its recipes searched in the background.
+    """
+    Fridge.objects.filter(pk=fridge_id).update(version=F('version') + 1)
+    if user_id is None:
+        user_id = Fridge.objects.filter(pk=fridge_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        invalidate_fridge_cache(user_id)
+    schedule_recompute(fridge_id)
+
+
+def get_default_fridge(user):
+    """
+    The user's default Fridge, fetched by its cached id. Looked up by name when
+    the id isn't cached (or is stale), and created for accounts that predate
+    provisioning at registration.
+    """
+    fridge_id = default_fridge_ids.get(user.id)
+    if fridge_id is not None:
+        fridge = Fridge.objects.filter(pk=fridge_id, name=DEFAULT_FRIDGE_NAME).first()
+        if fridge is not None:
+            return fridge
+    fridge, _ = Fridge.objects.get_or_create(user=user, name=DEFAULT_FRIDGE_NAME)
+    default_fridge_ids.set(user.id, fridge.pk)
+    return fridge
+
+
+def default_fridge_id(user):
+    """
+    Id of the user's default fridge; no query once it is cached.
+    """
+    fridge_id = default_fridge_ids.get(user.id)
+    if fridge_id is None:
+        fridge_id = get_default_fridge(user).pk
+    return fridge_id
+
+
+def forget_default_fridge(user_id):
+    default_fridge_ids.delete(user_id)
@@ -0,0 +1,28 @@
+"""
+Password hashers with their cost taken from settings.PASSWORD_HASHING.
+
+Each class keeps the algorithm name of the Django hasher it extends, so
+existing hashes stay valid. Changing a cost makes must_update() true for
+hashes made with the old one, and they are re-hashed at the next login
+(User.check_password), as are hashes made by any hasher other than the
+first one in PASSWORD_HASHERS. Costs left unset keep Django's defaults.
+
+Argon2 needs argon2-cffi (``pip install argon2-cffi``).
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+
+_costs = getattr(settings, 'PASSWORD_HASHING', {})
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    iterations = _costs.get('PBKDF2_ITERATIONS') or hashers.PBKDF2PasswordHasher.iterations
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    work_factor = _costs.get('SCRYPT_WORK_FACTOR') or hashers.ScryptPasswordHasher.work_factor
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    time_cost = _costs.get('ARGON2_TIME_COST') or hashers.Argon2PasswordHasher.time_cost
+    memory_cost = _costs.get('ARGON2_MEMORY_COST') or hashers.Argon2PasswordHasher.memory_cost
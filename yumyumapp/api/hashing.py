@@ -0,0 +1,83 @@
+"""
+Password hashing off the request threads.
+
+Hashing a password takes hundreds of milliseconds of CPU. Done inline, a flood
+of login attempts occupies every request thread and core, and fridge reads
+queue behind it. HashingPool runs the hashing on a few dedicated threads
+(hashlib's PBKDF2 and scrypt and argon2-cffi release the GIL) and admits a
+bounded number of jobs: beyond WORKERS running and MAX_PENDING waiting,
+run() raises PoolSaturated and the view answers 429 with Retry-After.
+
+Workers only compute hashes; reading and saving the user stays on the
+request thread and its database connection.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+_settings = getattr(settings, 'PASSWORD_HASHING', {})
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+class HashingPool:
+    def __init__(self, workers, max_pending, retry_after):
+        self.workers = workers
+        self.limit = workers + max_pending
+        self.retry_after = retry_after
+        self.pending = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def run(self, fn, *args):
+        """
+        Call fn(*args) on a pool thread and wait for its result.
+        Raises PoolSaturated instead of queueing beyond the limit.
+        """
+        with self._lock:
+            if self.pending >= self.limit:
+                self.rejected += 1
+                raise PoolSaturated
+            self.pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hashing')
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+
+hashing_pool = HashingPool(
+    workers=_settings.get('WORKERS') or max(1, (os.cpu_count() or 2) // 2),
+    max_pending=_settings.get('MAX_PENDING', 16),
+    retry_after=_settings.get('RETRY_AFTER', 1),
+)
+
+
+def _check(password, encoded):
+    rehashed = []
+    valid = check_password(password, encoded, setter=lambda raw: rehashed.append(make_password(raw)))
+    return valid, rehashed[0] if rehashed else None
+
+
+def verify_password(user, password):
+    """
+    user.check_password(password) with the hashing done on the pool, including
+    the re-hash with the preferred hasher when the stored hash is outdated.
+    """
+    valid, rehashed = hashing_pool.run(_check, password, user.password)
+    if rehashed is not None:
+        user.password = rehashed
+        user.save(update_fields=['password'])
+    return valid
+
+
+def hash_password(password):
+    return hashing_pool.run(make_password, password)
@@ -0,0 +1,31 @@
+"""
+Give every existing user the default fridge ("Main Fridge") that register_view
+now creates at sign-up. Users who already have one are left alone, so the
+command can be re-run safely.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from api.fridges import DEFAULT_FRIDGE_NAME
+from api.models import Fridge
+
+
+class Command(BaseCommand):
+    help = 'Create the default fridge of every user who has none.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Fridges inserted per query')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        user_ids = list(
+            get_user_model().objects.exclude(fridge_units__name=DEFAULT_FRIDGE_NAME)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        for start in range(0, len(user_ids), batch_size):
+            Fridge.objects.bulk_create(
+                [Fridge(user_id=user_id, name=DEFAULT_FRIDGE_NAME) for user_id in user_ids[start:start + batch_size]],
+                # A user registering meanwhile already has one
+                ignore_conflicts=True,
+            )
+        self.stdout.write(f'Created {len(user_ids)} default fridges.')
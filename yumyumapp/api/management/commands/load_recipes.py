@@ -0,0 +1,150 @@
+"""
+Bulk-load a recipe dataset into the local catalog used when RECIPE_SOURCE is
+"local" or "local_fallback".
+
+JSON: a list of recipes (or {"recipes": [...]}) in Spoonacular's shape:
+
+    [{"id": 1, "title": "Omelette", "image": "...", "likes": 3,
+      "ingredients": ["eggs", {"name": "milk", "amount": 0.5, "unit": "cup"}]}]
+
+("extendedIngredients" is accepted in place of "ingredients".)
+
+CSV: one row per ingredient with the columns
+recipe_id,title,ingredient and optionally image,image_type,likes,amount,unit,original.
+"""
+import csv
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import Recipe, RecipeIngredient
+from api.recipe_index import invalidate_recipe_index
+from api.utils import normalize_name
+
+RECIPE_FIELDS = ['title', 'image', 'image_type', 'likes']
+
+
+def _float_or_none(value):
+    if value in (None, ''):
+        return None
+    return float(value)
+
+
+def _ingredient(raw):
+    if isinstance(raw, str):
+        raw = {'name': raw}
+    name = str(raw.get('name') or raw.get('nameClean') or '').strip()
+    return {
+        'name': name,
+        'amount': _float_or_none(raw.get('amount')),
+        'unit': raw.get('unit') or '',
+        'original': raw.get('original') or '',
+    }
+
+
+def read_json(path):
+    with open(path, encoding='utf-8') as handle:
+        data = json.load(handle)
+    if isinstance(data, dict):
+        data = data.get('recipes', [])
+    for raw in data:
+        yield {
+            'external_id': int(raw['id']),
+            'title': raw['title'],
+            'image': raw.get('image') or '',
+            'image_type': raw.get('imageType') or '',
+            'likes': int(raw.get('likes') or 0),
+            'ingredients': [_ingredient(item) for item in raw.get('ingredients', raw.get('extendedIngredients', []))],
+        }
+
+
+def read_csv(path):
+    recipes = {}
+    with open(path, encoding='utf-8', newline='') as handle:
+        for row in csv.DictReader(handle):
+            external_id = int(row['recipe_id'])
+            recipe = recipes.get(external_id)
+            if recipe is None:
+                recipe = recipes[external_id] = {
+                    'external_id': external_id,
+                    'title': row['title'],
+                    'image': row.get('image') or '',
+                    'image_type': row.get('image_type') or '',
+                    'likes': int(row.get('likes') or 0),
+                    'ingredients': [],
+                }
+            recipe['ingredients'].append(_ingredient({
+                'name': row['ingredient'],
+                'amount': row.get('amount'),
+                'unit': row.get('unit'),
+                'original': row.get('original'),
+            }))
+    return recipes.values()
+
+
+class Command(BaseCommand):
+    help = 'Bulk-load recipes and their ingredients from a JSON or CSV file into the local recipe catalog.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to a .json or .csv dataset')
+        parser.add_argument('--format', choices=['json', 'csv'], help='Defaults to the file extension')
+        parser.add_argument('--replace', action='store_true', help='Delete the existing catalog first')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'{path} does not exist.')
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in ('json', 'csv'):
+            raise CommandError('Cannot tell the dataset format; pass --format json or --format csv.')
+
+        try:
+            recipes = list(read_json(path) if file_format == 'json' else read_csv(path))
+        except (KeyError, ValueError) as exc:
+            raise CommandError(f'Invalid dataset: {exc}')
+
+        ingredient_count = self.load(recipes, options['replace'], options['batch_size'])
+        invalidate_recipe_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Loaded {len(recipes)} recipes with {ingredient_count} ingredients.'
+        ))
+
+    @transaction.atomic
+    def load(self, recipes, replace, batch_size):
+        if replace:
+            Recipe.objects.all().delete()
+
+        Recipe.objects.bulk_create(
+            [Recipe(external_id=recipe['external_id'], **{field: recipe[field] for field in RECIPE_FIELDS})
+             for recipe in recipes],
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['external_id'],
+            update_fields=RECIPE_FIELDS,
+        )
+        recipe_ids = dict(Recipe.objects.values_list('external_id', 'id'))
+
+        # Reloaded recipes get their ingredient list replaced, not merged
+        if not replace:
+            loaded = [recipe_ids[recipe['external_id']] for recipe in recipes]
+            for start in range(0, len(loaded), batch_size):
+                RecipeIngredient.objects.filter(recipe_id__in=loaded[start:start + batch_size]).delete()
+
+        ingredients = []
+        for recipe in recipes:
+            seen = set()
+            for ingredient in recipe['ingredients']:
+                normalized = normalize_name(ingredient['name'])
+                if not normalized or normalized in seen:
+                    continue
+                seen.add(normalized)
+                ingredients.append(RecipeIngredient(
+                    recipe_id=recipe_ids[recipe['external_id']],
+                    normalized_name=normalized,
+                    **ingredient,
+                ))
+        RecipeIngredient.objects.bulk_create(ingredients, batch_size=batch_size)
+        return len(ingredients)
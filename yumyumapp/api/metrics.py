@@ -0,0 +1,269 @@
+"""
+Per-request metrics: wall time, database queries and their time, time spent
+calling Spoonacular and serializing responses, per view. Plus counters of
+Spoonacular usage (see COUNTERS) and the hit/miss counters of the
+TieredCaches (api.cache.get_cache_stats).
+
+MetricsMiddleware keeps a RequestTimings in a context variable for the
+duration of a request. The database is measured by an execute wrapper on
+every connection (add_query_wrapper, connected in ApiConfig.ready), the rest
+by the timed() blocks around the Spoonacular clients and the JSON renderer;
+context variables follow the request into sync_to_async threads and async
+tasks. Each response gets a Server-Timing header, and the per-view
+histograms are exposed in the Prometheus text format at /metrics.
+
+Disabled (METRICS["ENABLED"], the default), the middleware removes itself
+at startup (MiddlewareNotUsed). What remains is a context variable lookup
+per query and per timed() block.
+
+Histograms are per process: with several workers, scrape each of them.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse
+
+from .cache import get_cache_stats
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Name (after the yumyum_ prefix): help text, buckets
+METRICS = {
+    'request_duration_seconds': ('Wall time of the request.', TIME_BUCKETS),
+    'db_queries': ('Database queries per request.', COUNT_BUCKETS),
+    'db_duration_seconds': ('Time spent in database queries per request.', TIME_BUCKETS),
+    'spoonacular_duration_seconds': ('Time spent calling Spoonacular per request.', TIME_BUCKETS),
+    'serialize_duration_seconds': ('Time spent rendering the response body per request.', TIME_BUCKETS),
+}
+
+# Counters (after the yumyum_ prefix): help text, label name or None
+COUNTERS = {
+    'spoonacular_requests_total': ('HTTP requests sent to Spoonacular, retries included.', None),
+    'spoonacular_points_total': ('Spoonacular quota points consumed (X-API-Quota-Request).', None),
+    'spoonacular_calls_avoided_total': ('Recipe searches answered without calling Spoonacular.', 'reason'),
+}
+
+# TieredCache lookup outcomes: stats() key -> result label
+CACHE_RESULTS = {'local_hits': 'local_hit', 'shared_hits': 'shared_hit', 'misses': 'miss'}
+
+# Timers reported by timed(), in Server-Timing order
+TIMERS = ('spoonacular', 'serialize')
+
+
+def metrics_enabled():
+    return getattr(settings, 'METRICS', {}).get('ENABLED', False)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, name, view, value):
+        with self._lock:
+            histogram = self._histograms.get((name, view))
+            if histogram is None:
+                histogram = self._histograms[name, view] = Histogram(METRICS[name][1])
+            histogram.observe(value)
+
+    def get(self, name, view):
+        return self._histograms.get((name, view))
+
+    def inc(self, name, label=None, amount=1):
+        """
+        Add to a counter. Unlike the histograms, counters count whether or not metrics are enabled.
+        """
+        with self._lock:
+            self._counters[name, label] = self._counters.get((name, label), 0) + amount
+
+    def counter(self, name, label=None):
+        return self._counters.get((name, label), 0)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self):
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items(), key=lambda item: (item[0][0], item[0][1] or ''))
+        lines = []
+        for name, (help_text, buckets) in METRICS.items():
+            full_name = f'yumyum_{name}'
+            lines += [f'# HELP {full_name} {help_text}', f'# TYPE {full_name} histogram']
+            for (metric, view), histogram in histograms:
+                if metric != name:
+                    continue
+                view = view.replace('\\', '\\\\').replace('"', '\\"')
+                cumulative = 0
+                for bound, count in zip((*buckets, '+Inf'), histogram.counts):
+                    cumulative += count
+                    lines.append(f'{full_name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+                lines.append(f'{full_name}_sum{{view="{view}"}} {histogram.sum}')
+                lines.append(f'{full_name}_count{{view="{view}"}} {histogram.count}')
+        for name, (help_text, label_name) in COUNTERS.items():
+            full_name = f'yumyum_{name}'
+            lines += [f'# HELP {full_name} {help_text}', f'# TYPE {full_name} counter']
+            for (counter, label), value in counters:
+                if counter != name:
+                    continue
+                labels = f'{{{label_name}="{label}"}}' if label_name else ''
+                lines.append(f'{full_name}{labels} {value:g}')
+        return '\n'.join(lines + _cache_lines()) + '\n'
+
+
+def _cache_lines():
+    stats = sorted(get_cache_stats().items())
+    lines = ['# HELP yumyum_cache_lookups_total TieredCache lookups by outcome.',
+             '# TYPE yumyum_cache_lookups_total counter']
+    for cache, cache_stats in stats:
+        for stat, result in CACHE_RESULTS.items():
+            lines.append(f'yumyum_cache_lookups_total{{cache="{cache}",result="{result}"}} {cache_stats[stat]}')
+    lines += ['# HELP yumyum_cache_hit_ratio Share of TieredCache lookups answered by either tier.',
+              '# TYPE yumyum_cache_hit_ratio gauge']
+    lines += [f'yumyum_cache_hit_ratio{{cache="{cache}"}} {cache_stats["hit_rate"]:g}' for cache, cache_stats in stats]
+    lines += ['# HELP yumyum_cache_local_entries Entries in the in-process tier of a TieredCache.',
+              '# TYPE yumyum_cache_local_entries gauge']
+    lines += [f'yumyum_cache_local_entries{{cache="{cache}"}} {cache_stats["local_size"]}'
+              for cache, cache_stats in stats]
+    return lines
+
+
+registry = Registry()
+
+
+class RequestTimings:
+    __slots__ = ('queries', 'db', 'timers')
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.timers = dict.fromkeys(TIMERS, 0.0)
+
+
+_current = ContextVar('request_timings', default=None)
+
+
+@contextmanager
+def timed(name):
+    """
+    Add the time spent in the block to the current request's timer `name`.
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.timers[name] += time.perf_counter() - started
+
+
+def _record_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.db += time.perf_counter() - started
+
+
+def add_query_wrapper(sender, connection, **kwargs):
+    """
+    connection_created receiver: measure the connection's queries while a request is being measured.
+    """
+    # execute_wrappers belongs to the DatabaseWrapper and outlives reconnects;
+    # appending again would nest one more wrapper after each of them. Per-request
+    # wrapping in the middleware wouldn't do: connections are per thread, and an
+    # async view's queries run on sync_to_async threads.
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = settings.METRICS.get('SERVER_TIMING', True)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, timings, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, timings, time.perf_counter() - started)
+        return response
+
+    def finish(self, request, response, timings, elapsed):
+        match = request.resolver_match
+        view = match.view_name if match is not None else '<unmatched>'
+        registry.observe('request_duration_seconds', view, elapsed)
+        registry.observe('db_queries', view, timings.queries)
+        registry.observe('db_duration_seconds', view, timings.db)
+        for name, seconds in timings.timers.items():
+            registry.observe(f'{name}_duration_seconds', view, seconds)
+
+        if self.server_timing:
+            entries = [
+                f'total;dur={elapsed * 1e3:.1f}',
+                f'db;dur={timings.db * 1e3:.1f};desc="{timings.queries} queries"',
+            ]
+            entries += [f'{name};dur={seconds * 1e3:.1f}' for name, seconds in timings.timers.items() if seconds]
+            response['Server-Timing'] = ', '.join(entries)
+
+
+def metrics_view(request):
+    """
+    The histograms, counters and cache statistics in the Prometheus text format. Not found while metrics are disabled.
+    """
+    if not metrics_enabled():
+        raise Http404
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('external_id', models.PositiveIntegerField(unique=True)),
+                ('title', models.CharField(max_length=255)),
+                ('image', models.URLField(blank=True, max_length=500)),
+                ('image_type', models.CharField(blank=True, max_length=10)),
+                ('likes', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecipeIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('normalized_name', models.CharField(db_index=True, max_length=255)),
+                ('amount', models.FloatField(blank=True, null=True)),
+                ('unit', models.CharField(blank=True, max_length=50)),
+                ('original', models.CharField(blank=True, max_length=500)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingredients', to='api.recipe')),
+            ],
+            options={
+                'unique_together': {('recipe', 'normalized_name')},
+            },
+        ),
+    ]
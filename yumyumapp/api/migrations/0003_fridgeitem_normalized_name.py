@@ -0,0 +1,51 @@
+from django.db import migrations, models
+
+
+def normalize_name(name):
+    # Frozen copy of api.utils.normalize_name, so later changes don't alter this migration
+    return ' '.join(str(name).split()).casefold()
+
+
+def populate_normalized_names(apps, schema_editor):
+    """
+    Fill normalized_name and merge items that only differed by case/whitespace
+    ("Milk" and "milk "), adding their quantities to the oldest row.
+    """
+    FridgeItem = apps.get_model('api', 'FridgeItem')
+    kept = {}
+    duplicates = []
+    for item in FridgeItem.objects.order_by('id').iterator():
+        item.normalized_name = normalize_name(item.name)
+        key = (item.fridge_id, item.normalized_name)
+        if key in kept:
+            kept[key].quantity += item.quantity
+            duplicates.append(item.pk)
+        else:
+            kept[key] = item
+    FridgeItem.objects.filter(pk__in=duplicates).delete()
+    FridgeItem.objects.bulk_update(kept.values(), ['normalized_name', 'quantity'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_recipe_catalog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fridgeitem',
+            name='normalized_name',
+            field=models.CharField(default='', editable=False, max_length=255),
+            preserve_default=False,
+        ),
+        migrations.AlterUniqueTogether(
+            name='fridgeitem',
+            unique_together=set(),
+        ),
+        migrations.RunPython(populate_normalized_names, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='fridgeitem',
+            constraint=models.UniqueConstraint(fields=('fridge', 'normalized_name'), name='unique_fridge_item_normalized_name'),
+        ),
+    ]
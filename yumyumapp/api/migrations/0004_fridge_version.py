@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_fridgeitem_normalized_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fridge',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_fridge_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fridgeitem',
+            index=models.Index(fields=['fridge', 'name', 'id'], name='fridge_item_name_order'),
+        ),
+    ]
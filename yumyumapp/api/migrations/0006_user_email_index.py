@@ -0,0 +1,28 @@
+# Login looks users up by email, which auth_user does not index. The index is
+# added here because the user model belongs to django.contrib.auth. It comes
+# after auth's last migration: on SQLite, altering a field rebuilds the table
+# without indexes the model state doesn't know about.
+
+from django.db import migrations, models
+
+EMAIL_INDEX = models.Index(fields=['email'], name='auth_user_email_idx')
+
+
+def add_email_index(apps, schema_editor):
+    schema_editor.add_index(apps.get_model('auth', 'User'), EMAIL_INDEX)
+
+
+def remove_email_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model('auth', 'User'), EMAIL_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_fridgeitem_name_order_index'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_email_index, remove_email_index),
+    ]
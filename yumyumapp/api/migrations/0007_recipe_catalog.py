@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_user_email_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeCatalog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models import F
 from django.conf import settings
 from django.core.validators import MinValueValidator
 
+from .utils import normalize_name
+
 # --- New Fridge Model ---
 class Fridge(models.Model):
     """
@@ -18,13 +21,124 @@ class Fridge(models.Model):
         help_text='A friendly name for the fridge (e.g., "Kitchen Fridge", "Garage Freezer").'
     )
 
+    # Bumped on every change to the fridge or its items (see api.fridges.fridge_changed);
+    # the fridge endpoints use it as their ETag
+    version = models.PositiveIntegerField(default=1, editable=False)
+
     class Meta:
         # Ensure a user cannot have two fridges with the same name
         unique_together = ('user', 'name')
 
+    def save(self, *args, **kwargs):
+        # The version only moves forward through UPDATE ... version + 1, so saving a
+        # stale instance must not write its old version back
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'version'
+            ]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.user.username}'s {self.name}"
 
+class FridgeItemManager(models.Manager):
+    """
+    Adds race-free quantity increments on top of the default manager.
+    """
+
+    def add_quantity(self, fridge, name, quantity):
+        """
+        Add ``quantity`` to the item called ``name`` (matched on its normalized
+        form) in ``fridge``, a Fridge or its id, creating it if needed. The increment happens inside the database
+        (quantity = quantity + n), so concurrent adds never lose updates.
+        Returns (item, created).
+        """
+        fridge_id = fridge.pk if isinstance(fridge, Fridge) else fridge
+        connection = connections[router.db_for_write(self.model)]
+        if connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert:
+            return self._add_quantity_returning(connection, fridge_id, name, quantity)
+
+        with transaction.atomic(using=connection.alias):
+            matches = self.filter(fridge_id=fridge_id, normalized_name=normalize_name(name))
+            if matches.update(quantity=F('quantity') + quantity):
+                return matches.first(), False
+            try:
+                with transaction.atomic(using=connection.alias):
+                    return self.create(fridge_id=fridge_id, name=name, quantity=quantity), True
+            except IntegrityError:
+                # Someone else created it in the meantime: add to theirs
+                matches.update(quantity=F('quantity') + quantity)
+                return matches.first(), False
+
+    def _add_quantity_returning(self, connection, fridge_id, name, quantity):
+        # One statement per outcome (UPDATE ... RETURNING for existing items,
+        # INSERT ... ON CONFLICT DO UPDATE ... RETURNING for new ones) instead
+        # of SELECT + INSERT/UPDATE round-trips.
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        normalized = normalize_name(name)
+        columns = f'{qn("id")}, {qn("name")}, {qn("quantity")}'
+        with connection.cursor() as cursor:
+            # (fridge_id, normalized_name) is unique, so this is an index seek
+            cursor.execute(
+                f'UPDATE {table} SET {qn("quantity")} = {qn("quantity")} + %s '
+                f'WHERE {qn("fridge_id")} = %s AND {qn("normalized_name")} = %s '
+                f'RETURNING {columns}',
+                [quantity, fridge_id, normalized],
+            )
+            row = cursor.fetchone()
+            created = row is None
+            if created:
+                cursor.execute(
+                    f'INSERT INTO {table} ({qn("fridge_id")}, {qn("name")}, {qn("normalized_name")}, {qn("quantity")}) '
+                    f'VALUES (%s, %s, %s, %s) '
+                    f'ON CONFLICT ({qn("fridge_id")}, {qn("normalized_name")}) DO UPDATE '
+                    f'SET {qn("quantity")} = {table}.{qn("quantity")} + EXCLUDED.{qn("quantity")} '
+                    f'RETURNING {columns}',
+                    [fridge_id, name, normalized, quantity],
+                )
+                row = cursor.fetchone()
+        item_id, item_name, item_quantity = row
+        item = self.model(id=item_id, fridge_id=fridge_id, name=item_name, normalized_name=normalized,
+                          quantity=item_quantity)
+        return item, created
+
+    def add_quantities(self, fridge, entries):
+        """
+        add_quantity for many items at once: ``entries`` maps normalized names
+        to (name, quantity). Returns the items, in the order of ``entries``.
+        """
+        fridge_id = fridge.pk if isinstance(fridge, Fridge) else fridge
+        connection = connections[router.db_for_write(self.model)]
+        if not (connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert):
+            with transaction.atomic(using=connection.alias):
+                return [self.add_quantity(fridge_id, name, quantity)[0] for name, quantity in entries.values()]
+
+        # A single INSERT ... ON CONFLICT DO UPDATE adding to the stored
+        # quantity inside the database, so rows inserted or updated
+        # concurrently are added to rather than overwritten
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        values = []
+        for normalized, (name, quantity) in entries.items():
+            values += [fridge_id, name, normalized, quantity]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} ({qn("fridge_id")}, {qn("name")}, {qn("normalized_name")}, {qn("quantity")}) '
+                f'VALUES {", ".join(["(%s, %s, %s, %s)"] * len(entries))} '
+                f'ON CONFLICT ({qn("fridge_id")}, {qn("normalized_name")}) DO UPDATE '
+                f'SET {qn("quantity")} = {table}.{qn("quantity")} + EXCLUDED.{qn("quantity")} '
+                f'RETURNING {qn("id")}, {qn("name")}, {qn("normalized_name")}, {qn("quantity")}',
+                values,
+            )
+            rows = {row[2]: row for row in cursor.fetchall()}  # RETURNING order isn't guaranteed
+        return [
+            self.model(id=item_id, fridge_id=fridge_id, name=name, normalized_name=normalized, quantity=quantity)
+            for item_id, name, normalized, quantity in (rows[key] for key in entries)
+        ]
+
+
 # --- Updated FridgeItem Model ---
 class FridgeItem(models.Model):
     """
@@ -40,6 +154,9 @@ class FridgeItem(models.Model):
     # The name of the item (e.g., 'Milk', 'Apples')
     name = models.CharField(max_length=255)
 
+    # Casefolded, whitespace-collapsed name used for lookups and uniqueness (set on save)
+    normalized_name = models.CharField(max_length=255, editable=False)
+
     # The quantity of the item (e.g., 2, 6)
     quantity = models.IntegerField(
         default=1,
@@ -47,10 +164,74 @@ class FridgeItem(models.Model):
         help_text='The number or amount of this item.'
     )
 
+    objects = FridgeItemManager()
+
     class Meta:
-        # Ensures a single fridge can't have the exact same item name twice
-        unique_together = ('fridge', 'name')
+        constraints = [
+            # Ensures a single fridge can't hold the same item twice ("Milk" and "milk" included);
+            # its index also serves every name lookup
+            models.UniqueConstraint(fields=['fridge', 'normalized_name'], name='unique_fridge_item_normalized_name'),
+        ]
+        indexes = [
+            # Keyset pagination of the item listing (ORDER BY name, id within a fridge)
+            models.Index(fields=['fridge', 'name', 'id'], name='fridge_item_name_order'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_name(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'normalized_name'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         # Shows which fridge the item belongs to
-        return f"{self.name} ({self.quantity}) in {self.fridge.name}"
\ No newline at end of file
+        return f"{self.name} ({self.quantity}) in {self.fridge.name}"
+
+# --- Local recipe catalog (see api.recipe_index) ---
+class Recipe(models.Model):
+    """
+    A recipe from a locally loaded dataset (python manage.py load_recipes).
+    """
+    # The id the recipe has in the source dataset (Spoonacular id when available)
+    external_id = models.PositiveIntegerField(unique=True)
+    title = models.CharField(max_length=255)
+    image = models.URLField(max_length=500, blank=True)
+    image_type = models.CharField(max_length=10, blank=True)
+    likes = models.IntegerField(default=0)
+
+    def __str__(self):
+        return self.title
+
+
+class RecipeIngredient(models.Model):
+    """
+    One ingredient line of a Recipe.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='ingredients'  # Allows access like recipe.ingredients.all()
+    )
+
+    # As written in the dataset (e.g. 'Green Apples') and in canonical form for matching
+    name = models.CharField(max_length=255)
+    normalized_name = models.CharField(max_length=255, db_index=True)
+
+    amount = models.FloatField(null=True, blank=True)
+    unit = models.CharField(max_length=50, blank=True)
+    original = models.CharField(max_length=500, blank=True)
+
+    class Meta:
+        unique_together = ('recipe', 'normalized_name')
+
+    def __str__(self):
+        return f"{self.name} in {self.recipe.title}"
+
+
+class RecipeCatalog(models.Model):
+    """
+    Single row counting loads of the local recipe catalog, so that every
+    process notices a load_recipes run and rebuilds its search index.
+    """
+    version = models.PositiveIntegerField(default=0)
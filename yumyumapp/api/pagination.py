@@ -0,0 +1,57 @@
+"""
+Keyset (cursor) pagination for the fridge item listing.
+
+A page is "the next ``limit`` items after (name, id)", found with a seek on
+the (fridge, name, id) index instead of an OFFSET scan, so the last page of a
+100k-item fridge costs the same as the first. Cursors are opaque to clients:
+URL-safe base64 of the last row's [name, id].
+"""
+import base64
+import json
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(name, item_id):
+    raw = json.dumps([name, item_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    (name, id) of a cursor made by encode_cursor. Raises InvalidCursor.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        name, item_id = json.loads(raw)
+    except (TypeError, ValueError):
+        raise InvalidCursor(cursor)
+    if not isinstance(name, str) or type(item_id) is not int:
+        raise InvalidCursor(cursor)
+    return name, item_id
+
+
+def after(name, item_id):
+    """
+    Rows ordered after (name, id) in ORDER BY name, id.
+    The name >= bound lets the database start the index scan at the cursor.
+    """
+    return Q(name__gte=name) & (Q(name__gt=name) | Q(id__gt=item_id))
+
+
+def normalized_prefix(prefix, vendor):
+    """
+    Items whose normalized name starts with ``prefix`` (already normalized).
+    SQLite's LIKE is case-insensitive and can't use the normalized_name index;
+    normalized names are casefolded anyway, so there the equivalent binary
+    range is added for the index to seek on.
+    """
+    condition = Q(normalized_name__startswith=prefix)
+    if vendor == 'sqlite' and ord(prefix[-1]) < 0x10FFFF:
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        condition &= Q(normalized_name__gte=prefix, normalized_name__lt=upper)
+    return condition
@@ -0,0 +1,154 @@
+"""
+Recipe suggestions searched in the background after fridge edits.
+
+Users tend to open the recipes screen right after editing their fridge, and
+find_recipes_by_ingredients would then wait on Spoonacular. Instead, every
+fridge change (fridge_changed) schedules the fridge once its transaction
+commits. A daemon thread waits until the fridge has had no edits for DELAY
+seconds (but no longer than MAX_DELAY after the first one, so a fridge edited
+nonstop still gets searched), then runs the search for its ingredients, which
+stores the result in the recipe cache. The GET finds it there. A burst of
+edits coalesces into a single search.
+
+Everything is in-process and best-effort, with no broker: jobs still pending
+when the process exits are lost, and the GET then searches by itself as it
+always did.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import FridgeItem
+from .quota import QuotaExceeded
+from .recipes import LOCAL, find_recipes, recipe_source
+from .spoonacular import SpoonacularError
+
+logger = logging.getLogger(__name__)
+
+_settings = getattr(settings, 'RECIPE_PRECOMPUTE', {})
+
+
+def precompute_enabled():
+    return getattr(settings, 'RECIPE_PRECOMPUTE', {}).get('ENABLED', False)
+
+
+class DebouncedQueue:
+    """
+    Runs ``job(key)`` for each scheduled key once it has not been scheduled
+    again for ``delay`` seconds, or ``max_delay`` seconds after it was first
+    scheduled, whichever comes first.
+
+    With ``background`` the jobs run on a daemon thread, started on first
+    use; without it, only when run_due() or flush() is called.
+    """
+
+    def __init__(self, job, delay=2, max_delay=10, background=True, clock=time.monotonic):
+        self.job = job
+        self.delay = delay
+        self.max_delay = max_delay
+        self.background = background
+        self._clock = clock
+        self._pending = {}  # key -> (due, deadline)
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def schedule(self, key):
+        now = self._clock()
+        with self._condition:
+            _, deadline = self._pending.get(key, (None, now + self.max_delay))
+            self._pending[key] = (min(now + self.delay, deadline), deadline)
+            if self.background and self._thread is None:
+                self._thread = threading.Thread(target=self._work, name='recipe-precompute', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def pending(self):
+        with self._condition:
+            return set(self._pending)
+
+    def clear(self):
+        with self._condition:
+            self._pending.clear()
+
+    def _pop_due(self):
+        """
+        Remove and return the keys that are due, and the seconds until the next one is (None if none).
+        """
+        now = self._clock()
+        due = [key for key, (when, _) in self._pending.items() if when <= now]
+        for key in due:
+            del self._pending[key]
+        wait = min((when for when, _ in self._pending.values()), default=None)
+        return due, None if wait is None else wait - now
+
+    def _run(self, keys):
+        for key in keys:
+            try:
+                self.job(key)
+            except Exception:
+                logger.exception('Background job for %r failed', key)
+
+    def run_due(self):
+        """
+        Run the jobs that are due, in the calling thread.
+        """
+        with self._condition:
+            due, _ = self._pop_due()
+        self._run(due)
+        return due
+
+    def flush(self):
+        """
+        Run every pending job now, in the calling thread.
+        """
+        with self._condition:
+            keys = list(self._pending)
+            self._pending.clear()
+        self._run(keys)
+        return keys
+
+    def _work(self):
+        while True:
+            with self._condition:
+                due, wait = self._pop_due()
+                while not due:
+                    self._condition.wait(wait)
+                    due, wait = self._pop_due()
+            self._run(due)
+
+
+def precompute_recipes(fridge_id):
+    """
+    Search recipes for the fridge's current ingredients, filling the recipe cache.
+    """
+    try:
+        ingredients = list(FridgeItem.objects.filter(fridge_id=fridge_id).values_list('name', flat=True))
+        if ingredients:
+            find_recipes(ingredients, background=True)
+    except QuotaExceeded:
+        pass  # Shed to save the budget for searches someone is waiting for
+    except SpoonacularError as exc:
+        logger.warning('Precomputing recipes for fridge %s failed: %s', fridge_id, exc)
+    finally:
+        # This thread's connection isn't closed by any request cycle
+        close_old_connections()
+
+
+recompute_queue = DebouncedQueue(
+    precompute_recipes,
+    delay=_settings.get('DELAY', 2),
+    max_delay=_settings.get('MAX_DELAY', 10),
+)
+
+
+def schedule_recompute(fridge_id):
+    """
+    Search the fridge's recipes in the background after the current transaction commits.
+    """
+    # Local searches are fast and not cached; nothing to gain
+    if not precompute_enabled() or recipe_source() == LOCAL:
+        return
+    transaction.on_commit(lambda: recompute_queue.schedule(fridge_id))
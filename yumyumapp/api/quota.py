@@ -0,0 +1,170 @@
+"""
+Spoonacular quota budgeting.
+
+Spoonacular charges points per call against a daily quota and limits the
+request rate. Before a recipe search calls it (a cache hit never gets here),
+spoonacular_quota.acquire() checks, in order:
+
+* the daily quota, as last reported by Spoonacular's X-API-Quota-* headers
+  (the client passes every response to record()). With RESERVE points or
+  fewer left, only searches someone is waiting for go out; background
+  refreshes and precomputations are shed. With none left, everything is.
+* the caller's token bucket (USER_RATE calls per second, USER_BURST at once),
+  so one user can't spend everyone's budget.
+* the global token bucket (RATE, BURST). A search someone is waiting for
+  queues for up to MAX_WAIT seconds for a token; anything else is shed.
+
+A shed call raises QuotaExceeded, a SpoonacularError with status 429 and a
+Retry-After, so find_recipes falls back to a stale or local result as it
+does for any failed call.
+
+The buckets and the reported quota live in the shared cache (RECIPE_CACHE
+alias), so every process spends from the same budget. Like DRF's throttles,
+the buckets are read and written without a lock: concurrent processes can
+overdraw them by a call or two.
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import registry
+from .spoonacular import SpoonacularError
+
+_settings = getattr(settings, 'SPOONACULAR_QUOTA', {})
+
+
+class QuotaExceeded(SpoonacularError):
+    """
+    The call was shed to stay within the Spoonacular budget.
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message, 429)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    ``rate`` tokens per second, holding at most ``capacity``, kept in a Django cache.
+    """
+
+    def __init__(self, name, rate, capacity, alias='default', clock=time.time):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.alias = alias
+        self._clock = clock
+
+    def _key(self, key):
+        return f'{self.name}:{key}'
+
+    def _level(self, key):
+        now = self._clock()
+        level, updated_at = caches[self.alias].get(self._key(key), (self.capacity, now))
+        return min(self.capacity, level + (now - updated_at) * self.rate), now
+
+    def _store(self, key, level, now):
+        # Kept until it would have refilled anyway
+        caches[self.alias].set(self._key(key), (level, now), int(self.capacity / self.rate) + 1)
+
+    def take(self, key='', tokens=1):
+        """
+        Take ``tokens`` and return 0, or, when there aren't enough, take
+        nothing and return the seconds until there will be.
+        """
+        level, now = self._level(key)
+        if level < tokens:
+            return (tokens - level) / self.rate
+        self._store(key, level - tokens, now)
+        return 0
+
+    def give_back(self, key='', tokens=1):
+        level, now = self._level(key)
+        self._store(key, min(self.capacity, level + tokens), now)
+
+
+def _seconds_until_reset(now):
+    # Spoonacular quotas reset at midnight UTC
+    now = datetime.datetime.fromtimestamp(now, datetime.timezone.utc)
+    midnight = (now + datetime.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(1, int((midnight - now).total_seconds()))
+
+
+class SpoonacularQuota:
+    def __init__(self, rate=1.0, burst=5, user_rate=None, user_burst=5, max_wait=2, reserve=10,
+                 alias='default', clock=time.time, sleep=time.sleep):
+        self.alias = alias
+        self.max_wait = max_wait
+        self.reserve = reserve
+        self._clock = clock
+        self._sleep = sleep
+        self.bucket = TokenBucket('spoonacular-bucket', rate, burst, alias, clock) if rate else None
+        self.user_bucket = TokenBucket('spoonacular-user-bucket', user_rate, user_burst, alias, clock) \
+            if user_rate else None
+
+    def status(self):
+        """
+        The daily quota as last reported: {'used', 'left', 'request'} (left only
+        on plans that report it), or {} before the first call of the day.
+        """
+        return caches[self.alias].get('spoonacular-quota', {})
+
+    def record(self, headers):
+        """
+        Note the quota reported by the headers of a Spoonacular response.
+        """
+        status = {}
+        for field in ('Request', 'Used', 'Left'):
+            value = headers.get(f'X-API-Quota-{field}')
+            if value is not None:
+                try:
+                    status[field.lower()] = float(value)
+                except ValueError:
+                    pass
+        if not status:
+            return
+        registry.inc('spoonacular_points_total', amount=status.get('request', 0))
+        caches[self.alias].set('spoonacular-quota', status, _seconds_until_reset(self._clock()))
+
+    def shed(self, message, retry_after):
+        registry.inc('spoonacular_calls_avoided_total', 'shed')
+        raise QuotaExceeded(message, max(1, int(retry_after + 0.999)))
+
+    def acquire(self, user_id=None, background=False):
+        """
+        Spend a call from the budget, waiting up to MAX_WAIT for one if the call
+        isn't a ``background`` one. Raises QuotaExceeded when it must not go out.
+        """
+        left = self.status().get('left')
+        if left is not None and (left <= 0 or (background and left <= self.reserve)):
+            self.shed('The daily Spoonacular quota is used up.', _seconds_until_reset(self._clock()))
+
+        if self.user_bucket is not None and user_id is not None:
+            wait = self.user_bucket.take(user_id)
+            if wait:
+                self.shed('Too many recipe searches, try again shortly.', wait)
+
+        if self.bucket is None:
+            return
+        wait = self.bucket.take()
+        if wait and not background and wait <= self.max_wait:
+            # Queue: the search is worth a short wait more than a stale answer
+            self._sleep(wait)
+            wait = self.bucket.take()
+        if wait:
+            if self.user_bucket is not None and user_id is not None:
+                self.user_bucket.give_back(user_id)
+            self.shed('Recipe search is busy, try again shortly.', wait)
+
+
+spoonacular_quota = SpoonacularQuota(
+    rate=_settings.get('RATE', 1.0),
+    burst=_settings.get('BURST', 5),
+    user_rate=_settings.get('USER_RATE'),
+    user_burst=_settings.get('USER_BURST', 5),
+    max_wait=_settings.get('MAX_WAIT', 2),
+    reserve=_settings.get('RESERVE', 10),
+    alias=getattr(settings, 'RECIPE_CACHE', {}).get('ALIAS', 'default'),
+)
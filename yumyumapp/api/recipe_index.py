@@ -0,0 +1,257 @@
+"""
+In-memory inverted index over the local recipe catalog.
+
+Every normalized ingredient maps to a posting bitset: a Python int whose bit
+``i`` is set when recipe ``i`` uses that ingredient. A search adds up the
+bitsets of the fridge's ingredients with a bit-sliced counter (one bitwise
+op per bit-plane per ingredient), so the per-recipe "used" counts for the
+whole catalog come out of big-int arithmetic done in C, without a Python
+loop over recipes. Intersecting those count groups with per-size bitsets
+gives the (used, missed) buckets in ranking order; only the recipes that
+make it into the response are visited individually.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import F, Prefetch
+
+from .models import Recipe, RecipeCatalog, RecipeIngredient
+from .utils import normalize_name
+
+# Ingredients Spoonacular treats as always available when ignorePantry is set
+PANTRY_ITEMS = frozenset({
+    'water', 'salt', 'pepper', 'black pepper', 'salt and pepper', 'flour', 'all purpose flour', 'sugar',
+    'oil', 'olive oil', 'vegetable oil', 'butter', 'baking soda', 'baking powder', 'ice',
+})
+
+
+def _set_bits(mask):
+    """
+    Positions of the set bits of ``mask``, lowest first.
+    """
+    bits = bin(mask)[:1:-1]  # LSB first, without the '0b' prefix
+    position = bits.find('1')
+    while position != -1:
+        yield position
+        position = bits.find('1', position + 1)
+
+
+def _ingredient_payload(ingredient):
+    return {
+        'id': ingredient['id'],
+        'amount': ingredient['amount'],
+        'unit': ingredient['unit'],
+        'name': ingredient['name'],
+        'original': ingredient['original'],
+    }
+
+
+class RecipeIndex:
+    """
+    Immutable index built from a list of recipe dicts, each with an
+    ``ingredients`` list of dicts carrying a ``normalized_name``.
+    """
+
+    def __init__(self, recipes):
+        self.recipes = recipes
+
+        # Positions of the recipes using each ingredient, and of the recipes
+        # having each ingredient count (with and without pantry staples)
+        postings, sizes, sizes_without_pantry = {}, {}, {}
+        for position, recipe in enumerate(recipes):
+            names = {ingredient['normalized_name'] for ingredient in recipe['ingredients']}
+            for name in names:
+                postings.setdefault(name, []).append(position)
+            sizes.setdefault(len(names), []).append(position)
+            sizes_without_pantry.setdefault(len(names - PANTRY_ITEMS), []).append(position)
+
+        self.postings = {name: self._bitset(positions) for name, positions in postings.items()}
+        self.size_masks = {size: self._bitset(positions) for size, positions in sizes.items()}
+        self.size_masks_without_pantry = {
+            size: self._bitset(positions) for size, positions in sizes_without_pantry.items()
+        }
+
+    def __len__(self):
+        return len(self.recipes)
+
+    @staticmethod
+    def _bitset(positions):
+        # Built through a bytearray: OR-ing 1 << p into an int copies the whole int each time
+        bits = bytearray((positions[-1] >> 3) + 1)
+        for position in positions:
+            bits[position >> 3] |= 1 << (position & 7)
+        return int.from_bytes(bits, 'little')
+
+    @staticmethod
+    def _count_planes(bitsets):
+        """
+        Bit-sliced sum of the bitsets: plane ``j`` holds bit ``j`` of every recipe's count.
+        """
+        planes = []
+        for carry in bitsets:
+            for level, plane in enumerate(planes):
+                planes[level], carry = plane ^ carry, plane & carry
+                if not carry:
+                    break
+            if carry:
+                planes.append(carry)
+        return planes
+
+    @staticmethod
+    def _count_groups(planes, highest):
+        """
+        (count, bitset of recipes with exactly that count), highest count first.
+        """
+        everything = 0
+        for plane in planes:
+            everything |= plane
+        for count in range(min(highest, (1 << len(planes)) - 1), 0, -1):
+            mask = everything
+            for level, plane in enumerate(planes):
+                mask = mask & plane if count >> level & 1 else mask & ~plane
+                if not mask:
+                    break
+            if mask:
+                yield count, mask
+
+    def search(self, ingredients, number=10, ranking=1, ignore_pantry=True):
+        """
+        Recipes using the given ingredients, ranked like Spoonacular's findByIngredients:
+        ranking=1 maximizes used ingredients, ranking=2 minimizes missing ones.
+        Ties are broken by likes, then catalog order.
+        """
+        terms = {normalize_name(name) for name in ingredients if name and str(name).strip()}
+        if ignore_pantry:
+            terms -= PANTRY_ITEMS
+        bitsets = [self.postings[term] for term in terms if term in self.postings]
+        if not bitsets or number <= 0:
+            return []
+
+        size_masks = self.size_masks_without_pantry if ignore_pantry else self.size_masks
+        largest = max(size_masks)
+        groups = self._count_groups(self._count_planes(bitsets), len(bitsets))
+        if ranking == 1:
+            order = ((used, mask, missed) for used, mask in groups for missed in range(largest - used + 1))
+        else:
+            groups = list(groups)
+            order = ((used, mask, missed) for missed in range(largest + 1) for used, mask in groups)
+
+        # (used, missed) buckets are bitset intersections; only recipes that make
+        # it into the result are visited one by one
+        results = []
+        for used, mask, missed in order:
+            bucket = mask & size_masks.get(used + missed, 0)
+            if not bucket:
+                continue
+            positions = sorted(_set_bits(bucket), key=lambda position: -self.recipes[position]['likes'])
+            results.extend(self._result(position, used, terms, ignore_pantry)
+                           for position in positions[:number - len(results)])
+            if len(results) >= number:
+                break
+        return results
+
+    def _result(self, position, used_count, terms, ignore_pantry):
+        recipe = self.recipes[position]
+        used, missed = [], []
+        recipe_names = set()
+        for ingredient in recipe['ingredients']:
+            name = ingredient['normalized_name']
+            recipe_names.add(name)
+            if name in terms:
+                used.append(_ingredient_payload(ingredient))
+            elif not (ignore_pantry and name in PANTRY_ITEMS):
+                missed.append(_ingredient_payload(ingredient))
+        return {
+            'id': recipe['id'],
+            'title': recipe['title'],
+            'image': recipe['image'],
+            'imageType': recipe['imageType'],
+            'usedIngredientCount': used_count,
+            'missedIngredientCount': len(missed),
+            'usedIngredients': used,
+            'missedIngredients': missed,
+            'unusedIngredients': [{'name': name} for name in sorted(terms - recipe_names)],
+            'likes': recipe['likes'],
+        }
+
+    @classmethod
+    def from_database(cls):
+        ingredients = RecipeIngredient.objects.order_by('id')
+        recipes = Recipe.objects.order_by('id').prefetch_related(Prefetch('ingredients', queryset=ingredients))
+        return cls([
+            {
+                'id': recipe.external_id,
+                'title': recipe.title,
+                'image': recipe.image,
+                'imageType': recipe.image_type,
+                'likes': recipe.likes,
+                'ingredients': [
+                    {
+                        'id': ingredient.id,
+                        'name': ingredient.name,
+                        'normalized_name': ingredient.normalized_name,
+                        'amount': ingredient.amount,
+                        'unit': ingredient.unit,
+                        'original': ingredient.original,
+                    }
+                    for ingredient in recipe.ingredients.all()
+                ],
+            }
+            for recipe in recipes.iterator(chunk_size=2000)
+        ])
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+_version = None  # (version, monotonic time it was read)
+
+
+def recipe_index_version():
+    """
+    Changes every time the catalog is (re)loaded. Kept in the database
+    (RecipeCatalog) so that load_recipes reaches every process, and re-read
+    at most every RECIPE_INDEX_CHECK_INTERVAL seconds.
+    """
+    global _version
+    now = time.monotonic()
+    if _version is None or now - _version[1] >= getattr(settings, 'RECIPE_INDEX_CHECK_INTERVAL', 5):
+        version = RecipeCatalog.objects.filter(pk=1).values_list('version', flat=True).first()
+        _version = (version or 0, now)
+    return _version[0]
+
+
+def get_recipe_index():
+    """
+    The process-wide index, rebuilt from the database when load_recipes has run since.
+    """
+    global _index, _index_version
+    version = recipe_index_version()
+    if _index is None or version != _index_version:
+        with _index_lock:
+            if _index is None or version != _index_version:
+                _index = RecipeIndex.from_database()
+                _index_version = version
+    return _index
+
+
+def invalidate_recipe_index():
+    """
+    Make every process rebuild its index on the next search (this one at once,
+    the others within RECIPE_INDEX_CHECK_INTERVAL).
+    """
+    global _index, _version
+    if not RecipeCatalog.objects.filter(pk=1).update(version=F('version') + 1):
+        RecipeCatalog.objects.get_or_create(pk=1, defaults={'version': 1})
+    _index = None
+    _version = None
+
+
+def reset_recipe_index():
+    """
+    Forget this process's index and catalog version, as after a restart.
+    """
+    global _index, _version
+    _index = None
+    _version = None
@@ -0,0 +1,332 @@
+"""
+Recipe search used by the recipe views.
+
+``RECIPE_SOURCE`` selects where recipes come from: the local catalog
+(``local``, see api.recipe_index), Spoonacular (``remote``), or the local
+catalog with Spoonacular as a fallback when nothing matches locally
+(``local_fallback``).
+
+Spoonacular results depend only on the set of ingredients and the search
+parameters, so they are cached under a key built from the normalized,
+sorted ingredient set. An unchanged fridge never reaches the network twice,
+and identical searches that miss at the same time share one call (see
+SingleFlight).
+The same key (plus the catalog version for local searches) is the ETag of
+the recipe views.
+
+A cached result is fresh for RECIPE_CACHE["TTL"] seconds. For STALE_TTL
+seconds after that it is still served, at once, while a background thread
+fetches it again; if Spoonacular is down, it keeps being served until
+then. Only a search with nothing cached waits for Spoonacular, and when
+that fails, the best local catalog match is served if there is one. Either
+way the result says it is stale (RecipeResult.stale), which the views turn
+into an X-Recipes-Stale header.
+
+Every call that does go out is paid for from the Spoonacular budget first
+(api.quota), and the searches answered without one are counted
+(spoonacular_calls_avoided_total in /metrics).
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.http import quote_etag
+
+from .cache import SingleFlight, TieredCache
+from .metrics import registry
+from .quota import QuotaExceeded, spoonacular_quota
+from .recipe_index import get_recipe_index, recipe_index_version
+from .spoonacular import SpoonacularError, get_async_client, get_client
+from .utils import normalize_name
+
+logger = logging.getLogger(__name__)
+
+LOCAL = 'local'
+REMOTE = 'remote'
+LOCAL_FALLBACK = 'local_fallback'
+
+# Parameters sent to Spoonacular's findByIngredients endpoint (besides the ingredients)
+DEFAULT_SEARCH_PARAMS = {
+    'number': 10,  # Return up to 10 recipes
+    'ranking': 1,  # Maximize used ingredients
+    'ignorePantry': True,
+}
+
+# Why a result may be out of date (RecipeResult.stale, the X-Recipes-Stale header)
+STALE_CACHED = 'cached'  # Cached result past its TTL, being fetched again
+STALE_LOCAL = 'local'  # Spoonacular failed with nothing cached; best local catalog match
+
+_cache_settings = getattr(settings, 'RECIPE_CACHE', {})
+
+RECIPE_TTL = _cache_settings.get('TTL', 60 * 60)
+
+# Entries are {'recipes': [...], 'fetched_at': <epoch seconds>}, kept until they
+# are too stale to serve even when Spoonacular is down
+recipe_cache = TieredCache(
+    'recipes',
+    maxsize=_cache_settings.get('LOCAL_MAXSIZE', 256),
+    ttl=RECIPE_TTL + _cache_settings.get('STALE_TTL', 60 * 60 * 24),
+    alias=_cache_settings.get('ALIAS', 'default'),
+)
+
+# Concurrent misses for the same key wait for one Spoonacular call, across processes too
+recipe_flights = SingleFlight(
+    'recipes',
+    alias=_cache_settings.get('ALIAS', 'default'),
+    timeout=_cache_settings.get('LOCK_TIMEOUT', 30),
+)
+
+
+class RecipeResult:
+    """
+    Recipes found by find_recipes. ``stale`` is None, STALE_CACHED or
+    STALE_LOCAL; ``age`` is the seconds since a cached result was fetched.
+    """
+    __slots__ = ('recipes', 'stale', 'age')
+
+    def __init__(self, recipes, stale=None, age=None):
+        self.recipes = recipes
+        self.stale = stale
+        self.age = age
+
+    def headers(self, etag):
+        """
+        Response headers: the ETag, unless the recipes are a local stand-in
+        the client must not keep under it, and the staleness.
+        """
+        if self.stale is None:
+            return {'ETag': etag}
+        if self.stale == STALE_LOCAL:
+            return {'X-Recipes-Stale': self.stale}
+        return {'ETag': etag, 'X-Recipes-Stale': self.stale, 'Age': str(int(self.age))}
+
+
+class BackgroundRefresher:
+    """
+    Runs refreshes on a few threads of its own, one at a time per key:
+    submitting a key whose refresh is queued or running does nothing.
+    """
+
+    def __init__(self, workers=2):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._running = set()
+        self._executor = None
+
+    def submit(self, key, fn):
+        """
+        Call fn() in the background unless ``key`` is already being refreshed.
+        Returns its Future, or None when skipped.
+        """
+        with self._lock:
+            if key in self._running:
+                return None
+            self._running.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='recipe-refresh')
+        return self._executor.submit(self._run, key, fn)
+
+    def _run(self, key, fn):
+        try:
+            fn()
+        except Exception:
+            logger.warning('Refreshing recipes %s failed', key, exc_info=True)
+        finally:
+            with self._lock:
+                self._running.discard(key)
+
+
+refresher = BackgroundRefresher(workers=_cache_settings.get('REFRESH_WORKERS', 2))
+
+
+def normalize_ingredients(ingredients):
+    """
+    Sorted, de-duplicated list of normalized ingredient names.
+    """
+    return sorted({normalize_name(name) for name in ingredients if name and name.strip()})
+
+
+def recipe_cache_key(ingredients, params=None):
+    """
+    Stable cache key for a findByIngredients lookup with the given search params.
+    Two fridges holding "Milk" and " milk" produce the same key.
+    """
+    params = {**DEFAULT_SEARCH_PARAMS, **(params or {})}
+    payload = json.dumps({
+        'ingredients': normalize_ingredients(ingredients),
+        'number': int(params['number']),
+        'ranking': int(params['ranking']),
+        'ignorePantry': bool(params['ignorePantry']),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def recipe_etag(ingredients, params=None):
+    """
+    Strong ETag of the find_recipes result for these ingredients, computed
+    without searching. Spoonacular results are treated as fixed for a given key.
+    """
+    source = recipe_source()
+    tag = f'{source}:{recipe_cache_key(ingredients, params)}'
+    if source != REMOTE:
+        tag += f':{recipe_index_version()}'
+    return quote_etag(hashlib.sha256(tag.encode('utf-8')).hexdigest()[:32])
+
+
+def recipe_source():
+    return getattr(settings, 'RECIPE_SOURCE', REMOTE)
+
+
+def search_local(ingredients, params):
+    return get_recipe_index().search(
+        ingredients,
+        number=int(params['number']),
+        ranking=int(params['ranking']),
+        ignore_pantry=bool(params['ignorePantry']),
+    )
+
+
+def _entry(value):
+    # Anything else is a result cached in the old format, before fetched_at
+    return value if isinstance(value, dict) else None
+
+
+def _fresh(value):
+    entry = _entry(value)
+    return entry if entry is not None and time.time() - entry['fetched_at'] < RECIPE_TTL else None
+
+
+def _avoided(reason):
+    registry.inc('spoonacular_calls_avoided_total', reason)
+
+
+def _fetch(cache_key, ingredients, params, user_id=None, background=False):
+    spoonacular_quota.acquire(user_id, background)
+    entry = {'recipes': get_client().find_by_ingredients(ingredients, **params), 'fetched_at': time.time()}
+    recipe_cache.set(cache_key, entry)
+    return entry
+
+
+def _fetch_once(cache_key, ingredients, params, user_id=None, background=False):
+    """
+    _fetch, unless the same search is already in flight (in any process); then its result.
+    """
+    fetched = []
+
+    def fetch():
+        fetched.append(True)
+        return _fetch(cache_key, ingredients, params, user_id, background)
+
+    # The shared tier: the local one may still hold the stale entry being refreshed
+    entry = recipe_flights.do(cache_key, fetch, lambda: _fresh(recipe_cache.shared_get(cache_key)))
+    if not fetched:
+        _avoided('coalesced')
+    return entry
+
+
+def _refresh(cache_key, ingredients, params):
+    try:
+        _fetch_once(cache_key, ingredients, params, background=True)
+    except QuotaExceeded:
+        pass  # Counted; the stale result stays until the budget allows a refresh
+
+
+def _cached_result(entry, cache_key, ingredients, params):
+    """
+    The cached entry as a result, refreshed in the background when past its TTL.
+    """
+    age = time.time() - entry['fetched_at']
+    if age < RECIPE_TTL:
+        _avoided('cache_hit')
+        return RecipeResult(entry['recipes'])
+    _avoided('stale')
+    refresher.submit(cache_key, lambda: _refresh(cache_key, ingredients, params))
+    return RecipeResult(entry['recipes'], STALE_CACHED, age)
+
+
+def _local_stand_in(ingredients, params, exc):
+    """
+    Best local catalog match for a failed Spoonacular search; re-raises ``exc`` when there is none.
+    """
+    recipes = search_local(ingredients, params)
+    if not recipes:
+        raise exc
+    return RecipeResult(recipes, STALE_LOCAL)
+
+
+def find_recipes(ingredients, params=None, user_id=None, background=False):
+    """
+    RecipeResult for the ingredient list from the configured source.
+    Raises api.spoonacular.SpoonacularError when Spoonacular is needed, fails
+    (or the call is over budget, see api.quota), and neither the cache nor the
+    local catalog has anything to serve instead. ``user_id`` is charged for the
+    call; ``background`` searches nobody is waiting for spend the budget last.
+    """
+    params = {**DEFAULT_SEARCH_PARAMS, **(params or {})}
+    source = recipe_source()
+    if source != REMOTE:
+        recipes = search_local(ingredients, params)
+        if recipes or source == LOCAL:
+            return RecipeResult(recipes)
+
+    cache_key = recipe_cache_key(ingredients, params)
+    entry = _entry(recipe_cache.get(cache_key))
+    if entry is not None:
+        return _cached_result(entry, cache_key, ingredients, params)
+    try:
+        entry = _fetch_once(cache_key, ingredients, params, user_id, background)
+    except SpoonacularError as exc:
+        if source != REMOTE:
+            raise  # The local catalog had nothing already
+        return _local_stand_in(ingredients, params, exc)
+    return RecipeResult(entry['recipes'])
+
+
+async def afind_recipes(ingredients, params=None, user_id=None):
+    """
+    Async version of find_recipes for the ASGI views.
+    """
+    params = {**DEFAULT_SEARCH_PARAMS, **(params or {})}
+    source = recipe_source()
+    if source != REMOTE:
+        # Only the first search after a (re)load touches the database
+        recipes = await sync_to_async(search_local)(ingredients, params)
+        if recipes or source == LOCAL:
+            return RecipeResult(recipes)
+
+    cache_key = recipe_cache_key(ingredients, params)
+    entry = _entry(await recipe_cache.aget(cache_key))
+    if entry is not None:
+        # The background refresh uses the sync client, on the refresher's threads
+        return _cached_result(entry, cache_key, ingredients, params)
+
+    fetched = []
+
+    async def fetch():
+        fetched.append(True)
+        # Off the event loop: it may wait for the budget
+        await sync_to_async(spoonacular_quota.acquire, thread_sensitive=False)(user_id)
+        entry = {
+            'recipes': await get_async_client().find_by_ingredients(ingredients, **params),
+            'fetched_at': time.time(),
+        }
+        await recipe_cache.aset(cache_key, entry)
+        return entry
+
+    async def lookup():
+        return _fresh(await recipe_cache.ashared_get(cache_key))
+
+    try:
+        entry = await recipe_flights.ado(cache_key, fetch, lookup)
+    except SpoonacularError as exc:
+        if source != REMOTE:
+            raise
+        return await sync_to_async(_local_stand_in)(ingredients, params, exc)
+    if not fetched:
+        _avoided('coalesced')
+    return RecipeResult(entry['recipes'])
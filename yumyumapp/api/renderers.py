@@ -0,0 +1,71 @@
+"""
+JSON renderer backed by orjson when it is installed.
+
+FastJSONRenderer is a drop-in replacement for DRF's JSONRenderer that
+produces the same bytes. orjson only gets the cases where its output is known
+to match: compact, UTF-8 output without indentation. It also has to be
+corrected in two places:
+  - U+2028/U+2029 are escaped afterwards, as DRF does.
+  - Floats that Python writes in exponent notation (>= 1e16, < 1e-4) are
+    formatted differently by orjson. Output that may contain one is rendered
+    again by DRF (see _python_formats_differently).
+Anything orjson can't encode natively (datetimes, Decimals, lazy strings, ...)
+goes through DRF's encoder. One remaining difference: NaN and Infinity render
+as null instead of raising.
+"""
+import re
+
+from rest_framework.renderers import JSONRenderer
+
+from .metrics import timed
+
+try:
+    import orjson
+except ImportError:  # Optional: DRF's renderer is used as is
+    orjson = None
+
+_EXPONENT = re.compile(rb'e[-\d]')
+
+
+def _python_formats_differently(ret):
+    """
+    Whether orjson's output may hold a float Python would write differently:
+    one in exponent notation, or a fixed-notation one below 1e-4 (which Python
+    writes as 1e-05). Matches inside strings only cause a needless fallback.
+    Kept to a substring test and a literal-led regex: matching whole numbers
+    over the output costs more than orjson saves.
+    """
+    if b'0.0000' in ret:
+        return True
+    for match in _EXPONENT.finditer(ret):
+        if ret[match.start() - 1:match.start()].isdigit():
+            return True
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('serialize'):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type, renderer_context):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except orjson.JSONEncodeError:
+            # Non-string dict keys, integers beyond 64 bits, ...
+            return super().render(data, accepted_media_type, renderer_context)
+        if _python_formats_differently(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'\xe2\x80' in ret:
+            # Lead bytes of U+2028/U+2029 in UTF-8
+            ret = ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+        return ret
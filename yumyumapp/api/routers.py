@@ -0,0 +1,71 @@
+"""
+Read replica routing.
+
+When DATABASES has a "replica" (DATABASE_REPLICA_URL), ReplicaRouter sends
+the reads of views decorated with replica_reads there. Every other query
+goes to the primary: all writes, and the reads of every other view,
+authentication included, so a token handed out a moment ago is always found.
+
+A replica lags behind. After a user changes their fridge, pin_primary keeps
+their reads on the primary for REPLICA_LAG seconds, so they never see their
+own change undone (or get it cached under the new ETag).
+"""
+import functools
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+REPLICA = 'replica'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def _pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def pin_primary(user_id):
+    """
+    Keep the user's reads on the primary for the next REPLICA_LAG seconds.
+    """
+    if replica_configured():
+        cache.set(_pin_key(user_id), True, settings.REPLICA_LAG)
+
+
+def replica_reads(view):
+    """
+    Decorator for function views (inside @api_view): run the view's reads on the replica.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not replica_configured() or cache.get(_pin_key(request.user.id)):
+            return view(request, *args, **kwargs)
+        token = _replica_reads.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and replica_configured():
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema by replication
+        return db != REPLICA
@@ -18,4 +18,42 @@ class FridgeSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Fridge
-        fields = ['id', 'name', 'items']
\ No newline at end of file
+        fields = ['id', 'name', 'items']
+
+
+class FridgeSummarySerializer(serializers.ModelSerializer):
+    """
+    Serializer for a fridge without its items, as listed by the fridges endpoint.
+    Expects the queryset to be annotated with item_count.
+    """
+    item_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Fridge
+        fields = ['id', 'name', 'item_count']
+
+
+
+# --- Fast path for the hot read endpoints ---
+# Same output as FridgeSerializer/FridgeItemSerializer, built straight from
+# values_list() tuples instead of model instances and per-field to_representation().
+
+def fridge_item_data(item):
+    """
+    FridgeItemSerializer(item).data without the serializer.
+    """
+    return {'id': item.id, 'name': item.name, 'quantity': item.quantity}
+
+
+def fridge_data(fridge):
+    """
+    FridgeSerializer(fridge).data from a single values_list query over the items.
+    """
+    return {
+        'id': fridge.id,
+        'name': fridge.name,
+        'items': [
+            {'id': item_id, 'name': name, 'quantity': quantity}
+            for item_id, name, quantity in fridge.items.values_list('id', 'name', 'quantity')
+        ],
+    }
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .fridges import forget_default_fridge, fridge_changed, fridge_changes_deferred, invalidate_fridge_cache
+from .models import Fridge, FridgeItem
+
+
+@receiver(post_save, sender=Fridge)
+def fridge_saved(sender, instance, created, **kwargs):
+    if created:
+        invalidate_fridge_cache(instance.user_id)
+    else:
+        # A renamed fridge may have been (or become) the default one
+        forget_default_fridge(instance.user_id)
+        fridge_changed(instance.pk, instance.user_id)
+
+
+@receiver(post_delete, sender=Fridge)
+def fridge_deleted(sender, instance, **kwargs):
+    forget_default_fridge(instance.user_id)
+    invalidate_fridge_cache(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=FridgeItem)
+def fridge_item_changed(sender, instance, **kwargs):
+    if fridge_changes_deferred(instance.fridge_id):
+        return
+    # The user comes for free when the fridge was loaded along with the item
+    user_id = instance.fridge.user_id if FridgeItem.fridge.is_cached(instance) else None
+    fridge_changed(instance.fridge_id, user_id)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    # Logout and rotation: the key must stop working right away
+    token_cache.delete(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, created, **kwargs):
+    # Deactivation or profile changes: drop the cached copy of the user
+    if not created:
+        for key in Token.objects.filter(user_id=instance.pk).values_list('key', flat=True):
+            token_cache.delete(key)
@@ -0,0 +1,363 @@
+"""
+HTTP client for the Spoonacular API.
+
+All sync views share one ``SpoonacularClient`` (see ``get_client``); the async
+views use an ``AsyncSpoonacularClient`` per event loop. Both keep a pooled
+keep-alive session, apply connect/read timeouts to every call, retry transient
+failures with jittered exponential backoff, and trip a circuit breaker so that
+an unhealthy upstream fails fast instead of tying up a worker for every request.
+The API key comes from SPOONACULAR["API_KEY"] (env SPOONACULAR_API_KEY), and
+the shared clients report the quota headers of every response to
+api.quota.spoonacular_quota.
+"""
+import asyncio
+import random
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from django.conf import settings
+from django.core import checks
+from requests.adapters import HTTPAdapter
+
+from .metrics import registry, timed
+
+DEFAULTS = {
+    'BASE_URL': 'https://api.spoonacular.com',
+    'API_KEY': None,
+    'CONNECT_TIMEOUT': 3.05,  # Seconds to establish the TCP/TLS connection
+    'READ_TIMEOUT': 10,  # Seconds to wait for the response
+    'MAX_RETRIES': 2,  # Extra attempts after the first one
+    'BACKOFF_BASE': 0.25,  # Seconds; attempt n sleeps up to BACKOFF_BASE * 2**n
+    'BACKOFF_MAX': 2.0,
+    'POOL_MAXSIZE': 10,  # Keep-alive connections kept per host
+    'BREAKER_THRESHOLD': 5,  # Consecutive failures before the circuit opens
+    'BREAKER_RESET': 30,  # Seconds the circuit stays open before a trial call
+}
+
+# Upstream statuses worth retrying; anything else is returned to the caller as-is
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class SpoonacularError(Exception):
+    """
+    Spoonacular answered with a non-200 status that retrying won't fix (e.g. 402 quota exceeded).
+    """
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class UpstreamUnavailable(SpoonacularError):
+    """
+    Spoonacular could not be reached, timed out, kept failing, or the circuit is open.
+    """
+
+    def __init__(self, message, status_code=503):
+        super().__init__(message, status_code)
+
+
+class CircuitBreaker:
+    """
+    Classic closed -> open -> half-open breaker counting consecutive failures.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def acquire(self):
+        """
+        CLOSED or HALF_OPEN if a call may go out, None if not. While half-open
+        only a single trial call is let through, which must end with
+        record_success(), record_failure() or end_trial().
+        """
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return state
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return state
+            return None
+
+    def allow_request(self):
+        """
+        True if a call may go out. While half-open only a single trial call is let through.
+        """
+        return self.acquire() is not None
+
+    def end_trial(self):
+        """
+        Let another trial through after one that recorded no outcome (it was
+        cancelled, or failed in a way that says nothing about the upstream).
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                # A failed trial call re-opens the circuit for another full period
+                self._opened_at = self._clock()
+
+
+def check_api_key(app_configs, **kwargs):
+    """
+    System check: without a key every Spoonacular call is refused with a 401.
+    """
+    from .recipes import LOCAL, recipe_source
+
+    config = {**DEFAULTS, **getattr(settings, 'SPOONACULAR', {})}
+    # The tests and benchmarks talk to the stub, which needs no key
+    if config['API_KEY'] or getattr(settings, 'TESTING', False) or recipe_source() == LOCAL:
+        return []
+    return [checks.Warning(
+        'SPOONACULAR["API_KEY"] is not set, so recipe searches will fail.',
+        hint='Set the SPOONACULAR_API_KEY environment variable, or RECIPE_SOURCE=local.',
+        id='api.W001',
+    )]
+
+
+def _request_failed(exc):
+    # Only the exception type: its text has the URL, and with it the API key
+    return UpstreamUnavailable(f'Spoonacular request failed: {type(exc).__name__}')
+
+
+class BaseSpoonacularClient:
+    """
+    Configuration, backoff and response handling shared by the sync and async clients.
+    """
+
+    def __init__(self, base_url=None, api_key=None, connect_timeout=None, read_timeout=None,
+                 max_retries=None, backoff_base=None, backoff_max=None, pool_maxsize=None, breaker=None,
+                 quota=None):
+        config = {**DEFAULTS, **getattr(settings, 'SPOONACULAR', {})}
+        self.base_url = (base_url or config['BASE_URL']).rstrip('/')
+        self.api_key = api_key or config['API_KEY']
+        self.connect_timeout = config['CONNECT_TIMEOUT'] if connect_timeout is None else connect_timeout
+        self.read_timeout = config['READ_TIMEOUT'] if read_timeout is None else read_timeout
+        self.max_retries = config['MAX_RETRIES'] if max_retries is None else max_retries
+        self.backoff_base = config['BACKOFF_BASE'] if backoff_base is None else backoff_base
+        self.backoff_max = config['BACKOFF_MAX'] if backoff_max is None else backoff_max
+        self.pool_maxsize = config['POOL_MAXSIZE'] if pool_maxsize is None else pool_maxsize
+        self.breaker = breaker or CircuitBreaker(config['BREAKER_THRESHOLD'], config['BREAKER_RESET'])
+        self.quota = quota
+
+    def backoff(self, attempt):
+        """
+        Full-jitter exponential backoff: a random delay in [0, min(max, base * 2**attempt)].
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _check_circuit(self):
+        """
+        Raise if the circuit is open; return True if this call is the half-open trial.
+        """
+        state = self.breaker.acquire()
+        if state is None:
+            raise UpstreamUnavailable('Spoonacular is unavailable (circuit open).')
+        return state == CircuitBreaker.HALF_OPEN
+
+    def _response_error(self, response):
+        """
+        None for a usable response. Raises SpoonacularError for a final refusal
+        and returns the error to raise if a retryable status persists.
+        """
+        if self.quota is not None:
+            self.quota.record(response.headers)
+        status_code = response.status_code
+        if status_code == 200:
+            self.breaker.record_success()
+            return None
+        if status_code not in RETRY_STATUSES:
+            # The upstream is healthy, it just refused this request
+            self.breaker.record_success()
+            raise SpoonacularError('Failed to fetch recipes from Spoonacular.', status_code)
+        return UpstreamUnavailable('Failed to fetch recipes from Spoonacular.', status_code)
+
+    @staticmethod
+    def _find_by_ingredients_params(ingredients, params):
+        return {**params, 'ingredients': ','.join(ingredients)}
+
+
+class SpoonacularClient(BaseSpoonacularClient):
+    """
+    Blocking client used by the regular (WSGI) views.
+    """
+
+    def __init__(self, *args, sleep=time.sleep, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timeout = (self.connect_timeout, self.read_timeout)
+        self._sleep = sleep
+        self.session = requests.Session()
+        # Retries are handled in _get so they share the backoff and breaker logic
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def close(self):
+        self.session.close()
+
+    def _get(self, path, params):
+        trial = self._check_circuit()
+        try:
+            params = {**params, 'apiKey': self.api_key}
+            error = None
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    self._sleep(self.backoff(attempt - 1))
+                registry.inc('spoonacular_requests_total')
+                try:
+                    response = self.session.get(f'{self.base_url}{path}', params=params, timeout=self.timeout)
+                except requests.RequestException as exc:
+                    error = _request_failed(exc)
+                    continue
+
+                error = self._response_error(response)
+                if error is None:
+                    return response
+
+            self.breaker.record_failure()
+            raise error
+        finally:
+            if trial:
+                self.breaker.end_trial()
+
+    def find_by_ingredients(self, ingredients, **params):
+        """
+        Call /recipes/findByIngredients and return the decoded list of recipes.
+        """
+        params = self._find_by_ingredients_params(ingredients, params)
+        with timed('spoonacular'):
+            return self._get('/recipes/findByIngredients', params).json()
+
+
+class AsyncSpoonacularClient(BaseSpoonacularClient):
+    """
+    Non-blocking client for the async (ASGI) views, built on an httpx.AsyncClient.
+    An instance must only be used from the event loop it was created on.
+    """
+
+    def __init__(self, *args, sleep=asyncio.sleep, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sleep = sleep
+        self.session = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(max_connections=self.pool_maxsize, max_keepalive_connections=self.pool_maxsize),
+        )
+
+    async def aclose(self):
+        await self.session.aclose()
+
+    async def _get(self, path, params):
+        trial = self._check_circuit()
+        try:
+            params = {**params, 'apiKey': self.api_key}
+            error = None
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    await self._sleep(self.backoff(attempt - 1))
+                registry.inc('spoonacular_requests_total')
+                try:
+                    response = await self.session.get(f'{self.base_url}{path}', params=params)
+                except httpx.HTTPError as exc:
+                    error = _request_failed(exc)
+                    continue
+
+                error = self._response_error(response)
+                if error is None:
+                    return response
+
+            self.breaker.record_failure()
+            raise error
+        finally:
+            if trial:
+                self.breaker.end_trial()
+
+    async def find_by_ingredients(self, ingredients, **params):
+        """
+        Call /recipes/findByIngredients and return the decoded list of recipes.
+        """
+        params = self._find_by_ingredients_params(ingredients, params)
+        with timed('spoonacular'):
+            response = await self._get('/recipes/findByIngredients', params)
+            return response.json()
+
+
+_client = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+_breaker = None
+
+
+def _shared_breaker():
+    # Sync and async clients talk to the same upstream, so they trip together
+    global _breaker
+    if _breaker is None:
+        config = {**DEFAULTS, **getattr(settings, 'SPOONACULAR', {})}
+        _breaker = CircuitBreaker(config['BREAKER_THRESHOLD'], config['BREAKER_RESET'])
+    return _breaker
+
+
+def get_client():
+    """
+    Process-wide shared client, so every request reuses the same connection pool.
+    """
+    global _client
+    if _client is None:
+        from .quota import spoonacular_quota  # api.quota imports this module
+
+        with _client_lock:
+            if _client is None:
+                _client = SpoonacularClient(breaker=_shared_breaker(), quota=spoonacular_quota)
+    return _client
+
+
+def get_async_client():
+    """
+    Shared async client for the running event loop (one per loop, since
+    httpx connection pools are bound to the loop that created them).
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        from .quota import spoonacular_quota
+
+        with _client_lock:
+            client = _async_clients.get(loop)
+            if client is None:
+                client = _async_clients[loop] = AsyncSpoonacularClient(breaker=_shared_breaker(),
+                                                                       quota=spoonacular_quota)
+    return client
@@ -0,0 +1,255 @@
+import datetime
+import importlib.util
+import threading
+import unittest
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from rest_framework.throttling import SimpleRateThrottle
+
+from .authentication import CachedTokenAuthentication, token_cache
+from .hashers import PBKDF2PasswordHasher
+from .hashing import HashingPool, PoolSaturated, hashing_pool
+from .testing import clear_caches
+
+
+class CachedTokenAuthenticationTestCase(APITestCase):
+    # Rejected credentials get a 403: SessionAuthentication comes first in DEFAULT_AUTHENTICATION_CLASSES
+
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='cook', password='testpassword', email='cook@example.com',
+                                             first_name='Cook')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('profile')
+
+    def test_cached_token_skips_the_database(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['user'], {'id': self.user.id, 'email': 'cook@example.com', 'name': 'Cook'})
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(token_cache.stats()['hits'], 1)
+
+    def test_password_is_not_cached_but_still_readable(self):
+        self.client.get(self.url)
+        self.assertNotIn(self.user.password, str(token_cache.get(self.token.key)))
+
+        # A cached user loads its (deferred) password hash when asked
+        user, _ = CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        self.assertTrue(user.check_password('testpassword'))
+
+    def test_logout_revokes_the_cached_token(self):
+        self.client.get(self.url)
+        self.client.post(reverse('logout'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_revocation_reaches_other_workers(self):
+        self.client.get(self.url)
+        # Another worker logs the user out: only the shared tier is reachable from there
+        with patch.object(token_cache.local, 'delete'):
+            self.token.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_deactivation_revokes_the_cached_token(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_profile_changes_are_seen(self):
+        self.client.get(self.url)
+        self.user.first_name = 'Chef'
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).data['user']['name'], 'Chef')
+
+    def test_unknown_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token nope')
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    @override_settings(TOKEN_AUTH={'EXPIRY': 3600})
+    def test_expired_token_is_rejected_even_when_cached(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        later = timezone.now() + datetime.timedelta(hours=2)
+        with patch('api.authentication.timezone.now', return_value=later):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(str(response.data['detail']), 'Token has expired.')
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+
+    @override_settings(TOKEN_AUTH={'EXPIRY': 3600})
+    def test_login_replaces_an_expired_token(self):
+        Token.objects.filter(pk=self.token.pk).update(created=timezone.now() - datetime.timedelta(hours=2))
+        response = self.client.post(reverse('login'), {'email': 'cook@example.com', 'password': 'testpassword'},
+                                    format='json')
+        self.assertNotEqual(response.data['token'], self.token.key)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + response.data['token'])
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_login_keeps_a_valid_token(self):
+        response = self.client.post(reverse('login'), {'email': 'cook@example.com', 'password': 'testpassword'},
+                                    format='json')
+        self.assertEqual(response.data['token'], self.token.key)
+
+    def test_rotation(self):
+        self.client.get(self.url)
+        response = self.client.post(reverse('rotate_token'))
+        new_key = response.data['token']
+        self.assertNotEqual(new_key, self.token.key)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + new_key)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+
+FAST_HASHER = 'django.contrib.auth.hashers.MD5PasswordHasher'
+
+
+class LoginTestCase(APITestCase):
+    def setUp(self):
+        clear_caches()
+        self.url = reverse('login')
+        self.credentials = {'email': 'cook@example.com', 'password': 'testpassword'}
+
+    def create_user(self, **kwargs):
+        return User.objects.create_user(username='cook', password='testpassword', email='cook@example.com', **kwargs)
+
+    def login(self, **credentials):
+        return self.client.post(self.url, {**self.credentials, **credentials}, format='json')
+
+    def test_user_is_looked_up_once(self):
+        self.create_user()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum('FROM "auth_user"' in query['sql'] for query in queries), 1)
+
+    def test_invalid_credentials(self):
+        self.create_user()
+        self.assertEqual(self.login(password='wrong').status_code, 401)
+        self.assertEqual(self.login(email='nobody@example.com').status_code, 401)
+
+    def test_inactive_user_cannot_log_in(self):
+        self.create_user(is_active=False)
+        self.assertEqual(self.login().status_code, 401)
+
+    def test_email_is_indexed(self):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, User._meta.db_table)
+        self.assertEqual(constraints['auth_user_email_idx']['columns'], ['email'])
+
+    def test_login_rehashes_with_the_preferred_hasher(self):
+        with override_settings(PASSWORD_HASHERS=[FAST_HASHER]):
+            user = self.create_user()
+        with override_settings(PASSWORD_HASHERS=['api.hashers.ScryptPasswordHasher', FAST_HASHER]):
+            self.assertEqual(self.login().status_code, 200)
+            user.refresh_from_db()
+            self.assertTrue(user.password.startswith('scrypt$'))
+            self.assertEqual(self.login().status_code, 200)
+
+    def test_login_rehashes_when_the_cost_changes(self):
+        with patch.object(PBKDF2PasswordHasher, 'iterations', 1000):
+            user = self.create_user()
+        self.assertEqual(self.login().status_code, 200)
+        user.refresh_from_db()
+        self.assertEqual(user.password.split('$')[1], str(PBKDF2PasswordHasher.iterations))
+
+    @unittest.skipUnless(importlib.util.find_spec('argon2'), 'argon2-cffi is not installed')
+    def test_argon2(self):
+        with override_settings(PASSWORD_HASHERS=['api.hashers.Argon2PasswordHasher', FAST_HASHER]):
+            user = self.create_user()
+            self.assertTrue(user.password.startswith('argon2$'))
+            self.assertEqual(self.login().status_code, 200)
+
+
+@override_settings(PASSWORD_HASHERS=[FAST_HASHER])
+class HashingAdmissionTestCase(APITestCase):
+    def setUp(self):
+        clear_caches()
+        User.objects.create_user(username='cook', password='testpassword', email='cook@example.com')
+        self.url = reverse('login')
+
+    def login(self, email='cook@example.com', password='testpassword', ip='10.0.0.1'):
+        return self.client.post(self.url, {'email': email, 'password': password}, format='json', REMOTE_ADDR=ip)
+
+    def test_pool_runs_jobs_on_its_own_threads(self):
+        pool = HashingPool(workers=1, max_pending=0, retry_after=1)
+        self.assertNotEqual(pool.run(threading.get_ident), threading.get_ident())
+
+    def test_pool_rejects_beyond_its_limit(self):
+        pool = HashingPool(workers=1, max_pending=0, retry_after=1)
+        started, release = threading.Event(), threading.Event()
+
+        def job():
+            started.set()
+            release.wait()
+
+        worker = threading.Thread(target=pool.run, args=(job,))
+        worker.start()
+        started.wait()
+        with self.assertRaises(PoolSaturated):
+            pool.run(int)
+        release.set()
+        worker.join()
+        self.assertEqual(pool.run(int, '7'), 7)
+        self.assertEqual(pool.rejected, 1)
+
+    def test_saturated_pool_answers_429(self):
+        with patch.object(hashing_pool, 'limit', 0):
+            response = self.login()
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response['Retry-After'], str(hashing_pool.retry_after))
+            response = self.client.post(reverse('register'), {'email': 'new@example.com', 'password': 'pw'},
+                                        format='json')
+            self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.login().status_code, 200)
+
+    @patch.object(SimpleRateThrottle, 'THROTTLE_RATES', {'password_ip': '100/min', 'login_email': '2/min'})
+    def test_login_attempts_are_limited_per_email(self):
+        self.assertEqual(self.login(password='wrong', ip='10.0.0.1').status_code, 401)
+        self.assertEqual(self.login(password='wrong', ip='10.0.0.2').status_code, 401)
+        response = self.login(email='COOK@example.com', ip='10.0.0.3')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.login(email='other@example.com').status_code, 401)
+
+    @patch.object(SimpleRateThrottle, 'THROTTLE_RATES', {'password_ip': '2/min', 'login_email': '100/min'})
+    def test_login_attempts_are_limited_per_ip(self):
+        self.assertEqual(self.login(email='a@example.com').status_code, 401)
+        self.assertEqual(self.login(email='b@example.com').status_code, 401)
+        self.assertEqual(self.login().status_code, 429)
+        self.assertEqual(self.login(ip='10.0.0.2').status_code, 200)
+
+    @patch.object(SimpleRateThrottle, 'THROTTLE_RATES', {'password_ip': '2/min', 'login_email': '100/min'})
+    def test_forwarded_for_does_not_dodge_the_ip_limit(self):
+        statuses = [
+            self.client.post(self.url, {'email': f'{n}@example.com', 'password': 'wrong'}, format='json',
+                             REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'192.0.2.{n}').status_code
+            for n in range(3)
+        ]
+        self.assertEqual(statuses, [401, 401, 429])
+
+
+class AsyncTokenCacheTestCase(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='cook', password='testpassword')
+        self.token = Token.objects.create(user=self.user)
+        self.url = reverse('find_recipes_by_ingredients_async')
+        self.headers = {'Authorization': 'Token ' + self.token.key}
+
+    async def test_async_views_share_the_cache(self):
+        response = await self.async_client.get(self.url, headers=self.headers)
+        self.assertEqual(response.status_code, 400)  # authenticated, empty fridge
+        self.assertIsNotNone(await token_cache.aget(self.token.key))
+
+        await self.token.adelete()
+        response = await self.async_client.get(self.url, headers=self.headers)
+        self.assertEqual(response.status_code, 403)
@@ -1,12 +1,31 @@
+import io
+import threading
+from unittest.mock import patch
+
 from django.contrib.auth.models import User
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
 from rest_framework.authtoken.models import Token
+from django.core.management import call_command
 from django.urls import reverse
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from .fridges import (
+    DEFAULT_FRIDGE_NAME, default_fridge_id, default_fridge_ids, fridge_cache, fridge_cache_key, fridge_etag,
+    invalidate_fridge_cache,
+)
+from .models import Fridge, FridgeItem
+from .recipes import RecipeResult
+from .testing import clear_caches
+from .views import MAX_BULK_ITEMS
 
 
 class FridgeAPITestCase(APITestCase):
     def setUp(self):
         # Create a test user
+        clear_caches()
         self.user = User.objects.create_user(username='testuser', password='testpassword', email='test@example.com')
         # Get a token for the user
         self.token = Token.objects.create(user=self.user)
@@ -63,3 +82,606 @@ class FridgeAPITestCase(APITestCase):
         view_url = reverse('fridge')
         response = self.client.get(view_url, format='json')
         self.assertEqual(len(response.data['items']), 0)
+
+
+class BulkFridgeAPITestCase(APITestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='testuser', password='testpassword', email='test@example.com')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('bulk_add_fridge_items')
+
+    def post_bulk(self, items):
+        return self.client.post(self.url, items, format='json')
+
+    def quantities(self):
+        return dict(FridgeItem.objects.filter(fridge__user=self.user).values_list('name', 'quantity'))
+
+    def test_bulk_add_merges_duplicates_and_existing_items(self):
+        """
+        Duplicate names in a batch are merged and added to existing items case-insensitively.
+        """
+        self.client.post(reverse('add_fridge_item'), {'name': 'Milk', 'quantity': 1}, format='json')
+        response = self.post_bulk([
+            {'name': 'milk', 'quantity': 2},
+            {'name': 'Eggs', 'quantity': 6},
+            {'name': 'EGGS', 'quantity': 6},
+            {'name': 'Bread'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantities(), {'Milk': 3, 'Eggs': 12, 'Bread': 1})
+
+        results = {item['name']: item for item in response.data['items']}
+        self.assertEqual(len(results), 3)
+        self.assertFalse(results['Milk']['created'])
+        self.assertEqual(results['Milk']['quantity'], 3)
+        self.assertTrue(results['Eggs']['created'])
+        self.assertEqual(results['Eggs']['added'], 12)
+        self.assertEqual(results['Eggs']['id'], FridgeItem.objects.get(name='Eggs').id)
+
+    def test_bulk_add_accepts_items_key(self):
+        response = self.post_bulk({'items': [{'name': 'Butter', 'quantity': 2}]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantities(), {'Butter': 2})
+
+    def test_invalid_entry_rejects_whole_batch(self):
+        response = self.post_bulk([{'name': 'Milk', 'quantity': 2}, {'quantity': 1}, {'name': 'Jam', 'quantity': 'x'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data['errors']), {1, 2})
+        self.assertEqual(self.quantities(), {})
+
+    def test_empty_or_oversized_batch(self):
+        self.assertEqual(self.post_bulk([]).status_code, 400)
+        too_many = [{'name': f'item {n}'} for n in range(MAX_BULK_ITEMS + 1)]
+        self.assertEqual(self.post_bulk(too_many).status_code, 400)
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        """
+        A batch costs the same number of queries whether it has 2 or MAX_BULK_ITEMS items.
+        """
+        self.post_bulk([{'name': 'warmup'}])  # Token/fridge rows exist for both measurements
+
+        with CaptureQueriesContext(connection) as small:
+            self.post_bulk([{'name': 'Milk'}, {'name': 'Eggs'}])
+        with CaptureQueriesContext(connection) as large:
+            self.post_bulk([{'name': f'Item {n}', 'quantity': n + 1} for n in range(MAX_BULK_ITEMS)])
+
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(len(self.quantities()), MAX_BULK_ITEMS + 3)
+
+
+class AtomicAddFridgeItemTestCase(APITransactionTestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='testuser', password='testpassword', email='test@example.com')
+        self.token = Token.objects.create(user=self.user)
+        self.fridge = Fridge.objects.create(user=self.user, name='Main Fridge')
+
+    def test_add_quantity_is_a_single_statement(self):
+        """
+        Topping up an existing item is one UPDATE; creating one is at most two statements.
+        """
+        with CaptureQueriesContext(connection) as created_queries:
+            item, created = FridgeItem.objects.add_quantity(self.fridge, 'Milk', 2)
+        self.assertTrue(created)
+        with CaptureQueriesContext(connection) as updated_queries:
+            item, created = FridgeItem.objects.add_quantity(self.fridge, 'MILK', 3)
+        self.assertFalse(created)
+        self.assertEqual((item.name, item.quantity), ('Milk', 5))
+        self.assertLessEqual(len(created_queries), 2)
+        self.assertEqual(len(updated_queries), 1)
+
+    def test_add_quantities_adds_to_rows_it_did_not_know_about(self):
+        """
+        The batch is added to what is stored when it runs, e.g. a row created concurrently.
+        """
+        FridgeItem.objects.create(fridge=self.fridge, name='Milk', quantity=5)
+        items = FridgeItem.objects.add_quantities(self.fridge, {'eggs': ('Eggs', 6), 'milk': ('milk', 2)})
+        self.assertEqual([(item.name, item.quantity) for item in items], [('Eggs', 6), ('Milk', 7)])
+        self.assertEqual(FridgeItem.objects.get(normalized_name='milk').quantity, 7)
+
+    def test_add_endpoint_query_count(self):
+        """
+        token lookup + fridge lookup + one atomic increment + fridge version bump
+        """
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        FridgeItem.objects.create(fridge=self.fridge, name='Milk', quantity=1)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('add_fridge_item'), {'name': 'milk', 'quantity': 2}, format='json')
+        self.assertEqual(response.data['quantity'], 3)
+        self.assertEqual(len(queries), 4)
+
+    def test_concurrent_adds_do_not_lose_updates(self):
+        """
+        Threads hammering the same item: the final quantity equals the sum of every successful add.
+        """
+        FridgeItem.objects.create(fridge=self.fridge, name='Eggs', quantity=1)
+        successes = []
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                done = 0
+                for _ in range(25):
+                    try:
+                        FridgeItem.objects.add_quantity(self.fridge, 'eggs', 1)
+                        done += 1
+                    except OperationalError:
+                        # SQLite may refuse a write while another one holds the lock
+                        pass
+                with lock:
+                    successes.append(done)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertGreater(sum(successes), 0)
+        self.assertEqual(FridgeItem.objects.get(fridge=self.fridge).quantity, 1 + sum(successes))
+
+
+class NormalizedNameTestCase(APITestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='testuser', password='testpassword', email='test@example.com')
+        self.fridge = Fridge.objects.create(user=self.user, name='Main Fridge')
+
+    def test_normalized_name_is_set_on_save(self):
+        item = FridgeItem.objects.create(fridge=self.fridge, name='  Green   Apples ')
+        self.assertEqual(item.normalized_name, 'green apples')
+        item.name = 'Red Apples'
+        item.save(update_fields=['name'])
+        item.refresh_from_db()
+        self.assertEqual(item.normalized_name, 'red apples')
+
+    def test_case_variants_cannot_coexist(self):
+        FridgeItem.objects.create(fridge=self.fridge, name='Milk')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            FridgeItem.objects.create(fridge=self.fridge, name='milk')
+
+    def test_add_merges_spelling_variants(self):
+        FridgeItem.objects.add_quantity(self.fridge, 'Green Apples', 2)
+        item, created = FridgeItem.objects.add_quantity(self.fridge, ' green  APPLES', 3)
+        self.assertFalse(created)
+        self.assertEqual((item.name, item.quantity), ('Green Apples', 5))
+
+
+class NormalizedNameMigrationTestCase(TransactionTestCase):
+    migrate_from = [('api', '0002_recipe_catalog')]
+    migrate_to = [('api', '0003_fridgeitem_normalized_name')]
+
+    def test_existing_duplicates_are_merged(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        old_apps = executor.loader.project_state(self.migrate_from).apps
+        OldUser = old_apps.get_model('auth', 'User')
+        OldFridge = old_apps.get_model('api', 'Fridge')
+        OldFridgeItem = old_apps.get_model('api', 'FridgeItem')
+        user = OldUser.objects.create(username='legacy')
+        fridge = OldFridge.objects.create(user=user, name='Main Fridge')
+        OldFridgeItem.objects.create(fridge=fridge, name='Milk', quantity=1)
+        OldFridgeItem.objects.create(fridge=fridge, name='milk ', quantity=2)
+        OldFridgeItem.objects.create(fridge=fridge, name='Eggs', quantity=6)
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.migrate_to)
+        new_apps = executor.loader.project_state(self.migrate_to).apps
+        NewFridgeItem = new_apps.get_model('api', 'FridgeItem')
+        self.assertEqual(
+            sorted(NewFridgeItem.objects.values_list('name', 'normalized_name', 'quantity')),
+            [('Eggs', 'eggs', 6), ('Milk', 'milk', 3)],
+        )
+
+        # Back to the latest schema for the rest of the suite
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+
+class FridgeCacheTestCase(APITestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='testuser', password='testpassword', email='test@example.com')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.view_url = reverse('fridge')
+
+    def contents(self):
+        response = self.client.get(self.view_url)
+        return {item['name']: item['quantity'] for item in response.data['items']}
+
+    def add(self, name, quantity=1):
+        return self.client.post(reverse('add_fridge_item'), {'name': name, 'quantity': quantity}, format='json')
+
+    def test_hot_read_does_not_touch_the_fridge_tables(self):
+        """
+        After the first read neither the token nor the fridge hits the database.
+        """
+        self.add('Milk')
+        self.client.get(self.view_url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.view_url)
+        self.assertEqual(response.data['items'][0]['name'], 'Milk')
+        self.assertEqual(len(queries), 0)
+
+        stats = fridge_cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_every_mutation_invalidates(self):
+        self.assertEqual(self.contents(), {})
+
+        milk_id = self.add('Milk', 2).data['id']
+        self.assertEqual(self.contents(), {'Milk': 2})
+
+        self.add('milk', 1)
+        self.assertEqual(self.contents(), {'Milk': 3})
+
+        self.client.post(reverse('bulk_add_fridge_items'), [{'name': 'Eggs', 'quantity': 6}], format='json')
+        self.assertEqual(self.contents(), {'Milk': 3, 'Eggs': 6})
+
+        self.client.patch(reverse('update_fridge_item_quantity', kwargs={'item_id': milk_id}),
+                          {'quantity': 7}, format='json')
+        self.assertEqual(self.contents(), {'Milk': 7, 'Eggs': 6})
+
+        self.client.delete(reverse('remove_fridge_item', kwargs={'item_id': milk_id}))
+        self.assertEqual(self.contents(), {'Eggs': 6})
+
+        self.client.delete(reverse('clear_fridge'))
+        self.assertEqual(self.contents(), {})
+
+    def test_direct_model_writes_invalidate_through_signals(self):
+        self.add('Milk')
+        self.contents()
+        item = FridgeItem.objects.get(name='Milk')  # fridge not loaded: the signal looks the user up
+        item.quantity = 9
+        item.save()
+        self.assertEqual(self.contents(), {'Milk': 9})
+        item.delete()
+        self.assertEqual(self.contents(), {})
+
+    def test_other_processes_see_the_invalidation(self):
+        """
+        Another worker's in-process tier can't serve a payload from before the write.
+        """
+        self.add('Milk')
+        stale_key = fridge_cache_key(self.user.id)
+        self.contents()
+        self.assertIn(stale_key, fridge_cache.local)
+
+        FridgeItem.objects.filter(fridge__user=self.user).update(quantity=5)
+        invalidate_fridge_cache(self.user.id)
+        self.assertNotEqual(fridge_cache_key(self.user.id), stale_key)
+        self.assertEqual(self.contents(), {'Milk': 5})
+
+    def test_invalidated_again_on_commit(self):
+        """
+        A read that lands between the write and its commit is discarded once the transaction commits.
+        """
+        self.add('Milk')
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                FridgeItem.objects.filter(fridge__user=self.user).update(quantity=4)
+                invalidate_fridge_cache(self.user.id)
+                racing_key = fridge_cache_key(self.user.id)
+        self.assertNotEqual(fridge_cache_key(self.user.id), racing_key)
+
+
+class ConditionalFridgeTestCase(APITestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='testuser', password='testpassword', email='test@example.com')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.view_url = reverse('fridge')
+        self.client.post(reverse('add_fridge_item'), {'name': 'Milk', 'quantity': 1}, format='json')
+
+    def get(self, etag=None):
+        if etag is None:
+            return self.client.get(self.view_url)
+        return self.client.get(self.view_url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_etag_is_the_fridge_version(self):
+        response = self.get()
+        fridge = Fridge.objects.get(user=self.user)
+        self.assertEqual(response['ETag'], fridge_etag(fridge))
+        self.assertEqual(response['ETag'], f'"{fridge.pk}-{fridge.version}"')
+
+    def test_matching_etag_gets_304(self):
+        etag = self.get()['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(len(queries), 0)  # the token and the payload are both cached
+
+        self.assertEqual(self.get(f'"other", W/{etag}').status_code, 304)
+        self.assertEqual(self.get('*').status_code, 304)
+        self.assertEqual(self.get('"0-0"').status_code, 200)
+
+    def test_cold_cache_304_does_not_read_items(self):
+        etag = self.get()['ETag']
+        clear_caches()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any('api_fridgeitem' in query['sql'] for query in queries))
+
+    def test_every_mutation_changes_the_etag(self):
+        seen = [self.get()['ETag']]
+
+        def changed():
+            response = self.get(seen[-1])
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn(response['ETag'], seen)
+            seen.append(response['ETag'])
+
+        milk_id = self.client.post(reverse('add_fridge_item'), {'name': 'milk', 'quantity': 1}, format='json').data['id']
+        changed()
+        self.client.post(reverse('bulk_add_fridge_items'), [{'name': 'Eggs', 'quantity': 6}], format='json')
+        changed()
+        self.client.patch(reverse('update_fridge_item_quantity', kwargs={'item_id': milk_id}),
+                          {'quantity': 5}, format='json')
+        changed()
+        self.client.delete(reverse('remove_fridge_item', kwargs={'item_id': milk_id}))
+        changed()
+        self.client.delete(reverse('clear_fridge'))
+        changed()
+
+        fridge = Fridge.objects.get(user=self.user)
+        fridge.name = 'Main Fridge'
+        fridge.save()
+        changed()
+
+    def test_saving_a_stale_fridge_keeps_the_version(self):
+        stale = Fridge.objects.get(user=self.user)
+        self.client.post(reverse('add_fridge_item'), {'name': 'Eggs', 'quantity': 1}, format='json')
+        version = Fridge.objects.get(pk=stale.pk).version
+        stale.save()
+        self.assertEqual(Fridge.objects.get(pk=stale.pk).version, version + 1)
+
+
+class FridgeItemListTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword', email='test@example.com')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.fridge = Fridge.objects.create(user=self.user, name='Main Fridge')
+        names = ['Apples', 'apricots', 'Bananas', 'Milk', 'milk powder', 'Mint', 'Oats']
+        FridgeItem.objects.bulk_create([
+            FridgeItem(fridge=self.fridge, name=name, normalized_name=name.lower(), quantity=n + 1)
+            for n, name in enumerate(names)
+        ])
+        self.url = reverse('list_fridge_items')
+
+    def walk(self, **params):
+        names = []
+        response = self.client.get(self.url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            names += [item['name'] for item in response.data['results']]
+            if response.data['next'] is None:
+                return names
+            response = self.client.get(response.data['next'])
+
+    def test_pages_cover_every_item_in_name_order(self):
+        expected = list(FridgeItem.objects.filter(fridge=self.fridge).order_by('name', 'id')
+                        .values_list('name', flat=True))
+        for limit in (1, 2, 3, 7, 100):
+            self.assertEqual(self.walk(limit=limit), expected)
+
+    def test_page_shape(self):
+        response = self.client.get(self.url, {'limit': 2})
+        self.assertEqual(response.data['results'][0], {
+            'id': FridgeItem.objects.get(name='Apples').id, 'name': 'Apples', 'quantity': 1,
+        })
+        self.assertIn('cursor=', response.data['next'])
+        self.assertIn('limit=2', response.data['next'])
+
+    def test_sparse_fields(self):
+        response = self.client.get(self.url, {'fields': 'name,quantity', 'limit': 1})
+        self.assertEqual(response.data['results'], [{'name': 'Apples', 'quantity': 1}])
+        response = self.client.get(self.url, {'fields': 'name,owner'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_prefix_filter_is_case_insensitive(self):
+        self.assertEqual(self.walk(prefix='MI', limit=1), ['Milk', 'Mint', 'milk powder'])
+        self.assertEqual(self.walk(prefix='ap'), ['Apples', 'apricots'])
+        self.assertEqual(self.walk(prefix='zz'), [])
+
+    def test_bad_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'not-a-cursor'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'limit': 'ten'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'limit': 0}).status_code, 400)
+
+    def test_only_own_default_fridge(self):
+        other = User.objects.create_user(username='other', password='testpassword')
+        other_fridge = Fridge.objects.create(user=other, name='Main Fridge')
+        FridgeItem.objects.create(fridge=other_fridge, name='Caviar')
+        self.assertNotIn('Caviar', self.walk())
+
+    def test_one_query_per_page(self):
+        next_url = self.client.get(self.url, {'limit': 2}).data['next']
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(next_url)
+        self.assertEqual(len(queries), 1)  # items; the token is cached since the first page
+
+
+class MultiFridgeTestCase(APITestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='testuser', password='testpassword', email='test@example.com')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.main = Fridge.objects.create(user=self.user, name='Main Fridge')
+        self.freezer = Fridge.objects.create(user=self.user, name='Garage Freezer')
+        FridgeItem.objects.create(fridge=self.main, name='Milk', quantity=2)
+        FridgeItem.objects.create(fridge=self.main, name='Eggs', quantity=6)
+        FridgeItem.objects.create(fridge=self.freezer, name='milk', quantity=3)
+        FridgeItem.objects.create(fridge=self.freezer, name='Peas', quantity=1)
+
+    def test_list_and_create(self):
+        response = self.client.get(reverse('fridges'))
+        self.assertEqual(response.data, [
+            {'id': self.main.id, 'name': 'Main Fridge', 'item_count': 2},
+            {'id': self.freezer.id, 'name': 'Garage Freezer', 'item_count': 2},
+        ])
+
+        response = self.client.post(reverse('fridges'), {'name': 'Wine Cooler'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['item_count'], 0)
+        self.assertTrue(Fridge.objects.filter(user=self.user, name='Wine Cooler').exists())
+
+        response = self.client.post(reverse('fridges'), {'name': 'Wine Cooler'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse('fridges'), {'name': ' '}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_address_by_id(self):
+        url = reverse('fridge_detail', kwargs={'fridge_id': self.freezer.id})
+        response = self.client.get(url)
+        self.assertEqual(response.data['name'], 'Garage Freezer')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        add_url = reverse('add_item_to_fridge', kwargs={'fridge_id': self.freezer.id})
+        response = self.client.post(add_url, {'name': 'PEAS', 'quantity': 2}, format='json')
+        self.assertEqual(response.data['quantity'], 3)
+        self.assertEqual(self.client.get(url).data['items'][1]['quantity'], 3)
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(FridgeItem.objects.filter(fridge_id=self.freezer.id).exists())
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_other_users_fridges_are_not_found(self):
+        other = User.objects.create_user(username='other', password='testpassword')
+        theirs = Fridge.objects.create(user=other, name='Main Fridge')
+        self.assertEqual(self.client.get(reverse('fridge_detail', kwargs={'fridge_id': theirs.id})).status_code, 404)
+        response = self.client.post(reverse('add_item_to_fridge', kwargs={'fridge_id': theirs.id}),
+                                    {'name': 'Milk'}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_all_fridges_inventory_is_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('all_fridges_inventory'))
+        self.assertEqual(len(queries), 2)  # token + aggregate
+        self.assertEqual(response.data['items'], [
+            {'name': 'Eggs', 'quantity': 6, 'fridge_count': 1},
+            {'name': 'Milk', 'quantity': 5, 'fridge_count': 2},
+            {'name': 'Peas', 'quantity': 1, 'fridge_count': 1},
+        ])
+
+    @patch('api.views.find_recipes')
+    def test_recipe_search_over_selected_fridges(self, mock_find):
+        mock_find.return_value = RecipeResult([])
+        url = reverse('find_recipes_by_ingredients')
+
+        self.client.get(url)
+        self.assertEqual(sorted(mock_find.call_args[0][0]), ['Eggs', 'Milk'])
+        self.client.get(url, {'fridge': self.freezer.id})
+        self.assertEqual(sorted(mock_find.call_args[0][0]), ['Peas', 'milk'])
+        self.client.get(url, {'fridge': 'all'})
+        self.assertEqual(sorted(mock_find.call_args[0][0]), ['Eggs', 'Milk', 'Peas', 'milk'])
+
+        self.assertEqual(self.client.get(url, {'fridge': 'garage'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'fridge': 999999}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'fridge': 10 ** 20}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'fridge': -1}).status_code, 404)
+        empty = Fridge.objects.create(user=self.user, name='Empty')
+        self.assertEqual(self.client.get(url, {'fridge': empty.id}).status_code, 400)
+
+
+class DefaultFridgeTestCase(APITestCase):
+    def setUp(self):
+        clear_caches()
+        response = self.client.post(reverse('register'), {'email': 'cook@example.com', 'password': 'pw'}, format='json')
+        self.user = User.objects.get(email='cook@example.com')
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + response.data['token'])
+
+    def add(self, name, quantity=1):
+        return self.client.post(reverse('add_fridge_item'), {'name': name, 'quantity': quantity}, format='json')
+
+    def test_register_provisions_the_default_fridge(self):
+        fridge = Fridge.objects.get(user=self.user)
+        self.assertEqual(fridge.name, DEFAULT_FRIDGE_NAME)
+        self.assertEqual(default_fridge_ids.get(self.user.id), fridge.id)
+
+    def test_hot_path_does_not_query_the_fridge_table(self):
+        self.add('Milk')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.add('milk', 2)
+        self.assertEqual(response.data['quantity'], 3)
+        # atomic increment, version bump (the token is cached)
+        self.assertEqual(len(queries), 2)
+        self.assertFalse(any(query['sql'].startswith('SELECT') and 'FROM "api_fridge"' in query['sql']
+                             for query in queries))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('list_fridge_items'))
+            self.client.delete(reverse('clear_fridge'))
+        self.assertFalse(any('FROM "api_fridge" ' in query['sql'] for query in queries))
+
+    def test_deleting_or_renaming_the_default_fridge_forgets_its_id(self):
+        fridge = Fridge.objects.get(user=self.user)
+        fridge.name = 'Old Fridge'
+        fridge.save()
+        self.assertIsNone(default_fridge_ids.get(self.user.id))
+        self.add('Milk')
+        self.assertEqual(Fridge.objects.get(user=self.user, name=DEFAULT_FRIDGE_NAME).items.count(), 1)
+        self.client.delete(reverse('fridge_detail', kwargs={'fridge_id': default_fridge_id(self.user)}))
+        self.assertIsNone(default_fridge_ids.get(self.user.id))
+
+    def test_backfill_command(self):
+        without = [User.objects.create_user(username=f'old{n}') for n in range(3)]
+        Fridge.objects.create(user=without[0], name='Garage Freezer')
+        out = io.StringIO()
+        call_command('create_default_fridges', batch_size=2, stdout=out)
+        self.assertIn('Created 3 default fridges.', out.getvalue())
+        for user in without:
+            self.assertTrue(Fridge.objects.filter(user=user, name=DEFAULT_FRIDGE_NAME).exists())
+        self.assertEqual(Fridge.objects.filter(user=self.user).count(), 1)
+
+        call_command('create_default_fridges', stdout=out)
+        self.assertIn('Created 0 default fridges.', out.getvalue())
+
+
+class StaleDefaultFridgeTestCase(APITransactionTestCase):
+    """
+    Runs outside a test transaction: SQLite and PostgreSQL check foreign keys
+    at commit, which is where a stale default fridge id gets noticed.
+    """
+    def setUp(self):
+        clear_caches()
+        response = self.client.post(reverse('register'), {'email': 'cook@example.com', 'password': 'pw'}, format='json')
+        self.user = User.objects.get(email='cook@example.com')
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + response.data['token'])
+
+    def add(self, name, quantity=1):
+        return self.client.post(reverse('add_fridge_item'), {'name': name, 'quantity': quantity}, format='json')
+
+    def test_stale_cached_id_is_replaced(self):
+        # E.g. the default fridge was deleted through another worker, whose signal
+        # couldn't reach this process's in-memory tier
+        old_id = Fridge.objects.get(user=self.user).id
+        Fridge.objects.filter(pk=old_id).delete()
+        default_fridge_ids.set(self.user.id, old_id)
+
+        response = self.add('Milk')
+        self.assertEqual(response.status_code, 201)
+        new_fridge = Fridge.objects.get(user=self.user, name=DEFAULT_FRIDGE_NAME)
+        self.assertNotEqual(new_fridge.id, old_id)
+        self.assertEqual(default_fridge_ids.get(self.user.id), new_fridge.id)
+
+        default_fridge_ids.set(self.user.id, old_id)
+        self.assertEqual(self.client.get(reverse('fridge')).data['items'][0]['name'], 'Milk')
+
+        default_fridge_ids.set(self.user.id, old_id)
+        response = self.client.post(reverse('bulk_add_fridge_items'), [{'name': 'Eggs'}], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(FridgeItem.objects.get(name='Eggs').fridge_id, new_fridge.id)
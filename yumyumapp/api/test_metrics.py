@@ -0,0 +1,103 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from .db import configure_sqlite
+from .metrics import MetricsMiddleware, RequestTimings, _current, _record_query, add_query_wrapper, registry
+from .models import Fridge, FridgeItem
+from .spoonacular import SpoonacularClient
+from .testing import StubSpoonacularServer, clear_caches
+
+
+@override_settings(METRICS={'ENABLED': True})
+class MetricsMiddlewareTestCase(APITestCase):
+    def setUp(self):
+        clear_caches()
+        registry.reset()
+        self.user = User.objects.create_user(username='cook', password='testpassword', email='cook@example.com')
+        self.token = Token.objects.create(user=self.user)
+        fridge = Fridge.objects.create(user=self.user, name='Main Fridge')
+        FridgeItem.objects.create(fridge=fridge, name='Milk', quantity=1)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def server_timing(self, response):
+        return dict(
+            (entry.split(';')[0], entry.split(';', 1)[1]) for entry in response['Server-Timing'].split(', ')
+        )
+
+    def test_server_timing_and_query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('fridge'))
+        timing = self.server_timing(response)
+        self.assertIn('total', timing)
+        self.assertIn('serialize', timing)
+        self.assertTrue(timing['db'].endswith(f';desc="{len(queries)} queries"'))
+
+        histogram = registry.get('db_queries', 'fridge')
+        self.assertEqual(histogram.count, 1)
+        self.assertEqual(histogram.sum, len(queries))
+
+    def test_spoonacular_time(self):
+        stub = StubSpoonacularServer(latency=0.05).start()
+        self.addCleanup(stub.stop)
+        client = SpoonacularClient(base_url=stub.url, max_retries=0)
+        self.addCleanup(client.close)
+        with patch('api.recipes.get_client', return_value=client):
+            response = self.client.get(reverse('find_recipes_by_ingredients'))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(float(self.server_timing(response)['spoonacular'].removeprefix('dur=')), 50)
+        self.assertGreaterEqual(registry.get('spoonacular_duration_seconds', 'find_recipes_by_ingredients').sum, 0.05)
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('fridge'))
+        self.client.get(reverse('fridge'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn('# TYPE yumyum_request_duration_seconds histogram', body)
+        self.assertIn('yumyum_request_duration_seconds_bucket{view="fridge",le="+Inf"} 2', body)
+        self.assertIn('yumyum_db_queries_count{view="fridge"} 2', body)
+        self.assertIn('yumyum_cache_lookups_total{cache="fridge",result="miss"} 1', body)
+        self.assertIn('yumyum_cache_lookups_total{cache="fridge",result="local_hit"} 1', body)
+        self.assertIn('yumyum_cache_hit_ratio{cache="fridge"} 0.5', body)
+
+    async def test_async_views(self):
+        headers = {'Authorization': 'Token ' + self.token.key}
+        response = await self.async_client.get(reverse('find_recipes_by_ingredients_async'),
+                                               {'fridge': 999999}, headers=headers)
+        self.assertEqual(response.status_code, 404)
+        # The fridge lookup runs in a sync_to_async thread
+        self.assertNotIn('desc="0 queries"', response['Server-Timing'])
+
+
+class QueryWrapperTestCase(TestCase):
+    def test_reconnects_dont_stack_wrappers_or_count_setup(self):
+        for _ in range(3):  # connection_created fires again on every reconnect
+            add_query_wrapper(None, connection)
+        self.assertEqual(connection.execute_wrappers.count(_record_query), 1)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            with self.settings(SQLITE_PRAGMAS={'cache_size': -2000}):  # One allowed inside a transaction
+                configure_sqlite(None, connection)
+            User.objects.exists()
+        finally:
+            _current.reset(token)
+        self.assertEqual(timings.queries, 1)
+
+
+class MetricsDisabledTestCase(TestCase):
+    def test_middleware_removes_itself(self):
+        from django.core.exceptions import MiddlewareNotUsed
+
+        with self.assertRaises(MiddlewareNotUsed):
+            MetricsMiddleware(lambda request: None)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        self.assertNotIn('Server-Timing', self.client.get(reverse('profile')))
@@ -0,0 +1,156 @@
+"""
+Query budgets: the exact number of SQL queries each endpoint may run, at
+several fridge sizes. A change that adds a query (an N+1, an extra
+get_or_create, a lost select_related) fails here with the offending SQL
+listed. So does one that saves a query: lower the budget then, so it stays
+saved.
+
+Requests are measured in steady state: the caller's token and default
+fridge id are already cached (see warm_up), as they are for every request
+after a user's first. Atomic blocks count two queries (SAVEPOINT/RELEASE),
+since the tests run inside a transaction.
+"""
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from .fridges import default_fridge_id
+from .models import Fridge, FridgeItem
+from .spoonacular import SpoonacularClient
+from .testing import StubSpoonacularServer, clear_caches
+
+FRIDGE_SIZES = (1, 25, 300)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class QueryBudgetTestCase(APITestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='cook@example.com', password='testpassword',
+                                             email='cook@example.com')
+        self.token = Token.objects.create(user=self.user)
+        self.fridge = Fridge.objects.create(user=self.user, name='Main Fridge')
+
+    def fill_fridge(self, size):
+        FridgeItem.objects.filter(fridge=self.fridge).delete()
+        FridgeItem.objects.bulk_create([
+            FridgeItem(fridge=self.fridge, name=f'Item {n:04}', normalized_name=f'item {n:04}', quantity=1)
+            for n in range(size)
+        ])
+        return FridgeItem.objects.filter(fridge=self.fridge).order_by('name').first()
+
+    def warm_up(self):
+        clear_caches()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 200)
+        default_fridge_id(self.user)
+
+    def assertQueryBudget(self, budget, method, url, data=None, **extra):
+        """
+        Make the request and fail, listing its SQL, unless it ran exactly `budget` queries.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format='json', **extra)
+        if len(queries) != budget:
+            sql = '\n'.join(f'  {number}. {query["sql"]}' for number, query in enumerate(queries, 1))
+            self.fail(f'{method.upper()} {url} ran {len(queries)} queries, its budget is {budget}:\n{sql}')
+        return response
+
+    def test_login(self):
+        credentials = {'email': 'cook@example.com', 'password': 'testpassword'}
+        response = self.assertQueryBudget(2, 'post', reverse('login'), credentials)
+        self.assertEqual(response.status_code, 200)
+        self.assertQueryBudget(1, 'post', reverse('login'), {**credentials, 'password': 'wrong'})
+
+    def test_register(self):
+        response = self.assertQueryBudget(
+            6, 'post', reverse('register'), {'email': 'new@example.com', 'password': 'pw', 'name': 'New'}
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_profile(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.assertQueryBudget(1, 'get', reverse('profile'))  # Token lookup, then cached
+        self.assertQueryBudget(0, 'get', reverse('profile'))
+
+    def test_view_fridge(self):
+        for size in FRIDGE_SIZES:
+            with self.subTest(size=size):
+                self.fill_fridge(size)
+                self.warm_up()
+                response = self.assertQueryBudget(2, 'get', reverse('fridge'))
+                self.assertEqual(len(response.data['items']), size)
+                self.assertQueryBudget(0, 'get', reverse('fridge'))
+                self.assertQueryBudget(0, 'get', reverse('fridge'), HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_list_fridge_items(self):
+        for size in FRIDGE_SIZES:
+            with self.subTest(size=size):
+                self.fill_fridge(size)
+                self.warm_up()
+                self.assertQueryBudget(1, 'get', reverse('list_fridge_items'), {'limit': 10})
+
+    def test_add_item(self):
+        for size in FRIDGE_SIZES:
+            with self.subTest(size=size):
+                self.fill_fridge(size)
+                self.warm_up()
+                url = reverse('add_fridge_item')
+                # Created (UPDATE finds nothing, INSERT), then added to (UPDATE only)
+                self.assertEqual(self.assertQueryBudget(3, 'post', url, {'name': 'Milk'}).status_code, 201)
+                self.assertEqual(self.assertQueryBudget(2, 'post', url, {'name': 'milk'}).status_code, 201)
+
+    def test_bulk_add(self):
+        for size in FRIDGE_SIZES:
+            with self.subTest(size=size):
+                self.fill_fridge(size)
+                self.warm_up()
+                items = [{'name': f'Item {n:04}', 'quantity': 1} for n in range(0, size, 2)] + [{'name': 'Milk'}]
+                response = self.assertQueryBudget(5, 'post', reverse('bulk_add_fridge_items'), {'items': items})
+                self.assertEqual(response.status_code, 200)
+
+    def test_update_item(self):
+        for size in FRIDGE_SIZES:
+            with self.subTest(size=size):
+                item = self.fill_fridge(size)
+                self.warm_up()
+                url = reverse('update_fridge_item_quantity', args=[item.id])
+                self.assertEqual(self.assertQueryBudget(3, 'patch', url, {'quantity': 5}).status_code, 200)
+
+    def test_remove_item(self):
+        for size in FRIDGE_SIZES:
+            with self.subTest(size=size):
+                item = self.fill_fridge(size)
+                self.warm_up()
+                url = reverse('remove_fridge_item', args=[item.id])
+                self.assertEqual(self.assertQueryBudget(3, 'delete', url).status_code, 204)
+
+    def test_clear_fridge(self):
+        for size in FRIDGE_SIZES:
+            with self.subTest(size=size):
+                self.fill_fridge(size)
+                self.warm_up()
+                self.assertQueryBudget(2, 'delete', reverse('clear_fridge'))
+                self.assertQueryBudget(1, 'delete', reverse('clear_fridge'))  # Already empty
+
+    def test_recipes(self):
+        stub = StubSpoonacularServer().start()
+        self.addCleanup(stub.stop)
+        client = SpoonacularClient(base_url=stub.url, max_retries=0)
+        self.addCleanup(client.close)
+        for size in FRIDGE_SIZES:
+            with self.subTest(size=size), patch('api.recipes.get_client', return_value=client):
+                self.fill_fridge(size)
+                self.warm_up()
+                url = reverse('find_recipes_by_ingredients')
+                # Only the ingredient names: the recipes come from Spoonacular, then from the cache
+                response = self.assertQueryBudget(1, 'get', url)
+                self.assertEqual(response.status_code, 200)
+                self.assertQueryBudget(1, 'get', url)
+                self.assertQueryBudget(1, 'get', url, HTTP_IF_NONE_MATCH=response['ETag'])
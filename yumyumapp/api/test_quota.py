@@ -0,0 +1,142 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from .metrics import registry
+from .models import Fridge, FridgeItem
+from .quota import QuotaExceeded, SpoonacularQuota, TokenBucket
+from .spoonacular import SpoonacularClient
+from .testing import FakeClock, StubSpoonacularServer, clear_caches
+
+
+class TokenBucketTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.clock = FakeClock(1_000_000.0)
+        self.bucket = TokenBucket('test-bucket', rate=2, capacity=3, clock=self.clock)
+
+    def test_burst_then_refill(self):
+        self.assertEqual([self.bucket.take() for _ in range(3)], [0, 0, 0])
+        self.assertEqual(self.bucket.take(), 0.5)
+        self.clock.now += 0.5
+        self.assertEqual(self.bucket.take(), 0)
+        self.clock.now += 10
+        self.assertEqual([self.bucket.take() for _ in range(4)], [0, 0, 0, 0.5])  # Refills up to capacity only
+
+    def test_keys_have_their_own_tokens(self):
+        for _ in range(3):
+            self.bucket.take('a')
+        self.assertGreater(self.bucket.take('a'), 0)
+        self.assertEqual(self.bucket.take('b'), 0)
+
+
+class SpoonacularQuotaTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.clock = FakeClock()
+
+    def make_quota(self, **kwargs):
+        options = {'rate': 1, 'burst': 2, 'user_rate': None, 'max_wait': 2, 'reserve': 10,
+                   'clock': self.clock, 'sleep': self.clock.sleep}
+        options.update(kwargs)
+        return SpoonacularQuota(**options)
+
+    def test_record_reads_the_quota_headers(self):
+        quota = self.make_quota()
+        quota.record({'X-API-Quota-Request': '1.1', 'X-API-Quota-Used': '42.5', 'X-API-Quota-Left': '107.5'})
+        self.assertEqual(quota.status(), {'request': 1.1, 'used': 42.5, 'left': 107.5})
+        quota.record({'Content-Type': 'application/json'})  # No quota headers: nothing changes
+        self.assertEqual(quota.status()['left'], 107.5)
+        self.assertEqual(registry.counter('spoonacular_points_total'), 1.1)
+
+    def test_low_quota_sheds_background_calls_first(self):
+        quota = self.make_quota(rate=None)
+        quota.record({'X-API-Quota-Left': '5'})
+        with self.assertRaises(QuotaExceeded) as ctx:
+            quota.acquire(background=True)
+        self.assertEqual(ctx.exception.status_code, 429)
+        self.assertGreater(ctx.exception.retry_after, 0)
+        quota.acquire()  # Someone is waiting for this one
+
+        quota.record({'X-API-Quota-Left': '0'})
+        with self.assertRaises(QuotaExceeded):
+            quota.acquire()
+        self.assertEqual(registry.counter('spoonacular_calls_avoided_total', 'shed'), 2)
+
+    def test_user_bucket(self):
+        quota = self.make_quota(rate=None, user_rate=0.1, user_burst=2)
+        quota.acquire(user_id=1)
+        quota.acquire(user_id=1)
+        with self.assertRaises(QuotaExceeded) as ctx:
+            quota.acquire(user_id=1)
+        self.assertEqual(ctx.exception.retry_after, 10)
+        quota.acquire(user_id=2)
+
+    def test_foreground_calls_queue_for_the_global_bucket(self):
+        quota = self.make_quota(rate=1, burst=1)
+        quota.acquire()
+        started = self.clock.now
+        quota.acquire()
+        self.assertEqual(self.clock.now - started, 1)
+        with self.assertRaises(QuotaExceeded):
+            quota.acquire(background=True)
+
+    def test_shed_call_does_not_spend_the_user_token(self):
+        quota = self.make_quota(rate=1, burst=1, max_wait=0, user_rate=0.01, user_burst=1)
+        quota.acquire(user_id=2)
+        with self.assertRaises(QuotaExceeded):
+            quota.acquire(user_id=1)  # The global bucket is empty
+        self.clock.now += 1
+        quota.acquire(user_id=1)
+
+
+class RecipeBudgetTestCase(APITestCase):
+    def setUp(self):
+        clear_caches()
+        registry.reset()
+        self.user = User.objects.create_user(username='cook', password='testpassword', email='cook@example.com')
+        self.token = Token.objects.create(user=self.user)
+        self.fridge = Fridge.objects.create(user=self.user, name='Main Fridge')
+        FridgeItem.objects.create(fridge=self.fridge, name='Milk', quantity=1)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('find_recipes_by_ingredients')
+
+        self.stub = StubSpoonacularServer(daily_quota=150).start()
+        self.addCleanup(self.stub.stop)
+        self.quota = SpoonacularQuota(rate=None, user_rate=0.01, user_burst=2)
+        spoonacular = SpoonacularClient(base_url=self.stub.url, max_retries=0, quota=self.quota)
+        self.addCleanup(spoonacular.close)
+        for target, value in (('api.recipes.get_client', spoonacular), ('api.recipes.spoonacular_quota', self.quota)):
+            patcher = patch(target, return_value=value) if target.endswith('get_client') else patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def add(self, name):
+        FridgeItem.objects.create(fridge=self.fridge, name=name, quantity=1)
+
+    def test_quota_is_tracked_and_cache_hits_are_free(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(self.quota.status()['left'], 150 - 1.1)
+        for _ in range(3):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(self.stub.hits, 1)
+        self.assertEqual(registry.counter('spoonacular_requests_total'), 1)
+        self.assertEqual(registry.counter('spoonacular_calls_avoided_total', 'cache_hit'), 3)
+        self.assertIn('yumyum_spoonacular_calls_avoided_total{reason="cache_hit"} 3', registry.render())
+
+    def test_over_budget_search_is_shed(self):
+        self.client.get(self.url)
+        self.add('Eggs')
+        self.client.get(self.url)
+        self.add('Flour')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.stub.hits, 2)
+        self.assertEqual(registry.counter('spoonacular_calls_avoided_total', 'shed'), 1)
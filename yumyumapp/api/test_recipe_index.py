@@ -0,0 +1,186 @@
+import io
+import json
+import os
+import random
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from .models import Recipe, RecipeCatalog, RecipeIngredient
+from .recipe_index import RecipeIndex, get_recipe_index, invalidate_recipe_index
+from .spoonacular import SpoonacularClient
+from .testing import clear_caches
+
+
+def recipe_ids(results):
+    return [recipe['id'] for recipe in results]
+
+
+def make_recipe(recipe_id, ingredients, likes=0):
+    return {
+        'id': recipe_id,
+        'title': f'Recipe {recipe_id}',
+        'image': '',
+        'imageType': 'jpg',
+        'likes': likes,
+        'ingredients': [
+            {'id': index, 'name': name, 'normalized_name': name, 'amount': None, 'unit': '', 'original': ''}
+            for index, name in enumerate(ingredients)
+        ],
+    }
+
+
+class RecipeIndexTestCase(SimpleTestCase):
+    def setUp(self):
+        self.index = RecipeIndex([
+            make_recipe(1, ['eggs', 'milk', 'salt']),
+            make_recipe(2, ['eggs', 'milk', 'flour', 'sugar', 'vanilla']),
+            make_recipe(3, ['eggs', 'bacon', 'bread', 'tomato']),
+            make_recipe(4, ['rice', 'beans']),
+        ])
+
+    def test_ranking_maximizes_used_ingredients(self):
+        results = self.index.search(['Eggs', 'MILK', 'bacon'], ranking=1)
+        self.assertEqual(recipe_ids(results), [1, 2, 3])
+        first = results[0]
+        self.assertEqual(first['usedIngredientCount'], 2)
+        self.assertEqual(first['missedIngredientCount'], 0)  # salt is a pantry item
+        self.assertEqual([item['name'] for item in first['unusedIngredients']], ['bacon'])
+
+    def test_ranking_minimizes_missed_ingredients(self):
+        results = self.index.search(['eggs', 'milk', 'bacon'], ranking=2, ignore_pantry=False)
+        self.assertEqual(recipe_ids(results), [1, 3, 2])
+
+    def test_without_ignore_pantry_staples_count_as_missed(self):
+        results = self.index.search(['eggs', 'milk'], ignore_pantry=False)
+        self.assertEqual(results[0]['missedIngredientCount'], 1)
+        self.assertEqual(results[1]['missedIngredientCount'], 3)
+
+    def test_number_limits_results(self):
+        self.assertEqual(len(self.index.search(['eggs'], number=2)), 2)
+
+    def test_no_match(self):
+        self.assertEqual(self.index.search(['caviar']), [])
+
+    def test_matches_brute_force_ranking(self):
+        rng = random.Random(7)
+        vocabulary = [f'ingredient {n}' for n in range(60)]
+        recipes = [make_recipe(n, rng.sample(vocabulary, rng.randint(1, 12)), likes=rng.randint(0, 5))
+                   for n in range(500)]
+        index = RecipeIndex(recipes)
+        fridge = set(rng.sample(vocabulary, 15))
+
+        def brute_force(key):
+            scored = []
+            for position, recipe in enumerate(recipes):
+                names = {item['name'] for item in recipe['ingredients']}
+                used = len(names & fridge)
+                if used:
+                    scored.append((key(used, len(names) - used, recipe['likes'], position), recipe['id']))
+            return [recipe_id for _, recipe_id in sorted(scored)[:10]]
+
+        self.assertEqual(recipe_ids(index.search(fridge, ranking=1)),
+                         brute_force(lambda used, missed, likes, position: (-used, missed, -likes, position)))
+        self.assertEqual(recipe_ids(index.search(fridge, ranking=2)),
+                         brute_force(lambda used, missed, likes, position: (missed, -used, -likes, position)))
+
+
+class LoadRecipesCommandTestCase(TestCase):
+    def setUp(self):
+        clear_caches()
+        invalidate_recipe_index()
+
+    def write(self, suffix, content):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+            handle.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_load_json(self):
+        path = self.write('.json', json.dumps([
+            {'id': 10, 'title': 'Omelette', 'likes': 4,
+             'ingredients': ['Eggs', {'name': 'Milk', 'amount': 0.5, 'unit': 'cup'}, 'eggs']},
+        ]))
+        call_command('load_recipes', path, stdout=io.StringIO())
+        recipe = Recipe.objects.get(external_id=10)
+        self.assertEqual(recipe.likes, 4)
+        self.assertEqual(sorted(recipe.ingredients.values_list('normalized_name', flat=True)), ['eggs', 'milk'])
+        self.assertEqual(recipe_ids(get_recipe_index().search(['milk'])), [10])
+
+    def test_reload_replaces_ingredients(self):
+        first = self.write('.csv', 'recipe_id,title,ingredient\n1,Toast,bread\n1,Toast,butter\n2,Rice,rice\n')
+        second = self.write('.csv', 'recipe_id,title,ingredient\n1,Cheese Toast,bread\n1,Cheese Toast,cheese\n')
+        call_command('load_recipes', first, stdout=io.StringIO())
+        call_command('load_recipes', second, stdout=io.StringIO())
+
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertEqual(Recipe.objects.get(external_id=1).title, 'Cheese Toast')
+        self.assertEqual(
+            sorted(RecipeIngredient.objects.filter(recipe__external_id=1).values_list('name', flat=True)),
+            ['bread', 'cheese'],
+        )
+        self.assertEqual(recipe_ids(get_recipe_index().search(['cheese'])), [1])
+
+
+class LocalRecipeSourceTestCase(APITestCase):
+    def setUp(self):
+        clear_caches()
+        invalidate_recipe_index()
+        recipe = Recipe.objects.create(external_id=99, title='Pancakes')
+        for name in ('eggs', 'milk', 'flour'):
+            RecipeIngredient.objects.create(recipe=recipe, name=name, normalized_name=name)
+
+        self.user = User.objects.create_user(username='cook', password='testpassword', email='cook@example.com')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('find_recipes_by_ingredients')
+
+    def add(self, name):
+        self.client.post(reverse('add_fridge_item'), {'name': name, 'quantity': 1}, format='json')
+
+    @override_settings(RECIPE_SOURCE='local')
+    @patch.object(SpoonacularClient, 'find_by_ingredients')
+    def test_local_source_never_calls_upstream(self, mock_get):
+        self.add('Milk')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(recipe_ids(response.data), [99])
+        self.client.delete(reverse('clear_fridge'))
+        self.add('Caviar')
+        response = self.client.get(self.url)
+        self.assertEqual(response.data, [])
+        mock_get.assert_not_called()
+
+    @override_settings(RECIPE_SOURCE='local_fallback')
+    @patch.object(SpoonacularClient, 'find_by_ingredients')
+    def test_local_fallback_uses_upstream_without_local_matches(self, mock_get):
+        mock_get.return_value = [{'id': 1, 'title': 'Caviar Toast'}]
+        self.add('Caviar')
+        response = self.client.get(self.url)
+        self.assertEqual(response.data, [{'id': 1, 'title': 'Caviar Toast'}])
+
+        self.add('Eggs')
+        response = self.client.get(self.url)
+        self.assertEqual(recipe_ids(response.data), [99])
+        self.assertEqual(mock_get.call_count, 1)
+
+    @override_settings(RECIPE_SOURCE='local', RECIPE_INDEX_CHECK_INTERVAL=0)
+    def test_loads_by_other_processes_are_noticed(self):
+        self.add('Milk')
+        etag = self.client.get(self.url)['ETag']
+        recipe = Recipe.objects.create(external_id=100, title='Milkshake')
+        RecipeIngredient.objects.create(recipe=recipe, name='milk', normalized_name='milk')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # What invalidate_recipe_index does in the process running load_recipes
+        RecipeCatalog.objects.filter(pk=1).update(version=RecipeCatalog.objects.get(pk=1).version + 1)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(recipe_ids(response.data)), [99, 100])
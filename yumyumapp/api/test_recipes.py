@@ -0,0 +1,494 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APITestCase, APITransactionTestCase
+
+from .cache import LRUCache, MISSING, SingleFlight, TieredCache
+from .recipes import (
+    RECIPE_TTL, BackgroundRefresher, recipe_cache, recipe_cache_key, recipe_etag, recipe_flights, refresher,
+)
+from .models import Fridge, FridgeItem
+from .precompute import DebouncedQueue, recompute_queue
+from .spoonacular import AsyncSpoonacularClient, SpoonacularClient, SpoonacularError, UpstreamUnavailable
+from .testing import FakeClock, StubSpoonacularServer, clear_caches
+
+
+class LRUCacheTestCase(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        lru = LRUCache(maxsize=2, ttl=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')  # 'b' is now the least recently used
+        lru.set('c', 3)
+        self.assertEqual(lru.get('a'), 1)
+        self.assertIs(lru.get('b'), MISSING)
+        self.assertEqual(lru.get('c'), 3)
+
+    def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        lru = LRUCache(maxsize=10, ttl=5, clock=clock)
+        lru.set('a', 1)
+        clock.now = 4.9
+        self.assertEqual(lru.get('a'), 1)
+        clock.now = 5.0
+        self.assertIs(lru.get('a'), MISSING)
+        self.assertEqual(len(lru), 0)
+
+
+class TieredCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.tiered = TieredCache('test-tiered', maxsize=4, ttl=60)
+
+    def test_shared_tier_hit_is_promoted(self):
+        self.tiered.set('k', [1, 2])
+        self.tiered.clear_local()  # e.g. another worker process
+        self.assertEqual(self.tiered.get('k'), [1, 2])
+        self.assertEqual(self.tiered.get('k'), [1, 2])
+        stats = self.tiered.stats()
+        self.assertEqual(stats['shared_hits'], 1)
+        self.assertEqual(stats['local_hits'], 1)
+        self.assertEqual(stats['misses'], 0)
+
+    def test_miss_is_counted(self):
+        self.assertIsNone(self.tiered.get('nope'))
+        self.assertEqual(self.tiered.stats()['misses'], 1)
+        self.assertEqual(self.tiered.stats()['hit_rate'], 0.0)
+
+    def test_empty_list_is_cacheable(self):
+        self.tiered.set('empty', [])
+        self.assertEqual(self.tiered.get('empty', default='miss'), [])
+
+
+class RecipeCacheKeyTestCase(SimpleTestCase):
+    def test_key_ignores_order_case_and_whitespace(self):
+        self.assertEqual(
+            recipe_cache_key(['Milk', 'eggs', ' Green  Apples']),
+            recipe_cache_key(['green apples', 'EGGS', 'milk', 'Milk']),
+        )
+
+    def test_key_depends_on_search_params(self):
+        self.assertNotEqual(
+            recipe_cache_key(['milk'], {'number': 10}),
+            recipe_cache_key(['milk'], {'number': 5}),
+        )
+
+
+class FindRecipesCacheTestCase(APITestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='cook', password='testpassword', email='cook@example.com')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.url = reverse('find_recipes_by_ingredients')
+        add_url = reverse('add_fridge_item')
+        self.client.post(add_url, {'name': 'Milk', 'quantity': 1}, format='json')
+        self.client.post(add_url, {'name': 'Eggs', 'quantity': 6}, format='json')
+
+    @patch.object(SpoonacularClient, 'find_by_ingredients')
+    def test_repeat_lookup_does_not_reach_network(self, mock_get):
+        mock_get.return_value = [{'id': 1, 'title': 'Omelette'}]
+
+        first = self.client.get(self.url)
+        second = self.client.get(self.url)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.data, [{'id': 1, 'title': 'Omelette'}])
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(recipe_cache.stats()['hits'], 1)
+
+    @patch.object(SpoonacularClient, 'find_by_ingredients')
+    def test_changed_fridge_misses(self, mock_get):
+        mock_get.return_value = []
+        self.client.get(self.url)
+        self.client.post(reverse('add_fridge_item'), {'name': 'Flour', 'quantity': 1}, format='json')
+        self.client.get(self.url)
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch.object(SpoonacularClient, 'find_by_ingredients')
+    def test_upstream_errors_are_not_cached(self, mock_get):
+        mock_get.side_effect = SpoonacularError('Failed to fetch recipes from Spoonacular.', 402)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 402)
+        self.client.get(self.url)
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch.object(SpoonacularClient, 'find_by_ingredients')
+    def test_matching_etag_skips_the_search(self, mock_get):
+        mock_get.return_value = [{'id': 1, 'title': 'Omelette'}]
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(etag, recipe_etag(['eggs', 'milk']))
+
+        clear_caches()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(mock_get.call_count, 1)
+
+        # Same ingredient set, different spelling: same ETag
+        self.client.post(reverse('add_fridge_item'), {'name': ' MILK', 'quantity': 1}, format='json')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.post(reverse('add_fridge_item'), {'name': 'Flour', 'quantity': 1}, format='json')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class StaleRecipesTestCase(APITestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='cook', password='testpassword', email='cook@example.com')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        fridge = Fridge.objects.create(user=self.user, name='Main Fridge')
+        FridgeItem.objects.create(fridge=fridge, name='Milk', quantity=1)
+        FridgeItem.objects.create(fridge=fridge, name='Eggs', quantity=6)
+        self.url = reverse('find_recipes_by_ingredients')
+        self.key = recipe_cache_key(['Milk', 'Eggs'])
+        # Refresh in the request thread, so the tests can look at the outcome right away
+        patcher = patch.object(refresher, 'submit', side_effect=lambda key, fn: refresher._run(key, fn))
+        self.submit = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def cache_old_result(self):
+        recipe_cache.set(self.key, {'recipes': [{'id': 1, 'title': 'Old'}], 'fetched_at': time.time() - RECIPE_TTL - 5})
+
+    @patch.object(SpoonacularClient, 'find_by_ingredients')
+    def test_fresh_result_is_not_marked(self, mock_get):
+        mock_get.return_value = [{'id': 2, 'title': 'New'}]
+        response = self.client.get(self.url)
+        self.assertEqual(response.data, [{'id': 2, 'title': 'New'}])
+        self.assertNotIn('X-Recipes-Stale', response)
+        self.assertFalse(self.submit.called)
+
+    @patch.object(SpoonacularClient, 'find_by_ingredients')
+    def test_stale_result_is_served_and_refreshed(self, mock_get):
+        mock_get.return_value = [{'id': 2, 'title': 'New'}]
+        self.cache_old_result()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data, [{'id': 1, 'title': 'Old'}])
+        self.assertEqual(response['X-Recipes-Stale'], 'cached')
+        self.assertGreaterEqual(int(response['Age']), RECIPE_TTL)
+        self.assertIn('ETag', response)
+        self.assertEqual(mock_get.call_count, 1)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data, [{'id': 2, 'title': 'New'}])
+        self.assertNotIn('X-Recipes-Stale', response)
+
+    @patch.object(SpoonacularClient, 'find_by_ingredients')
+    def test_last_good_result_is_served_while_upstream_is_down(self, mock_get):
+        mock_get.side_effect = UpstreamUnavailable('Spoonacular timed out.')
+        self.cache_old_result()
+        for _ in range(2):
+            with self.assertLogs('api.recipes', 'WARNING'):
+                response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data, [{'id': 1, 'title': 'Old'}])
+            self.assertEqual(response['X-Recipes-Stale'], 'cached')
+
+    @patch('api.recipes.search_local', return_value=[{'id': 9, 'title': 'Local omelette'}])
+    @patch.object(SpoonacularClient, 'find_by_ingredients')
+    def test_local_match_stands_in_when_nothing_is_cached(self, mock_get, mock_local):
+        mock_get.side_effect = UpstreamUnavailable('Spoonacular timed out.')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [{'id': 9, 'title': 'Local omelette'}])
+        self.assertEqual(response['X-Recipes-Stale'], 'local')
+        # Not to be kept under the ETag of the real result
+        self.assertNotIn('ETag', response)
+
+    @patch.object(SpoonacularClient, 'find_by_ingredients')
+    def test_refresh_by_another_process_is_picked_up(self, mock_get):
+        self.cache_old_result()  # In both tiers
+        lock_key = recipe_flights._lock_key(self.key)
+        cache.add(lock_key, True)  # "Another process" is refreshing it
+
+        def other_process_finishes():
+            time.sleep(0.1)
+            cache.set(recipe_cache._key(self.key), {'recipes': [{'id': 3, 'title': 'Theirs'}],
+                                                    'fetched_at': time.time()})
+            cache.delete(lock_key)
+
+        threading.Thread(target=other_process_finishes).start()
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Recipes-Stale'], 'cached')
+        mock_get.assert_not_called()
+        self.assertEqual(self.client.get(self.url).data, [{'id': 3, 'title': 'Theirs'}])
+
+
+class BackgroundRefresherTestCase(SimpleTestCase):
+    def test_one_refresh_per_key_at_a_time(self):
+        refresher = BackgroundRefresher(workers=2)
+        release = threading.Event()
+        runs = []
+
+        def refresh():
+            runs.append(1)
+            release.wait(1)
+
+        first = refresher.submit('k', refresh)
+        self.assertIsNone(refresher.submit('k', refresh))
+        release.set()
+        first.result(1)
+        refresher.submit('k', refresh).result(1)
+        self.assertEqual(len(runs), 2)
+
+
+class FindRecipesAsyncTestCase(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='cook', password='testpassword', email='cook@example.com')
+        self.token = Token.objects.create(user=self.user)
+        fridge = Fridge.objects.create(user=self.user, name='Main Fridge')
+        FridgeItem.objects.create(fridge=fridge, name='Milk', quantity=1)
+        FridgeItem.objects.create(fridge=fridge, name='Eggs', quantity=6)
+        self.url = reverse('find_recipes_by_ingredients_async')
+        self.headers = {'Authorization': 'Token ' + self.token.key}
+        self.stub = StubSpoonacularServer(latency=0.2).start()
+        self.addCleanup(self.stub.stop)
+
+    def client_for_stub(self):
+        return AsyncSpoonacularClient(base_url=self.stub.url, max_retries=0)
+
+    async def test_requires_token(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+    async def test_empty_fridge(self):
+        await FridgeItem.objects.filter(fridge__user=self.user).adelete()
+        response = await self.async_client.get(self.url, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_fridge_selection(self):
+        response = await self.async_client.get(self.url, {'fridge': 999999}, headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get(self.url, {'fridge': 'pantry'}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_fetches_and_caches(self):
+        client = self.client_for_stub()
+        with patch('api.recipes.get_async_client', return_value=client):
+            first = await self.async_client.get(self.url, headers=self.headers)
+            second = await self.async_client.get(self.url, headers=self.headers)
+        await client.aclose()
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(len(first.json()), 10)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(self.stub.hits, 1)
+
+        third = await self.async_client.get(self.url, headers={**self.headers, 'If-None-Match': first['ETag']})
+        self.assertEqual(third.status_code, 304)
+        self.assertEqual(self.stub.hits, 1)
+
+    async def test_concurrent_requests_overlap_upstream_waits(self):
+        client = self.client_for_stub()
+        with patch('api.recipes.get_async_client', return_value=client):
+            started = time.monotonic()
+            responses = await asyncio.gather(*[
+                self.async_client.get(self.url, headers=self.headers) for _ in range(5)
+            ])
+            elapsed = time.monotonic() - started
+        await client.aclose()
+
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        # Serial handling would take 5 * 0.2s
+        self.assertLess(elapsed, 0.8)
+
+    async def test_identical_concurrent_requests_share_one_upstream_call(self):
+        client = self.client_for_stub()
+        with patch('api.recipes.get_async_client', return_value=client):
+            responses = await asyncio.gather(*[
+                self.async_client.get(self.url, headers=self.headers) for _ in range(5)
+            ])
+        await client.aclose()
+        self.assertEqual([response.status_code for response in responses], [200] * 5)
+        self.assertEqual(self.stub.hits, 1)
+
+    async def test_upstream_error_status_is_passed_through(self):
+        self.stub.statuses = [402]
+        client = self.client_for_stub()
+        with patch('api.recipes.get_async_client', return_value=client):
+            response = await self.async_client.get(self.url, headers=self.headers)
+        await client.aclose()
+        self.assertEqual(response.status_code, 402)
+
+
+class SingleFlightTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.flight = SingleFlight('test-flight', poll_interval=0.01)
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        time.sleep(0.1)
+        return ['value']
+
+    def run_threads(self, count, target):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(target())) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_callers_share_one_computation(self):
+        results = self.run_threads(8, lambda: self.flight.do('k', self.compute))
+        self.assertEqual(results, [['value']] * 8)
+        self.assertEqual(self.calls, 1)
+        self.assertIsNone(cache.get(self.flight._lock_key('k')))
+
+    def test_error_is_shared(self):
+        def fail():
+            self.calls += 1
+            time.sleep(0.1)
+            raise SpoonacularError('down', 503)
+
+        def call():
+            try:
+                return self.flight.do('k', fail)
+            except SpoonacularError as exc:
+                return exc.status_code
+
+        self.assertEqual(self.run_threads(4, call), [503] * 4)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.flight.do('k', self.compute), ['value'])  # Nothing is remembered
+
+    def test_waits_for_another_process(self):
+        stored = {}
+        cache.add(self.flight._lock_key('k'), True)  # Held by "another process"
+
+        def other_process_finishes():
+            time.sleep(0.1)
+            stored['k'] = ['theirs']
+            cache.delete(self.flight._lock_key('k'))
+
+        threading.Thread(target=other_process_finishes).start()
+        self.assertEqual(self.flight.do('k', self.compute, lambda: stored.get('k')), ['theirs'])
+        self.assertEqual(self.calls, 0)
+
+    def test_computes_when_the_other_process_fails(self):
+        cache.add(self.flight._lock_key('k'), True)
+        threading.Timer(0.05, cache.delete, [self.flight._lock_key('k')]).start()
+        self.assertEqual(self.flight.do('k', self.compute, lambda: None), ['value'])
+        self.assertEqual(self.calls, 1)
+
+
+class ConcurrentRecipeRequestsTestCase(APITransactionTestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='cook', password='testpassword', email='cook@example.com')
+        self.token = Token.objects.create(user=self.user)
+        fridge = Fridge.objects.create(user=self.user, name='Main Fridge')
+        FridgeItem.objects.create(fridge=fridge, name='Milk', quantity=1)
+        FridgeItem.objects.create(fridge=fridge, name='Eggs', quantity=6)
+        self.stub = StubSpoonacularServer(latency=0.2).start()
+        self.addCleanup(self.stub.stop)
+
+    def test_identical_concurrent_requests_share_one_upstream_call(self):
+        spoonacular = SpoonacularClient(base_url=self.stub.url, max_retries=0)
+        self.addCleanup(spoonacular.close)
+        statuses = []
+
+        def request():
+            try:
+                client = APIClient()
+                client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+                statuses.append(client.get(reverse('find_recipes_by_ingredients')).status_code)
+            finally:
+                connection.close()
+
+        with patch('api.recipes.get_client', return_value=spoonacular):
+            threads = [threading.Thread(target=request) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(statuses, [200] * 8)
+        self.assertEqual(self.stub.hits, 1)
+
+
+class DebouncedQueueTestCase(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.runs = []
+        self.queue = DebouncedQueue(self.runs.append, delay=2, max_delay=10, background=False, clock=self.clock)
+
+    def test_rapid_edits_coalesce(self):
+        for now in (0, 1, 2.5):
+            self.clock.now = now
+            self.queue.schedule('fridge')
+        self.clock.now = 4
+        self.assertEqual(self.queue.run_due(), [])
+        self.clock.now = 4.5
+        self.assertEqual(self.queue.run_due(), ['fridge'])
+        self.assertEqual(self.runs, ['fridge'])
+        self.assertEqual(self.queue.pending(), set())
+
+    def test_continuous_edits_run_by_max_delay(self):
+        for now in range(0, 12):
+            self.clock.now = now
+            self.queue.schedule('fridge')
+            self.queue.run_due()
+        self.assertEqual(self.runs, ['fridge'])  # At t=10, though edits kept coming
+
+    def test_failing_job_does_not_stop_the_others(self):
+        def job(key):
+            if key == 'bad':
+                raise RuntimeError(key)
+            self.runs.append(key)
+
+        self.queue.job = job
+        self.queue.schedule('bad')
+        self.queue.schedule('good')
+        with self.assertLogs('api.precompute', 'ERROR'):
+            self.queue.flush()
+        self.assertEqual(self.runs, ['good'])
+
+
+@override_settings(RECIPE_PRECOMPUTE={'ENABLED': True})
+class PrecomputeRecipesTestCase(APITestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='cook', password='testpassword', email='cook@example.com')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.addCleanup(recompute_queue.clear)
+
+    @patch.object(SpoonacularClient, 'find_by_ingredients')
+    def test_edits_are_searched_once_in_the_background(self, mock_get):
+        mock_get.return_value = [{'id': 1, 'title': 'Omelette'}]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('add_fridge_item'), {'name': 'Milk'}, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('add_fridge_item'), {'name': 'Eggs'}, format='json')
+        fridge_id = Fridge.objects.get(user=self.user).pk
+        self.assertEqual(recompute_queue.pending(), {fridge_id})
+
+        recompute_queue.flush()
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(sorted(mock_get.call_args.args[0]), ['Eggs', 'Milk'])
+
+        response = self.client.get(reverse('find_recipes_by_ingredients'))
+        self.assertEqual(response.data, [{'id': 1, 'title': 'Omelette'}])
+        self.assertEqual(mock_get.call_count, 1)
+
+    @override_settings(RECIPE_PRECOMPUTE={'ENABLED': False})
+    def test_disabled(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('add_fridge_item'), {'name': 'Milk'}, format='json')
+        self.assertEqual(recompute_queue.pending(), set())
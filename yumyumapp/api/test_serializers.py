@@ -0,0 +1,88 @@
+import datetime
+import decimal
+import uuid
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from .models import Fridge, FridgeItem
+from .renderers import FastJSONRenderer
+from .serializers import FridgeItemSerializer, FridgeSerializer, fridge_data, fridge_item_data
+from .testing import clear_caches
+
+NAMES = ['Milk', 'Crème fraîche', 'Line\u2028separator', 'Paragraph\u2029separator', '"Quoted" \\ back',
+         'Tab\there', '🍓 Strawberries', 'ÆØÅ', '\x00control']
+
+
+class FastSerializerTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='cook', password='testpassword')
+        self.fridge = Fridge.objects.create(user=user, name='Main Fridge')
+        for n, name in enumerate(NAMES):
+            FridgeItem.objects.create(fridge=self.fridge, name=name, quantity=n + 1)
+
+    def test_fridge_data_matches_model_serializer(self):
+        self.assertEqual(fridge_data(self.fridge), FridgeSerializer(self.fridge).data)
+        self.assertEqual(
+            FastJSONRenderer().render(fridge_data(self.fridge)),
+            JSONRenderer().render(FridgeSerializer(self.fridge).data),
+        )
+
+    def test_fridge_item_data_matches_model_serializer(self):
+        for item in FridgeItem.objects.all():
+            self.assertEqual(fridge_item_data(item), FridgeItemSerializer(item).data)
+
+
+class FastJSONRendererTestCase(SimpleTestCase):
+    def assertSameBytes(self, data, accepted_media_type=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, accepted_media_type),
+            JSONRenderer().render(data, accepted_media_type),
+        )
+
+    def test_strings_and_containers(self):
+        self.assertSameBytes({'names': NAMES, 'nested': [{'a': None, 'b': True}, (1, 2)], 'empty': {}})
+        self.assertSameBytes([])
+        self.assertSameBytes('\u2028')
+
+    def test_floats(self):
+        for value in (0.5, 1.0, 1 / 3, -2.75, 1e15, 1e16, 1.5e300, 1e-4, 1e-5, 5e-324, -0.0, 123456789.125):
+            self.assertSameBytes({'amount': value})
+            self.assertSameBytes([value, 'x'])
+        self.assertSameBytes({'text': '1e5, 0.00001'})
+
+    def test_types_handled_by_drf_encoder(self):
+        self.assertSameBytes({
+            'when': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            'day': datetime.date(2024, 5, 1),
+            'time': datetime.time(8, 15),
+            'duration': datetime.timedelta(minutes=5),
+            'price': decimal.Decimal('1.10'),
+            'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'lazy': gettext_lazy('Milk'),
+            'set': {1},
+        })
+
+    def test_fallbacks(self):
+        self.assertSameBytes({1: 'int key', None: 'none key'})
+        self.assertSameBytes({'big': 2 ** 70})
+        self.assertSameBytes({'a': [1, 2]}, 'application/json; indent=4')
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+
+class FridgeResponseBytesTestCase(APITestCase):
+    def test_view_fridge_bytes_are_unchanged(self):
+        clear_caches()
+        user = User.objects.create_user(username='cook', password='testpassword')
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=user).key)
+        fridge = Fridge.objects.create(user=user, name='Main Fridge')
+        for name in NAMES:
+            FridgeItem.objects.create(fridge=fridge, name=name)
+
+        response = self.client.get(reverse('fridge'))
+        self.assertEqual(response.content, JSONRenderer().render(FridgeSerializer(fridge).data))
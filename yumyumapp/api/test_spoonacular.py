@@ -0,0 +1,163 @@
+from unittest.mock import patch
+
+import requests
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from .quota import SpoonacularQuota
+from .spoonacular import CircuitBreaker, SpoonacularClient, SpoonacularError, UpstreamUnavailable, check_api_key
+from .testing import FakeClock, StubSpoonacularServer
+
+
+class SpoonacularClientTestCase(SimpleTestCase):
+    def setUp(self):
+        self.stub = StubSpoonacularServer().start()
+        self.addCleanup(self.stub.stop)
+        self.sleeps = []
+
+    def make_client(self, **kwargs):
+        options = {'base_url': self.stub.url, 'api_key': 'test-key', 'max_retries': 2,
+                   'read_timeout': 1, 'sleep': self.sleeps.append}
+        options.update(kwargs)
+        client = SpoonacularClient(**options)
+        self.addCleanup(client.close)
+        return client
+
+    def test_find_by_ingredients(self):
+        recipes = self.make_client().find_by_ingredients(['milk', 'eggs'], number=3, ranking=1)
+        self.assertEqual(len(recipes), 3)
+        path, query = self.stub.requests[0]
+        self.assertEqual(path, '/recipes/findByIngredients')
+        self.assertEqual(query['ingredients'], 'milk,eggs')
+        self.assertEqual(query['apiKey'], 'test-key')
+
+    @override_settings(SPOONACULAR={'API_KEY': 'from-settings'})
+    def test_api_key_comes_from_settings(self):
+        self.make_client(api_key=None).find_by_ingredients(['milk'])
+        self.assertEqual(self.stub.requests[0][1]['apiKey'], 'from-settings')
+
+    @override_settings(TESTING=False, SPOONACULAR={'API_KEY': None})
+    def test_missing_api_key_is_reported(self):
+        self.assertEqual([warning.id for warning in check_api_key(None)], ['api.W001'])
+        with self.settings(SPOONACULAR={'API_KEY': 'set'}):
+            self.assertEqual(check_api_key(None), [])
+        with self.settings(RECIPE_SOURCE='local'):
+            self.assertEqual(check_api_key(None), [])
+
+    def test_quota_headers_are_recorded(self):
+        quota = SpoonacularQuota(rate=None)
+        self.addCleanup(cache.clear)
+        self.stub.daily_quota = 10
+        self.make_client(quota=quota).find_by_ingredients(['milk'], number=1)
+        self.assertEqual(quota.status()['used'], quota.status()['request'])
+        self.assertLess(quota.status()['left'], 10)
+
+    def test_connections_are_kept_alive(self):
+        client = self.make_client()
+        for _ in range(5):
+            client.find_by_ingredients(['milk'])
+        self.assertEqual(self.stub.hits, 5)
+        self.assertEqual(len(self.stub.connections), 1)
+
+    def test_transient_errors_are_retried_with_backoff(self):
+        self.stub.statuses = [503, 502]
+        recipes = self.make_client().find_by_ingredients(['milk'], number=1)
+        self.assertEqual(len(recipes), 1)
+        self.assertEqual(self.stub.hits, 3)
+        self.assertEqual(len(self.sleeps), 2)
+
+    def test_retry_budget_is_bounded(self):
+        self.stub.statuses = [500] * 10
+        with self.assertRaises(UpstreamUnavailable) as ctx:
+            self.make_client().find_by_ingredients(['milk'])
+        self.assertEqual(ctx.exception.status_code, 500)
+        self.assertEqual(self.stub.hits, 3)
+
+    def test_quota_errors_are_not_retried(self):
+        self.stub.statuses = [402]
+        with self.assertRaises(SpoonacularError) as ctx:
+            self.make_client().find_by_ingredients(['milk'])
+        self.assertNotIsInstance(ctx.exception, UpstreamUnavailable)
+        self.assertEqual(ctx.exception.status_code, 402)
+        self.assertEqual(self.stub.hits, 1)
+
+    def test_stub_error_rate(self):
+        self.stub.error_rate = 1.0
+        self.stub.error_statuses = (503,)
+        with self.assertRaises(UpstreamUnavailable):
+            self.make_client(max_retries=0).find_by_ingredients(['milk'])
+        self.stub.error_rate = 0.0
+        self.assertEqual(len(self.make_client().find_by_ingredients(['milk'], number=1)), 1)
+
+    def test_read_timeout(self):
+        self.stub.latency = 0.5
+        client = self.make_client(read_timeout=0.05, max_retries=0)
+        with self.assertRaises(UpstreamUnavailable):
+            client.find_by_ingredients(['milk'])
+
+    def test_open_circuit_fails_fast(self):
+        self.stub.statuses = [500] * 10
+        client = self.make_client(max_retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+        for _ in range(2):
+            with self.assertRaises(UpstreamUnavailable):
+                client.find_by_ingredients(['milk'])
+        with self.assertRaises(UpstreamUnavailable):
+            client.find_by_ingredients(['milk'])
+        self.assertEqual(self.stub.hits, 2)
+
+    def test_request_errors_trip_the_breaker_without_leaking_the_key(self):
+        clock = FakeClock()
+        client = self.make_client(max_retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=10,
+                                                                        clock=clock))
+        error = requests.exceptions.ChunkedEncodingError(f'{self.stub.url}/?apiKey=test-key broke')
+        with patch.object(client.session, 'get', side_effect=error):
+            with self.assertRaises(UpstreamUnavailable) as ctx:
+                client.find_by_ingredients(['milk'])
+            self.assertNotIn('test-key', str(ctx.exception))
+
+            clock.now = 10  # The half-open trial fails the same way
+            with self.assertRaises(UpstreamUnavailable):
+                client.find_by_ingredients(['milk'])
+        clock.now = 20
+        self.assertEqual(len(client.find_by_ingredients(['milk'], number=1)), 1)
+
+    def test_trial_ending_without_an_outcome_lets_the_next_one_through(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+        client = self.make_client(max_retries=0, breaker=breaker)
+        breaker.record_failure()
+        clock.now = 10
+        with patch.object(client.session, 'get', side_effect=RuntimeError('not a request error')):
+            with self.assertRaises(RuntimeError):
+                client.find_by_ingredients(['milk'])
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(len(client.find_by_ingredients(['milk'], number=1)), 1)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+
+class CircuitBreakerTestCase(SimpleTestCase):
+    def test_half_open_allows_a_single_trial(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+
+        clock.now = 10
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_trial_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        clock.now = 10
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        clock.now = 15
+        self.assertFalse(breaker.allow_request())
@@ -0,0 +1,189 @@
+"""
+Helpers for the tests and benchmarks, most notably a local stand-in for the
+Spoonacular API:
+
+    with StubSpoonacularServer(latency=0.05) as stub:
+        client = SpoonacularClient(base_url=stub.url)
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from django.core.cache import caches
+
+from .cache import reset_caches
+
+
+def clear_caches():
+    """
+    Empty every Django cache and every in-process TieredCache tier, forget
+    the local recipe index and drop pending recipe precomputations. Test data
+    is rolled back between tests but cached payloads are not, and ids get reused.
+    """
+    # Imported here: these need the app registry, and the benchmarks import
+    # this module before setting Django up
+    from .precompute import recompute_queue
+    from .recipe_index import reset_recipe_index
+
+    for cache in caches.all(initialized_only=True):
+        cache.clear()
+    reset_caches()
+    reset_recipe_index()
+    recompute_queue.clear()
+
+
+class FakeClock:
+    """
+    Stand-in for time.monotonic/time.time (call it) and time.sleep (sleep()),
+    moved forward by setting or advancing ``now``.
+    """
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def fake_recipes(ingredients, number=10):
+    """
+    Deterministic findByIngredients-shaped payload for the given ingredient list.
+    """
+    return [
+        {
+            'id': index + 1,
+            'title': f'Recipe {index + 1} with {", ".join(ingredients)}',
+            'image': f'https://img.spoonacular.com/recipes/{index + 1}-312x231.jpg',
+            'usedIngredientCount': len(ingredients),
+            'missedIngredientCount': index,
+            'likes': 0,
+        }
+        for index in range(number)
+    ]
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep the connection alive between requests
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        stub = self.server.stub
+        url = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        status_code = stub.record(self.client_address, url.path, query)
+
+        if stub.latency:
+            time.sleep(stub.latency)
+
+        if url.path != '/recipes/findByIngredients':
+            status_code = 404
+        if status_code == 200:
+            ingredients = [name for name in query.get('ingredients', '').split(',') if name]
+            body = fake_recipes(ingredients, int(query.get('number', 10)))
+            status_code, quota_headers = stub.charge(1 + 0.01 * len(body))
+        else:
+            quota_headers = {}
+        if status_code != 200:
+            body = {'status': 'failure', 'code': status_code}
+
+        payload = json.dumps(body).encode('utf-8')
+        try:
+            self.send_response(status_code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            for name, value in quota_headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (e.g. a read timeout under test)
+            self.close_connection = True
+
+
+class StubSpoonacularServer:
+    """
+    Threaded HTTP server on an ephemeral localhost port that mimics findByIngredients.
+
+    ``statuses`` is consumed one entry per request (200 once it runs out), which
+    makes it easy to script "fail twice, then succeed". ``latency`` is added to
+    every response. Once ``statuses`` is used up, a fraction ``error_rate`` of
+    the requests fails with one of ``error_statuses``, drawn from a generator
+    seeded with ``seed``.
+
+    Successful calls are charged quota points like Spoonacular's (1 plus 0.01
+    per recipe returned) and report them in the X-API-Quota-* headers. Once
+    ``daily_quota`` points are used up, calls fail with 402.
+    """
+
+    def __init__(self, latency=0.0, statuses=None, error_rate=0.0, error_statuses=(429, 500, 503), seed=None,
+                 port=0, daily_quota=None):
+        self.latency = latency
+        self.daily_quota = daily_quota
+        self.points_used = 0.0
+        self.statuses = list(statuses or [])
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.requests = []
+        self.connections = set()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def hits(self):
+        return len(self.requests)
+
+    def record(self, client_address, path, query):
+        with self._lock:
+            self.requests.append((path, query))
+            self.connections.add(client_address)
+            if self.statuses:
+                return self.statuses.pop(0)
+            if self.error_rate and self._random.random() < self.error_rate:
+                return self._random.choice(self.error_statuses)
+            return 200
+
+    def charge(self, points):
+        """
+        Charge a successful call; return its status and quota headers.
+        """
+        with self._lock:
+            if self.daily_quota is not None and self.points_used >= self.daily_quota:
+                return 402, {}
+            self.points_used += points
+            headers = {'X-API-Quota-Request': f'{points:g}', 'X-API-Quota-Used': f'{self.points_used:g}'}
+            if self.daily_quota is not None:
+                headers['X-API-Quota-Left'] = f'{max(0.0, self.daily_quota - self.points_used):g}'
+            return 200, headers
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
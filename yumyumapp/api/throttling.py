@@ -0,0 +1,30 @@
+"""
+Rate limits for the endpoints that hash passwords, kept in the default cache
+(see DEFAULT_THROTTLE_RATES). Per client IP (REMOTE_ADDR, or X-Forwarded-For
+as far back as REST_FRAMEWORK["NUM_PROXIES"] trusted proxies), so one source
+can't take all the hashing capacity, and per email, so credential stuffing
+against one account is slowed down whichever IPs it comes from. Exceeding
+either answers 429 with Retry-After.
+"""
+import hashlib
+
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class PasswordIPThrottle(SimpleRateThrottle):
+    scope = 'password_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginEmailThrottle(SimpleRateThrottle):
+    scope = 'login_email'
+
+    def get_cache_key(self, request, view):
+        email = request.data.get('email')
+        if not isinstance(email, str) or not email:
+            return None
+        # Hashed: any string can arrive here, not all of them valid cache keys
+        ident = hashlib.sha256(email.strip().lower().encode()).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
@@ -2,11 +2,20 @@ from django.urls import path
 from . import views
 
 urlpatterns = [path('login/', views.login_view, name='login'), path('register/', views.register_view, name='register'),
-               path('logout/', views.logout_view, name='logout'), path('profile/', views.user_profile, name='profile'),
+               path('logout/', views.logout_view, name='logout'),
+               path('token/rotate/', views.rotate_token_view, name='rotate_token'), path('profile/', views.user_profile, name='profile'),
                path('fridge/', views.view_fridge, name='fridge'),
+               path('fridge/items/', views.list_fridge_items, name='list_fridge_items'),
                path('fridge/add/', views.add_fridge_item, name='add_fridge_item'),
+               path('fridge/bulk/', views.bulk_add_fridge_items, name='bulk_add_fridge_items'),
                path('fridge/item/<int:item_id>/update/', views.update_fridge_item_quantity, name='update_fridge_item_quantity'),
                path('fridge/item/<int:item_id>/remove/', views.remove_fridge_item, name='remove_fridge_item'),
                path('fridge/clear/', views.clear_fridge, name='clear_fridge'),
+               path('fridges/', views.fridges, name='fridges'),
+               path('fridges/all/', views.all_fridges_inventory, name='all_fridges_inventory'),
+               path('fridges/<int:fridge_id>/', views.fridge_detail, name='fridge_detail'),
+               path('fridges/<int:fridge_id>/add/', views.add_item_to_fridge, name='add_item_to_fridge'),
                path('recipes/find-by-ingredients/', views.find_recipes_by_ingredients,
-                    name='find_recipes_by_ingredients')]
+                    name='find_recipes_by_ingredients'),
+               path('recipes/find-by-ingredients/async/', views.find_recipes_by_ingredients_async,
+                    name='find_recipes_by_ingredients_async')]
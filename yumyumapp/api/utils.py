@@ -0,0 +1,24 @@
+from django.utils.http import parse_etags
+
+
+def normalize_name(name):
+    """
+    Canonical form of an item/ingredient name: casefolded with runs of
+    whitespace collapsed to a single space (" Green  Apples" -> "green apples").
+    """
+    return ' '.join(str(name).split()).casefold()
+
+
+def etag_matches(request, etag):
+    """
+    True when the request's If-None-Match header lists ``etag`` (or is "*"),
+    i.e. the client's copy is current. Uses the weak comparison RFC 9110 asks for.
+    """
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    if '*' in etags:
+        return True
+    etag = etag.removeprefix('W/')
+    return any(tag.removeprefix('W/') == etag for tag in etags)
@@ -1,17 +1,43 @@
+from asgiref.sync import sync_to_async
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, throttle_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from django.contrib.auth import authenticate
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.authtoken.models import Token
 from django.contrib.auth.models import User
-import requests
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, Min, Sum
+from django.http import HttpResponseNotModified, JsonResponse
+from django.views.decorators.http import require_GET
 from .models import Fridge, FridgeItem
-from .serializers import FridgeSerializer, FridgeItemSerializer
+from .serializers import FridgeItemSerializer, FridgeSummarySerializer, fridge_data, fridge_item_data
+from .authentication import aget_token_user, rotate_token, token_needs_rotation
+from .hashing import PoolSaturated, hash_password, hashing_pool, verify_password
+from .fridges import (
+    DEFAULT_FRIDGE_NAME, default_fridge_id, default_fridge_ids, deferred_fridge_changes, forget_default_fridge,
+    fridge_cache, fridge_cache_key, fridge_changed, fridge_etag, get_default_fridge,
+)
+from .pagination import InvalidCursor, after, decode_cursor, encode_cursor, normalized_prefix
+from .routers import replica_reads
+from .recipes import afind_recipes, find_recipes, recipe_etag
+from .spoonacular import SpoonacularError
+from .throttling import LoginEmailThrottle, PasswordIPThrottle
+from .utils import etag_matches, normalize_name
+
+
+def _hashing_busy():
+    return Response(
+        {'error': 'Too many login attempts in progress, try again shortly'},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': str(hashing_pool.retry_after)}
+    )
 
 
 @api_view(['POST'])
+@authentication_classes([])  # A stale or expired token in the header must not block logging in
 @permission_classes([AllowAny])
+@throttle_classes([PasswordIPThrottle, LoginEmailThrottle])
 def login_view(request):
     """
     Login endpoint that accepts email/password and returns a token
@@ -25,19 +51,27 @@ def login_view(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # Find user by email (assuming email is stored in username field for simplicity)
+    # One lookup: authenticate() would fetch the user again by username
     try:
         user = User.objects.get(email=email)
     except User.DoesNotExist:
-        return Response(
-            {'error': 'Invalid credentials'},
-            status=status.HTTP_401_UNAUTHORIZED
-        )
+        user = None
 
-    # Authenticate user
-    user = authenticate(username=user.username, password=password)
-    if user:
+    try:
+        if user is None:
+            # Hash anyway so unknown emails take as long as wrong passwords
+            hash_password(password)
+            valid = False
+        else:
+            # Re-hashes with the preferred hasher when the stored hash is outdated
+            valid = verify_password(user, password)
+    except PoolSaturated:
+        return _hashing_busy()
+
+    if valid and user.is_active:
         token, created = Token.objects.get_or_create(user=user)
+        if not created and token_needs_rotation(token):
+            token = rotate_token(user)
         return Response({
             'token': token.key,
             'user': {
@@ -54,7 +88,9 @@ def login_view(request):
 
 
 @api_view(['POST'])
+@authentication_classes([])
 @permission_classes([AllowAny])
+@throttle_classes([PasswordIPThrottle])
 def register_view(request):
     """
     Register endpoint to create new users
@@ -76,16 +112,26 @@ def register_view(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # Create new user
-    user = User.objects.create_user(
-        username=email,  # Using email as username
-        email=email,
-        password=password,
-        first_name=name
-    )
+    try:
+        password_hash = hash_password(password)
+    except PoolSaturated:
+        return _hashing_busy()
+
+    with transaction.atomic():
+        # Create new user, as create_user() would but with the password already hashed
+        user = User.objects.create(
+            username=User.normalize_username(email),  # Using email as username
+            email=User.objects.normalize_email(email),
+            password=password_hash,
+            first_name=name
+        )
+
+        # Create token for new user
+        token = Token.objects.create(user=user)
 
-    # Create token for new user
-    token = Token.objects.create(user=user)
+        # Provision the default fridge now, so the fridge endpoints never have to create it
+        fridge = Fridge.objects.create(user=user, name=DEFAULT_FRIDGE_NAME)
+    default_fridge_ids.set(user.id, fridge.pk)
 
     return Response({
         'token': token.key,
@@ -101,6 +147,7 @@ def register_view(request):
 def logout_view(request):
     """
     Logout endpoint to delete user token
+    (which also evicts it from the token cache, see api.signals)
     """
     try:
         request.user.auth_token.delete()
@@ -109,6 +156,15 @@ def logout_view(request):
         return Response({'message': 'Successfully logged out'})
 
 
+@api_view(['POST'])
+def rotate_token_view(request):
+    """
+    Replace the caller's token with a new one; the old token stops working immediately.
+    """
+    token = rotate_token(request.user)
+    return Response({'token': token.key})
+
+
 @api_view(['GET'])
 def user_profile(request):
     """
@@ -123,14 +179,89 @@ def user_profile(request):
     })
 
 
+def _not_modified(etag):
+    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+
 @api_view(['GET'])
+@replica_reads
 def view_fridge(request):
     """
     View the contents of the user's default fridge.
+    Served from the per-user fridge cache, which every mutation invalidates,
+    and read from the replica when there is one.
+    The response carries an ETag; a request whose If-None-Match matches it gets
+    a 304 without the items being read or serialized.
+    """
+    cache_key = fridge_cache_key(request.user.id)
+    cached = fridge_cache.get(cache_key)
+    if cached is None:
+        fridge = get_default_fridge(request.user)
+        etag = fridge_etag(fridge)
+        if etag_matches(request, etag):
+            return _not_modified(etag)
+        # Items are read after the version, so the payload is never older than its ETag
+        cached = (etag, fridge_data(fridge))
+        fridge_cache.set(cache_key, cached)
+    etag, payload = cached
+    if etag_matches(request, etag):
+        return _not_modified(etag)
+    return Response(payload, headers={'ETag': etag})
+
+
+# Fields of the item listing, in the order list_fridge_items selects them
+ITEM_FIELDS = ('id', 'name', 'quantity')
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+@api_view(['GET'])
+def list_fridge_items(request):
+    """
+    Page through the items of the user's default fridge, ordered by name.
+    Query parameters (all optional):
+      limit  - items per page (default 100, at most 500)
+      cursor - where to continue, taken from the previous page's 'next' link
+      fields - comma-separated subset of id,name,quantity
+      prefix - only items whose name starts with it (case-insensitive)
+    Unlike view_fridge, the cost of a page doesn't grow with the fridge.
     """
-    fridge, created = Fridge.objects.get_or_create(user=request.user, name='Main Fridge')
-    serializer = FridgeSerializer(fridge)
-    return Response(serializer.data)
+    params = request.query_params
+    fields = [field.strip() for field in params.get('fields', ','.join(ITEM_FIELDS)).split(',') if field.strip()]
+    unknown = [field for field in fields if field not in ITEM_FIELDS]
+    if not fields or unknown:
+        return Response({'error': f'fields must be a comma-separated subset of {",".join(ITEM_FIELDS)}.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        limit = int(params.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        return Response({'error': 'limit must be a positive integer.'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    items = FridgeItem.objects.filter(fridge_id=default_fridge_id(request.user))
+    prefix = normalize_name(params.get('prefix', ''))
+    if prefix:
+        items = items.filter(normalized_prefix(prefix, connections[items.db].vendor))
+    if params.get('cursor'):
+        try:
+            items = items.filter(after(*decode_cursor(params['cursor'])))
+        except InvalidCursor:
+            return Response({'error': 'Invalid cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # One extra row tells whether there is a next page
+    rows = list(items.order_by('name', 'id').values_list(*ITEM_FIELDS)[:limit + 1])
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        item_id, name, _ = rows[-1]
+        next_url = replace_query_param(request.build_absolute_uri(), 'cursor', encode_cursor(name, item_id))
+
+    positions = [(field, ITEM_FIELDS.index(field)) for field in fields]
+    results = [{field: row[position] for field, position in positions} for row in rows]
+    return Response({'next': next_url, 'results': results})
 
 
 @api_view(['POST'])
@@ -139,36 +270,119 @@ def add_fridge_item(request):
     Add an item to the user's default fridge.
     Expects {'name': 'item_name', 'quantity': 1} in the request body.
     """
-    fridge, _ = Fridge.objects.get_or_create(user=request.user, name='Main Fridge')
+    try:
+        return _add_item(request, default_fridge_id(request.user))
+    except IntegrityError:
+        # The cached id belonged to a default fridge that has been deleted since
+        forget_default_fridge(request.user.id)
+        return _add_item(request, default_fridge_id(request.user))
+
+
+def _add_item(request, fridge_id):
     name = request.data.get('name')
     quantity = request.data.get('quantity', 1)
 
     if not name:
         return Response({'error': 'Item name is required.'}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Check if item already exists and update quantity
-    item, created = FridgeItem.objects.get_or_create(
-        fridge=fridge,
-        name__iexact=name,  # Case-insensitive check
-        defaults={'name': name, 'quantity': quantity}
-    )
+    try:
+        quantity = int(quantity)
+    except (TypeError, ValueError):
+        return Response({'error': 'Quantity must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
 
-    if not created:
-        # If item already existed, update its quantity
-        item.quantity += int(quantity)
-        item.save()
+    # Adds to the existing item with the same normalized name in a single atomic UPDATE, or creates it
+    item, created = FridgeItem.objects.add_quantity(fridge_id, name, quantity)
+    # add_quantity writes with raw SQL, so no model signal fires
+    fridge_changed(fridge_id, request.user.id)
 
     serializer = FridgeItemSerializer(item)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+# Keeps a bulk request to a single INSERT statement on every supported database
+MAX_BULK_ITEMS = 200
+
+
+@transaction.atomic
+def _upsert_items(fridge_id, merged):
+    """
+    Add the merged {normalized name: {'name', 'quantity'}} batch to the fridge.
+    Returns the items that existed before (by normalized name) and the written items, in batch order.
+    """
+    # Only to tell created items from topped-up ones; the quantities are added
+    # inside the database, so concurrent adds are never lost
+    existing = set(
+        FridgeItem.objects.filter(fridge_id=fridge_id, normalized_name__in=list(merged))
+        .values_list('normalized_name', flat=True)
+    )
+    items = FridgeItem.objects.add_quantities(
+        fridge_id, {key: (entry['name'], entry['quantity']) for key, entry in merged.items()}
+    )
+    return existing, items
+
+
+@api_view(['POST'])
+def bulk_add_fridge_items(request):
+    """
+    Add or top up many items of the user's default fridge in one transaction.
+    Expects [{'name': 'item_name', 'quantity': 1}, ...] (or {'items': [...]}).
+    Names are matched on their normalized form, both within the batch and
+    against existing items, and quantities are added to what is already there.
+    """
+    entries = request.data.get('items') if isinstance(request.data, dict) else request.data
+    if not isinstance(entries, list) or not entries:
+        return Response({'error': 'A non-empty list of items is required.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(entries) > MAX_BULK_ITEMS:
+        return Response({'error': f'At most {MAX_BULK_ITEMS} items can be added at once.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    # Merge the batch: one entry per normalized name, first spelling wins
+    merged = {}
+    errors = {}
+    for index, entry in enumerate(entries):
+        name = entry.get('name') if isinstance(entry, dict) else None
+        name = name.strip() if isinstance(name, str) else ''
+        try:
+            quantity = int(entry.get('quantity', 1))
+        except (AttributeError, TypeError, ValueError):
+            quantity = 0
+        if not name:
+            errors[index] = 'Item name is required.'
+        elif quantity < 1:
+            errors[index] = 'Quantity must be a positive integer.'
+        else:
+            key = normalize_name(name)
+            if key in merged:
+                merged[key]['quantity'] += quantity
+            else:
+                merged[key] = {'name': name, 'quantity': quantity}
+    if errors:
+        return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        existing, items = _upsert_items(default_fridge_id(request.user), merged)
+    except IntegrityError:
+        # The cached id belonged to a default fridge that has been deleted since
+        forget_default_fridge(request.user.id)
+        existing, items = _upsert_items(default_fridge_id(request.user), merged)
+    # bulk_create doesn't send model signals
+    fridge_changed(items[0].fridge_id, request.user.id)
+
+    results = [
+        {**fridge_item_data(item), 'created': key not in existing, 'added': merged[key]['quantity']}
+        for key, item in zip(merged, items)
+    ]
+    return Response({'items': results}, status=status.HTTP_200_OK)
+
+
 @api_view(['PATCH'])
 def update_fridge_item_quantity(request, item_id):
     """
     Update the quantity of a fridge item.
     """
     try:
-        item = FridgeItem.objects.get(id=item_id, fridge__user=request.user)
+        # The fridge comes along in the same query; the cache-invalidation signal needs its user
+        item = FridgeItem.objects.select_related('fridge').get(id=item_id, fridge__user=request.user)
         quantity = request.data.get('quantity')
 
         if quantity is None:
@@ -181,7 +395,7 @@ def update_fridge_item_quantity(request, item_id):
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         item.quantity = quantity
-        item.save()
+        item.save(update_fields=['quantity'])
 
         serializer = FridgeItemSerializer(item)
         return Response(serializer.data)
@@ -195,7 +409,7 @@ def remove_fridge_item(request, item_id):
     Remove an item from the fridge by its ID.
     """
     try:
-        item = FridgeItem.objects.get(id=item_id, fridge__user=request.user)
+        item = FridgeItem.objects.select_related('fridge').get(id=item_id, fridge__user=request.user)
         item.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
     except FridgeItem.DoesNotExist:
@@ -207,46 +421,225 @@ def clear_fridge(request):
     """
     Remove all items from the user's default fridge.
     """
+    fridge_id = default_fridge_id(request.user)
+    # One DELETE whatever the size: QuerySet.delete() would fetch the items
+    # first (FridgeItem has signal receivers) and delete them 100 at a time.
+    # Nothing depends on items; the cache is dealt with below.
+    meta = FridgeItem._meta
+    with connections[router.db_for_write(FridgeItem)].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {cursor.db.ops.quote_name(meta.db_table)} '
+            f'WHERE {cursor.db.ops.quote_name(meta.get_field("fridge").column)} = %s',
+            [fridge_id],
+        )
+        deleted = cursor.rowcount
+    if not deleted:
+        return Response({'message': 'Fridge is already empty.'}, status=status.HTTP_200_OK)
+    fridge_changed(fridge_id, request.user.id)
+    return Response({'message': 'Fridge has been cleared.'}, status=status.HTTP_200_OK)
+
+
+# --- Multiple fridges, addressed by id ---
+
+@api_view(['GET', 'POST'])
+def fridges(request):
+    """
+    GET lists the user's fridges with their item counts.
+    POST creates one; expects {'name': 'Garage Freezer'} in the request body.
+    """
+    if request.method == 'GET':
+        queryset = Fridge.objects.filter(user=request.user).annotate(item_count=Count('items')).order_by('id')
+        return Response(FridgeSummarySerializer(queryset, many=True).data)
+
+    name = request.data.get('name')
+    name = name.strip() if isinstance(name, str) else ''
+    if not name:
+        return Response({'error': 'Fridge name is required.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(name) > Fridge._meta.get_field('name').max_length:
+        return Response({'error': 'Fridge name is too long.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        with transaction.atomic():
+            fridge = Fridge.objects.create(user=request.user, name=name)
+    except IntegrityError:
+        return Response({'error': 'You already have a fridge with this name.'}, status=status.HTTP_400_BAD_REQUEST)
+    fridge.item_count = 0
+    return Response(FridgeSummarySerializer(fridge).data, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET', 'DELETE'])
+def fridge_detail(request, fridge_id):
+    """
+    GET views the contents of one of the user's fridges (with an ETag, like view_fridge).
+    DELETE removes the fridge and everything in it.
+    """
     try:
-        fridge = Fridge.objects.get(user=request.user, name='Main Fridge')
-        fridge.items.all().delete()
-        return Response({'message': 'Fridge has been cleared.'}, status=status.HTTP_200_OK)
+        fridge = Fridge.objects.get(pk=fridge_id, user=request.user)
     except Fridge.DoesNotExist:
-        # If the fridge doesn't exist, there's nothing to clear.
-        return Response({'message': 'Fridge is already empty.'}, status=status.HTTP_200_OK)
+        return Response({'error': 'Fridge not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+    if request.method == 'DELETE':
+        # The fridge's own post_delete signal drops the caches, not one signal per item
+        with deferred_fridge_changes(fridge.pk):
+            fridge.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    etag = fridge_etag(fridge)
+    if etag_matches(request, etag):
+        return _not_modified(etag)
+    return Response(fridge_data(fridge), headers={'ETag': etag})
+
+
+@api_view(['POST'])
+def add_item_to_fridge(request, fridge_id):
+    """
+    Add an item to one of the user's fridges, like add_fridge_item does for the default one.
+    """
+    try:
+        fridge = Fridge.objects.get(pk=fridge_id, user=request.user)
+    except Fridge.DoesNotExist:
+        return Response({'error': 'Fridge not found.'}, status=status.HTTP_404_NOT_FOUND)
+    return _add_item(request, fridge.pk)
 
 
 @api_view(['GET'])
-def find_recipes_by_ingredients(request):
+def all_fridges_inventory(request):
+    """
+    Combined inventory of all of the user's fridges: one entry per normalized
+    item name with its total quantity and the number of fridges holding it.
+    Computed by a single GROUP BY query.
     """
-    Finds recipes based on the ingredients in the user's fridge
-    by calling the Spoonacular API.
+    totals = (
+        FridgeItem.objects.filter(fridge__user=request.user)
+        .values('normalized_name')
+        .annotate(display_name=Min('name'), total=Sum('quantity'), fridge_count=Count('fridge'))
+        .order_by('normalized_name')
+    )
+    items = [
+        {'name': row['display_name'], 'quantity': row['total'], 'fridge_count': row['fridge_count']}
+        for row in totals
+    ]
+    return Response({'items': items})
+
+
+def _ingredient_names(user, selector):
+    """
+    Item names a recipe search uses, as a lazy queryset: the default fridge
+    when ``selector`` is empty, every fridge of the user for 'all', or the
+    fridge with that id. Raises ValueError for anything else.
     """
-    SPOONACULAR_API_KEY = '760dae2f56cd42d7b7ffc86d6a78a5a6'
+    if not selector:
+        items = FridgeItem.objects.filter(fridge_id=default_fridge_id(user))
+    elif selector == 'all':
+        items = FridgeItem.objects.filter(fridge__user=user)
+    else:
+        items = FridgeItem.objects.filter(fridge__user=user, fridge_id=_fridge_id(selector))
+    return items.values_list('name', flat=True)
+
+
+def _fridge_id(selector):
+    fridge_id = int(selector)
+    # Beyond a 64-bit id no fridge exists, and SQLite raises OverflowError for it
+    return fridge_id if 0 < fridge_id < 2 ** 63 else None
 
+
+def _fridge_found(user, selector):
+    # Only asked when the search found no items, to tell an empty fridge from a wrong id
+    if not selector or selector == 'all':
+        return True
+    fridge_id = _fridge_id(selector)
+    return fridge_id is not None and Fridge.objects.filter(user=user, pk=fridge_id).exists()
+
+
+def _retry_after(exc):
+    # Set when the search was shed to stay within the Spoonacular budget (api.quota)
+    retry_after = getattr(exc, 'retry_after', None)
+    return {'Retry-After': str(retry_after)} if retry_after else None
+
+
+@api_view(['GET'])
+def find_recipes_by_ingredients(request):
+    """
+    Finds recipes based on the ingredients in the user's fridge,
+    from the local recipe catalog and/or the Spoonacular API (see RECIPE_SOURCE).
+    The ETag depends only on the ingredient set, so a matching If-None-Match
+    gets a 304 without searching.
+    ?fridge=<id> searches one of the user's fridges instead of the default one,
+    ?fridge=all the union of all of them.
+    Results that may be out of date (see api.recipes) carry an X-Recipes-Stale header.
+    """
     try:
-        fridge = Fridge.objects.get(user=request.user, name='Main Fridge')
-        ingredients = [item.name for item in fridge.items.all()]
-    except Fridge.DoesNotExist:
-        ingredients = []
+        names = _ingredient_names(request.user, request.query_params.get('fridge'))
+    except ValueError:
+        return Response({'error': 'fridge must be a fridge id or "all".'}, status=status.HTTP_400_BAD_REQUEST)
+    ingredients = list(names)
 
     if not ingredients:
+        if not _fridge_found(request.user, request.query_params.get('fridge')):
+            return Response({'error': 'Fridge not found.'}, status=status.HTTP_404_NOT_FOUND)
         return Response({'message': 'Your fridge is empty. Add some items to find recipes.'},
                         status=status.HTTP_400_BAD_REQUEST)
 
-    ingredients_str = ",".join(ingredients)
+    etag = recipe_etag(ingredients)
+    if etag_matches(request, etag):
+        return _not_modified(etag)
 
-    params = {
-        'ingredients': ingredients_str,
-        'number': 10,  # Return up to 10 recipes
-        'ranking': 1,  # Maximize used ingredients
-        'ignorePantry': True,
-        'apiKey': SPOONACULAR_API_KEY
-    }
+    try:
+        result = find_recipes(ingredients, user_id=request.user.id)
+    except SpoonacularError as exc:
+        return Response({'error': 'Failed to fetch recipes from Spoonacular.'}, status=exc.status_code,
+                        headers=_retry_after(exc))
 
-    response = requests.get('https://api.spoonacular.com/recipes/findByIngredients', params=params)
+    return Response(result.recipes, headers=result.headers(etag))
 
-    if response.status_code == 200:
-        return Response(response.json())
-    else:
-        return Response({'error': 'Failed to fetch recipes from Spoonacular.'}, status=response.status_code)
+
+# --- Async (ASGI) views ---
+# DRF's @api_view is sync-only, so these are plain Django async views. Under
+# ASGI they await the database and Spoonacular instead of holding a thread.
+
+async def _aget_token_user(request):
+    """
+    Async equivalent of DRF TokenAuthentication: resolves 'Authorization: Token <key>'.
+    """
+    auth = request.headers.get('Authorization', '').split()
+    if len(auth) != 2 or auth[0].lower() != 'token':
+        return None
+    return await aget_token_user(auth[1])
+
+
+@require_GET
+async def find_recipes_by_ingredients_async(request):
+    """
+    Non-blocking version of find_recipes_by_ingredients for ASGI deployments.
+    Authenticates with the same 'Authorization: Token <key>' header.
+    """
+    user = await _aget_token_user(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'},
+                            status=status.HTTP_403_FORBIDDEN)
+
+    selector = request.GET.get('fridge')
+    try:
+        # Resolving the default fridge id may query the database
+        names = await sync_to_async(_ingredient_names)(user, selector)
+    except ValueError:
+        return JsonResponse({'error': 'fridge must be a fridge id or "all".'}, status=status.HTTP_400_BAD_REQUEST)
+    ingredients = [name async for name in names]
+
+    if not ingredients:
+        if not await sync_to_async(_fridge_found)(user, selector):
+            return JsonResponse({'error': 'Fridge not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return JsonResponse({'message': 'Your fridge is empty. Add some items to find recipes.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+    etag = recipe_etag(ingredients)
+    if etag_matches(request, etag):
+        return HttpResponseNotModified(headers={'ETag': etag})
+
+    try:
+        result = await afind_recipes(ingredients, user_id=user.id)
+    except SpoonacularError as exc:
+        return JsonResponse({'error': 'Failed to fetch recipes from Spoonacular.'}, status=exc.status_code,
+                            headers=_retry_after(exc))
+
+    return JsonResponse(result.recipes, safe=False, headers=result.headers(etag))
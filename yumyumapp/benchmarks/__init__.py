@@ -0,0 +1,37 @@
+"""
+Benchmarks for the YumYum backend. Run them from the ``yumyumapp`` directory:
+
+    python -m benchmarks.asgi_vs_wsgi
+
+Each benchmark works on a throwaway SQLite database (see ``setup_django``)
+and talks to ``api.testing.StubSpoonacularServer`` instead of Spoonacular.
+"""
+import os
+import tempfile
+
+
+def setup_django(db_path=None, **overrides):
+    """
+    Configure Django against a fresh, migrated database file and return its path.
+    ``overrides`` replace top-level settings before Django is set up.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+    import django
+    from django.conf import settings
+
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(prefix='yumyum-bench-', suffix='.sqlite3')
+        os.close(fd)
+    settings.DATABASES['default']['NAME'] = db_path
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    django.setup()
+
+    from django.core.management import call_command
+    from django.test.utils import setup_test_environment
+
+    # Lets django.test.Client/AsyncClient talk to the app ('testserver' host)
+    setup_test_environment()
+    call_command('migrate', verbosity=0, interactive=False)
+    return db_path
@@ -0,0 +1,127 @@
+"""
+Recipe-search throughput with a slow upstream: WSGI threads vs ASGI.
+
+    python -m benchmarks.asgi_vs_wsgi --requests 100 --latency 0.2 --threads 4
+
+Every request comes from a different user with a different fridge, so the
+recipe cache never answers and each request waits ``--latency`` seconds on
+the local Spoonacular stub. Three scenarios are measured in-process:
+
+* wsgi:       the sync DRF view behind a pool of ``--threads`` worker threads
+              (like ``gunicorn --threads``)
+* asgi-sync:  the same sync view served by the ASGI handler
+* asgi-async: the async view, all requests in flight on one event loop
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api.testing import StubSpoonacularServer
+
+from . import setup_django
+
+
+def create_users(count):
+    from django.contrib.auth.models import User
+    from rest_framework.authtoken.models import Token
+
+    from api.models import Fridge, FridgeItem
+
+    tokens = []
+    for index in range(count):
+        user = User.objects.create_user(username=f'bench{index}@example.com', email=f'bench{index}@example.com')
+        fridge = Fridge.objects.create(user=user, name='Main Fridge')
+        FridgeItem.objects.create(fridge=fridge, name=f'ingredient-{index}', quantity=1)
+        tokens.append(Token.objects.create(user=user).key)
+    return tokens
+
+
+def reset_recipe_cache():
+    from django.core.cache import cache
+
+    from api.cache import reset_caches
+
+    cache.clear()
+    reset_caches()
+
+
+def run_wsgi(tokens, threads):
+    from django.test import Client
+    from django.urls import reverse
+
+    url = reverse('find_recipes_by_ingredients')
+    local = threading.local()
+
+    def request(token):
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        return local.client.get(url, HTTP_AUTHORIZATION=f'Token {token}').status_code
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(request, tokens))
+
+
+async def run_asgi(tokens, url_name):
+    from django.test import AsyncClient
+    from django.urls import reverse
+
+    url = reverse(url_name)
+    client = AsyncClient()
+    responses = await asyncio.gather(*[
+        client.get(url, headers={'Authorization': f'Token {token}'}) for token in tokens
+    ])
+    return [response.status_code for response in responses]
+
+
+def measure(name, run):
+    reset_recipe_cache()
+    started = time.perf_counter()
+    statuses = run()
+    elapsed = time.perf_counter() - started
+    return {
+        'scenario': name,
+        'requests': len(statuses),
+        'errors': sum(1 for code in statuses if code != 200),
+        'seconds': round(elapsed, 3),
+        'rps': round(len(statuses) / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.2, help='Seconds the stub upstream sleeps per call')
+    parser.add_argument('--threads', type=int, default=4, help='WSGI worker threads')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args()
+
+    with StubSpoonacularServer(latency=args.latency) as stub:
+        db_path = setup_django(SPOONACULAR={'BASE_URL': stub.url, 'MAX_RETRIES': 0,
+                                            'POOL_MAXSIZE': args.requests},
+                               # Measure the server, not the Spoonacular budget
+                               SPOONACULAR_QUOTA={'RATE': None, 'USER_RATE': None})
+        try:
+            tokens = create_users(args.requests)
+            results = [
+                measure('wsgi', lambda: run_wsgi(tokens, args.threads)),
+                measure('asgi-sync', lambda: asyncio.run(run_asgi(tokens, 'find_recipes_by_ingredients'))),
+                measure('asgi-async', lambda: asyncio.run(run_asgi(tokens, 'find_recipes_by_ingredients_async'))),
+            ]
+        finally:
+            os.remove(db_path)
+
+    if args.json:
+        print(json.dumps({'latency': args.latency, 'threads': args.threads, 'results': results}, indent=2))
+        return
+    print(f'{args.requests} requests, upstream latency {args.latency}s, {args.threads} WSGI threads')
+    for result in results:
+        print(f"{result['scenario']:<11} {result['seconds']:>8.3f}s {result['rps']:>8.1f} req/s "
+              f"{result['errors']} errors")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Seeded benchmark data: N users, each with a token and a default fridge of M
+items. The same --seed gives the same users, items and token keys.
+
+    python -m benchmarks.data --users 100 --items 50 --output users.json
+
+Run on its own, it fills the database in the settings (DATABASE_URL, see
+backend/database.py) and writes the users' credentials as JSON, for
+``benchmarks.load --url ... --users-file users.json``.
+"""
+import argparse
+import json
+import os
+import random
+
+PASSWORD = 'benchmark-password'
+
+INGREDIENTS = (
+    'apple', 'avocado', 'bacon', 'banana', 'basil', 'beef', 'bell pepper', 'black beans', 'broccoli', 'butter',
+    'carrot', 'cheddar', 'chicken breast', 'chickpeas', 'cilantro', 'coconut milk', 'cream', 'cucumber', 'eggs',
+    'feta', 'flour', 'garlic', 'ginger', 'ground turkey', 'honey', 'kale', 'lemon', 'lentils', 'lime', 'milk',
+    'mozzarella', 'mushrooms', 'oats', 'olive oil', 'onion', 'orange', 'parmesan', 'pasta', 'peanut butter',
+    'peas', 'pork chops', 'potato', 'quinoa', 'rice', 'salmon', 'shrimp', 'spinach', 'sweet potato', 'tofu',
+    'tomato', 'tortillas', 'tuna', 'yogurt', 'zucchini',
+)
+
+
+def ingredient_names(rng, count):
+    """
+    `count` distinct item names, real ingredients first.
+    """
+    names = rng.sample(INGREDIENTS, min(count, len(INGREDIENTS)))
+    names += [f'{rng.choice(INGREDIENTS)} {n}' for n in range(count - len(names))]
+    return names
+
+
+def generate(users, items, seed=0, prefix='bench'):
+    """
+    Create the users and their fridges; return their credentials:
+    [{'email', 'password', 'token'}, ...]. The password is hashed once and
+    shared, so seeding doesn't take a hash per user.
+    """
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from rest_framework.authtoken.models import Token
+
+    from api.fridges import DEFAULT_FRIDGE_NAME
+    from api.models import Fridge, FridgeItem
+    from api.utils import normalize_name
+
+    rng = random.Random(seed)
+    password = make_password(PASSWORD)
+    emails = [f'{prefix}{n}@example.com' for n in range(users)]
+    created = User.objects.bulk_create([
+        User(username=email, email=email, password=password, first_name=f'Bench {n}')
+        for n, email in enumerate(emails)
+    ])
+    # bulk_create only returns primary keys on some databases
+    created = list(User.objects.filter(email__in=emails).order_by('pk'))
+    tokens = Token.objects.bulk_create([
+        Token(key=f'{rng.getrandbits(160):040x}', user=user) for user in created
+    ])
+    Fridge.objects.bulk_create([Fridge(user=user, name=DEFAULT_FRIDGE_NAME) for user in created])
+    fridge_ids = dict(
+        Fridge.objects.filter(user__in=created, name=DEFAULT_FRIDGE_NAME).values_list('user_id', 'pk')
+    )
+    FridgeItem.objects.bulk_create(
+        [
+            FridgeItem(fridge_id=fridge_ids[user.pk], name=name, normalized_name=normalize_name(name),
+                       quantity=rng.randint(1, 12))
+            for user in created
+            for name in ingredient_names(rng, items)
+        ],
+        batch_size=1000,
+    )
+    return [
+        {'email': user.email, 'password': PASSWORD, 'token': token.key}
+        for user, token in zip(created, tokens)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--items', type=int, default=50, help='Items per fridge')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--prefix', default='bench', help='Emails are <prefix><n>@example.com')
+    parser.add_argument('--output', help='Write the credentials here instead of stdout')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+
+    django.setup()
+    users = generate(args.users, args.items, args.seed, args.prefix)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(users, f, indent=2)
+    else:
+        print(json.dumps(users, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Latency of adding to an existing item on a large fridge: the old
+case-insensitive lookup (name__iexact + save) versus the normalized-name
+index seek (FridgeItem.objects.add_quantity).
+
+    python -m benchmarks.fridge_add --items 10000 --adds 500
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+from . import setup_django
+
+
+def old_add(fridge, name, quantity):
+    # What add_fridge_item did before: the iexact lookup can't use the unique index
+    from api.models import FridgeItem
+
+    item, created = FridgeItem.objects.get_or_create(
+        fridge=fridge, name__iexact=name, defaults={'name': name, 'quantity': quantity}
+    )
+    if not created:
+        item.quantity += quantity
+        item.save()
+
+
+def new_add(fridge, name, quantity):
+    from api.models import FridgeItem
+
+    FridgeItem.objects.add_quantity(fridge, name, quantity)
+
+
+def measure(add, fridge, names):
+    timings = []
+    for name in names:
+        started = time.perf_counter()
+        add(fridge, name, 1)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        'mean_us': round(sum(timings) / len(timings) * 1e6, 1),
+        'p50_us': round(timings[len(timings) // 2] * 1e6, 1),
+        'p95_us': round(timings[int(len(timings) * 0.95)] * 1e6, 1),
+    }
+
+
+def query_plan(sql, params):
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, nargs='+', default=[10000, 50000])
+    parser.add_argument('--adds', type=int, default=500)
+    args = parser.parse_args()
+
+    db_path = setup_django()
+    try:
+        from django.contrib.auth.models import User
+
+        from api.models import Fridge, FridgeItem
+
+        results = []
+        for size in args.items:
+            user = User.objects.create_user(username=f'walk-in-{size}')
+            fridge = Fridge.objects.create(user=user, name='Main Fridge')
+            FridgeItem.objects.bulk_create(
+                [FridgeItem(fridge=fridge, name=f'Item {n}', normalized_name=f'item {n}') for n in range(size)],
+                batch_size=2000,
+            )
+            rng = random.Random(size)
+            names = [f'ITEM {rng.randrange(size)}' for _ in range(args.adds)]
+            results.append({
+                'items': size,
+                'iexact_lookup': measure(old_add, fridge, names),
+                'normalized_index': measure(new_add, fridge, names),
+            })
+
+        plans = {
+            'iexact_lookup': query_plan(
+                'SELECT id FROM api_fridgeitem WHERE fridge_id = %s AND name LIKE %s ESCAPE \'\\\'', [1, 'item 1']),
+            'normalized_index': query_plan(
+                'SELECT id FROM api_fridgeitem WHERE fridge_id = %s AND normalized_name = %s', [1, 'item 1']),
+        }
+    finally:
+        os.remove(db_path)
+
+    print(json.dumps({'adds': args.adds, 'results': results, 'query_plans': plans}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
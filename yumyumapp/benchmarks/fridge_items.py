@@ -0,0 +1,83 @@
+"""
+Latency and response size of reading a large fridge: the whole fridge from
+view_fridge (cache cleared before every call, as after each mutation) versus
+pages of the keyset-paginated item listing, at the start, deep into the
+fridge and filtered by a name prefix.
+
+    python -m benchmarks.fridge_items --items 10000 100000
+"""
+import argparse
+import json
+import os
+import time
+
+from . import setup_django
+
+
+def measure(client, url, repeat, before=None, **params):
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        if before:
+            before()
+        started = time.perf_counter()
+        response = client.get(url, params)
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.status_code
+        size = len(response.content)
+    timings.sort()
+    return {
+        'p50_ms': round(timings[len(timings) // 2] * 1e3, 2),
+        'p95_ms': round(timings[int(len(timings) * 0.95)] * 1e3, 2),
+        'bytes': size,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    db_path = setup_django()
+    try:
+        from django.contrib.auth.models import User
+        from django.urls import reverse
+        from rest_framework.authtoken.models import Token
+        from rest_framework.test import APIClient
+
+        from api.models import Fridge, FridgeItem
+        from api.pagination import encode_cursor
+        from api.testing import clear_caches
+
+        results = []
+        for size in args.items:
+            user = User.objects.create_user(username=f'walk-in-{size}')
+            fridge = Fridge.objects.create(user=user, name='Main Fridge')
+            FridgeItem.objects.bulk_create(
+                [FridgeItem(fridge=fridge, name=f'Item {n:06d}', normalized_name=f'item {n:06d}') for n in range(size)],
+                batch_size=2000,
+            )
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=user).key)
+            deep = FridgeItem.objects.filter(fridge=fridge).order_by('name', 'id')[size - args.limit * 2]
+
+            listing = reverse('list_fridge_items')
+            results.append({
+                'items': size,
+                'view_fridge': measure(client, reverse('fridge'), max(args.repeat // 4, 3), before=clear_caches),
+                'first_page': measure(client, listing, args.repeat, limit=args.limit),
+                'deep_page': measure(client, listing, args.repeat, limit=args.limit,
+                                     cursor=encode_cursor(deep.name, deep.id)),
+                'prefix_page': measure(client, listing, args.repeat, limit=args.limit, prefix='item 001'),
+                'names_only_page': measure(client, listing, args.repeat, limit=args.limit, fields='name'),
+            })
+    finally:
+        os.remove(db_path)
+
+    print(json.dumps({'limit': args.limit, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,396 @@
+"""
+Load test: every route in api/urls.py under a weighted mix of requests.
+
+    python -m benchmarks.load --users 50 --items 30 --workers 2 --concurrency 8 --seconds 30
+
+``--workers`` processes each run ``--concurrency`` virtual users (threads).
+A virtual user logs in as one of the seeded users (see benchmarks.data) and
+keeps its own state, so every request is valid: items it added are updated
+and removed, fridges it created are read, filled and deleted, a logout is
+followed by a login, and so on.
+
+By default the whole stack runs here: a throwaway SQLite database seeded
+with ``--users`` x ``--items``, the WSGI app on Django's threaded server, and
+the Spoonacular stub with ``--latency`` and ``--upstream-error-rate``.
+Against a real deployment, seed its database and point the driver at it:
+
+    python -m benchmarks.data --users 50 --output users.json
+    python -m benchmarks.stub --port 8089 --latency 0.1   # SPOONACULAR_BASE_URL=http://127.0.0.1:8089
+    python -m benchmarks.load --url http://127.0.0.1:8000 --users-file users.json
+
+(There the login throttles apply; the in-process server turns them off.)
+
+The result is JSON: latency percentiles (ms) and requests per second overall
+and per route (method + URL name), the status codes seen, the configuration
+and the git commit, so runs can be compared between commits (``--output``).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import threading
+import time
+
+import requests
+
+from .data import INGREDIENTS
+
+# Route label: (relative weight, VirtualUser method). Paths mirror api/urls.py.
+ROUTES = {
+    'POST login': (2, 'login'),
+    'POST register': (1, 'register'),
+    'POST logout': (1, 'logout'),
+    'POST rotate_token': (1, 'rotate_token'),
+    'GET profile': (5, 'profile'),
+    'GET fridge': (20, 'view_fridge'),
+    'GET list_fridge_items': (10, 'list_fridge_items'),
+    'POST add_fridge_item': (10, 'add_fridge_item'),
+    'POST bulk_add_fridge_items': (3, 'bulk_add_fridge_items'),
+    'PATCH update_fridge_item_quantity': (6, 'update_fridge_item_quantity'),
+    'DELETE remove_fridge_item': (4, 'remove_fridge_item'),
+    'DELETE clear_fridge': (1, 'clear_fridge'),
+    'GET fridges': (4, 'list_fridges'),
+    'POST fridges': (2, 'create_fridge'),
+    'GET all_fridges_inventory': (3, 'all_fridges_inventory'),
+    'GET fridge_detail': (3, 'fridge_detail'),
+    'DELETE fridge_detail': (1, 'delete_fridge'),
+    'POST add_item_to_fridge': (3, 'add_item_to_fridge'),
+    'GET find_recipes_by_ingredients': (8, 'find_recipes'),
+    'GET find_recipes_by_ingredients_async': (4, 'find_recipes_async'),
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = []  # (route, status, seconds)
+
+    def add(self, route, status, seconds):
+        with self._lock:
+            self.samples.append((route, status, seconds))
+
+
+class VirtualUser:
+    def __init__(self, base_url, credentials, rng, recorder, name):
+        self.base_url = base_url.rstrip('/') + '/api/'
+        self.credentials = credentials
+        self.token = credentials['token']
+        self.rng = rng
+        self.recorder = recorder
+        self.name = name
+        self.session = requests.Session()
+        self.item_ids = []
+        self.fridge_ids = []
+        self.etag = None
+        self.created = 0
+
+    def request(self, route, path, **kwargs):
+        method = route.split()[0]
+        headers = {'Authorization': f'Token {self.token}'} if self.token else {}
+        headers.update(kwargs.pop('headers', {}))
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, headers=headers, timeout=30, **kwargs)
+        except requests.RequestException:
+            self.recorder.add(route, 'connection error', time.perf_counter() - started)
+            return None
+        self.recorder.add(route, response.status_code, time.perf_counter() - started)
+        return response
+
+    def step(self):
+        if self.token is None:
+            self.login()
+            return
+        labels = list(ROUTES)
+        label = self.rng.choices(labels, weights=[ROUTES[label][0] for label in labels])[0]
+        getattr(self, ROUTES[label][1])()
+
+    def unique(self, prefix):
+        self.created += 1
+        return f'{prefix}-{self.name}-{self.created}'
+
+    def ingredient(self):
+        return self.rng.choice(INGREDIENTS)
+
+    def login(self):
+        response = self.request('POST login', 'login/', json={
+            'email': self.credentials['email'], 'password': self.credentials['password'],
+        })
+        if response is not None and response.status_code == 200:
+            self.token = response.json()['token']
+
+    def register(self):
+        self.request('POST register', 'register/', json={
+            'email': self.unique('load') + '@example.com', 'password': 'load-password', 'name': 'Load',
+        })
+
+    def logout(self):
+        response = self.request('POST logout', 'logout/')
+        if response is not None and response.status_code == 200:
+            self.token = None
+            self.etag = None
+
+    def rotate_token(self):
+        response = self.request('POST rotate_token', 'token/rotate/')
+        if response is not None and response.status_code == 200:
+            self.token = response.json()['token']
+
+    def profile(self):
+        self.request('GET profile', 'profile/')
+
+    def view_fridge(self):
+        # Half the time a client revalidating its copy
+        headers = {'If-None-Match': self.etag} if self.etag and self.rng.random() < 0.5 else {}
+        response = self.request('GET fridge', 'fridge/', headers=headers)
+        if response is not None and response.status_code == 200:
+            self.etag = response.headers.get('ETag')
+            self.item_ids = [item['id'] for item in response.json()['items']]
+
+    def list_fridge_items(self):
+        response = self.request('GET list_fridge_items', 'fridge/items/', params={'limit': 20})
+        if response is not None and response.status_code == 200 and not self.item_ids:
+            self.item_ids = [item['id'] for item in response.json()['results']]
+
+    def add_fridge_item(self):
+        response = self.request('POST add_fridge_item', 'fridge/add/', json={
+            'name': self.ingredient(), 'quantity': self.rng.randint(1, 3),
+        })
+        if response is not None and response.status_code == 201 and response.json()['id'] not in self.item_ids:
+            self.item_ids.append(response.json()['id'])
+
+    def bulk_add_fridge_items(self):
+        items = [{'name': self.ingredient(), 'quantity': 1} for _ in range(5)]
+        self.request('POST bulk_add_fridge_items', 'fridge/bulk/', json={'items': items})
+
+    def update_fridge_item_quantity(self):
+        if not self.item_ids:
+            return self.view_fridge()
+        item_id = self.rng.choice(self.item_ids)
+        self.request('PATCH update_fridge_item_quantity', f'fridge/item/{item_id}/update/',
+                     json={'quantity': self.rng.randint(1, 12)})
+
+    def remove_fridge_item(self):
+        if not self.item_ids:
+            return self.view_fridge()
+        item_id = self.item_ids.pop(self.rng.randrange(len(self.item_ids)))
+        self.request('DELETE remove_fridge_item', f'fridge/item/{item_id}/remove/')
+
+    def clear_fridge(self):
+        response = self.request('DELETE clear_fridge', 'fridge/clear/')
+        if response is not None and response.status_code == 200:
+            self.item_ids = []
+
+    def list_fridges(self):
+        self.request('GET fridges', 'fridges/')
+
+    def create_fridge(self):
+        response = self.request('POST fridges', 'fridges/', json={'name': self.unique('Fridge')})
+        if response is not None and response.status_code == 201:
+            self.fridge_ids.append(response.json()['id'])
+
+    def all_fridges_inventory(self):
+        self.request('GET all_fridges_inventory', 'fridges/all/')
+
+    def fridge_detail(self):
+        if not self.fridge_ids:
+            return self.create_fridge()
+        self.request('GET fridge_detail', f'fridges/{self.rng.choice(self.fridge_ids)}/')
+
+    def delete_fridge(self):
+        if not self.fridge_ids:
+            return self.create_fridge()
+        fridge_id = self.fridge_ids.pop(self.rng.randrange(len(self.fridge_ids)))
+        self.request('DELETE fridge_detail', f'fridges/{fridge_id}/')
+
+    def add_item_to_fridge(self):
+        if not self.fridge_ids:
+            return self.create_fridge()
+        self.request('POST add_item_to_fridge', f'fridges/{self.rng.choice(self.fridge_ids)}/add/',
+                     json={'name': self.ingredient(), 'quantity': 1})
+
+    def find_recipes(self):
+        self.request('GET find_recipes_by_ingredients', 'recipes/find-by-ingredients/')
+
+    def find_recipes_async(self):
+        self.request('GET find_recipes_by_ingredients_async', 'recipes/find-by-ingredients/async/')
+
+
+def run_worker(index, base_url, users, concurrency, seconds, seed):
+    """
+    One worker process: `concurrency` virtual users until the deadline. Returns the samples and
+    the seconds they took (process start-up excluded).
+    """
+    recorder = Recorder()
+    started = time.perf_counter()
+    deadline = time.monotonic() + seconds
+
+    def run(number, credentials):
+        user = VirtualUser(base_url, credentials, random.Random(f'{seed}-{index}-{number}'), recorder,
+                           f'{seed}-{index}-{number}')
+        while time.monotonic() < deadline:
+            user.step()
+
+    threads = [
+        threading.Thread(target=run, args=(number, users[number % len(users)]))
+        for number in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.samples, time.perf_counter() - started
+
+
+def percentile(ordered, p):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    return ordered[max(0, -(-len(ordered) * p // 100) - 1)]
+
+
+def summarize(samples, elapsed):
+    def stats(group):
+        latencies = sorted(seconds for _, _, seconds in group)
+        statuses = {}
+        for _, status, _ in group:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        return {
+            'requests': len(group),
+            'rps': round(len(group) / elapsed, 1),
+            # Anything but 2xx/3xx (a 304 is a success)
+            'errors': sum(1 for _, status, _ in group if not isinstance(status, int) or status >= 400),
+            'statuses': dict(sorted(statuses.items())),
+            'latency_ms': {
+                **{f'p{p}': round(percentile(latencies, p) * 1e3, 2) for p in PERCENTILES},
+                'max': round(latencies[-1] * 1e3, 2),
+            },
+        }
+
+    routes = {}
+    for sample in samples:
+        routes.setdefault(sample[0], []).append(sample)
+    return {
+        **stats(samples),
+        'seconds': round(elapsed, 3),
+        'routes': {route: stats(routes[route]) for route in ROUTES if route in routes},
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def serve(host='127.0.0.1'):
+    """
+    Serve the WSGI app on Django's threaded server in a background thread; return (url, server).
+    """
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+
+    class QuietHandler(WSGIRequestHandler):
+        def setup(self):
+            super().setup()
+            # Headers and body go out in separate writes; don't let Nagle hold the body back
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadedWSGIServer((host, 0), QuietHandler)
+    server.set_app(get_wsgi_application())
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://{host}:{server.server_address[1]}', server
+
+
+def drive(base_url, users, args):
+    if len(users) < args.workers * args.concurrency:
+        print(f'note: {len(users)} users for {args.workers * args.concurrency} virtual users, '
+              f'some log in as the same user')
+    # Each worker gets its own users, so no two fight over the same fridge (unless there are too few)
+    slices = [users[index::args.workers] or users for index in range(args.workers)]
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(args.workers) as pool:
+        results = pool.starmap(run_worker, [
+            (index, base_url, slices[index], args.concurrency, args.seconds, args.seed)
+            for index in range(args.workers)
+        ])
+    elapsed = max(seconds for _, seconds in results)
+    return summarize([sample for samples, _ in results for sample in samples], elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=2, help='Load generator processes')
+    parser.add_argument('--concurrency', type=int, default=4, help='Virtual users per worker')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--users', type=int, default=20, help='Users to seed (in-process only)')
+    parser.add_argument('--items', type=int, default=25, help='Items per seeded fridge (in-process only)')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='Seconds the Spoonacular stub sleeps per call (in-process only)')
+    parser.add_argument('--upstream-error-rate', type=float, default=0.0,
+                        help='Fraction of stub calls that fail with 429/500/503 (in-process only)')
+    parser.add_argument('--url', help='Base URL of a running server instead of the in-process one')
+    parser.add_argument('--users-file', help='Credentials written by benchmarks.data (with --url)')
+    parser.add_argument('--output', help='Also write the JSON result here')
+    args = parser.parse_args()
+
+    config = {key: value for key, value in vars(args).items() if key != 'output'}
+    if args.url:
+        if not args.users_file:
+            parser.error('--url needs --users-file')
+        with open(args.users_file) as f:
+            users = json.load(f)
+        for key in ('users', 'items', 'latency', 'upstream_error_rate'):
+            config.pop(key)
+        result = drive(args.url, users, args)
+    else:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+        from django.conf import settings
+
+        from api.testing import StubSpoonacularServer
+
+        from . import setup_django
+        from .data import generate
+
+        with StubSpoonacularServer(latency=args.latency, error_rate=args.upstream_error_rate,
+                                   seed=args.seed) as stub:
+            db_path = setup_django(
+                ALLOWED_HOSTS=['127.0.0.1'],
+                SPOONACULAR={'BASE_URL': stub.url, 'MAX_RETRIES': 0,
+                             'POOL_MAXSIZE': args.workers * args.concurrency},
+                # Measure the server, not the Spoonacular budget
+                SPOONACULAR_QUOTA={'RATE': None, 'USER_RATE': None},
+                # The throttles would turn most logins into 429s
+                REST_FRAMEWORK={**settings.REST_FRAMEWORK,
+                                'DEFAULT_THROTTLE_RATES': {'password_ip': None, 'login_email': None}},
+            )
+            try:
+                users = generate(args.users, args.items, args.seed)
+                base_url, server = serve()
+                try:
+                    result = drive(base_url, users, args)
+                finally:
+                    server.shutdown()
+            finally:
+                os.remove(db_path)
+
+    output = json.dumps({'commit': git_commit(), 'config': config, **result}, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
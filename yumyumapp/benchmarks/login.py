@@ -0,0 +1,77 @@
+"""
+Logins per second per core through login_view, for each password hasher.
+
+Password hashing is CPU-bound and runs on one core per request, so a single
+process measures the throughput of one core; multiply by the worker count for
+a server. Argon2 is skipped unless argon2-cffi is installed.
+
+    python -m benchmarks.login --logins 20
+"""
+import argparse
+import importlib.util
+import json
+import os
+import time
+
+from . import setup_django
+
+HASHERS = {
+    'pbkdf2': 'api.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'api.hashers.ScryptPasswordHasher',
+    'argon2': 'api.hashers.Argon2PasswordHasher',
+}
+
+
+def measure(client, url, payloads):
+    started = time.perf_counter()
+    for payload in payloads:
+        response = client.post(url, payload, content_type='application/json')
+        assert response.status_code == 200, response.content
+    elapsed = time.perf_counter() - started
+    return {
+        'logins_per_sec': round(len(payloads) / elapsed, 2),
+        'ms_per_login': round(elapsed / len(payloads) * 1e3, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--logins', type=int, default=20, help='Logins measured per hasher')
+    args = parser.parse_args()
+
+    db_path = setup_django()
+    try:
+        from django.contrib.auth.hashers import make_password
+        from django.contrib.auth.models import User
+        from django.test import Client, override_settings
+        from django.urls import reverse
+
+        url = reverse('login')
+        client = Client()
+        payloads = [
+            json.dumps({'email': f'user{n % args.users}@example.com', 'password': 'benchmark-password'})
+            for n in range(args.logins)
+        ]
+        results = {'users': args.users, 'logins': args.logins}
+        for name, hasher in HASHERS.items():
+            if name == 'argon2' and importlib.util.find_spec('argon2') is None:
+                results[name] = 'skipped: argon2-cffi is not installed'
+                continue
+            with override_settings(PASSWORD_HASHERS=[hasher]):
+                User.objects.all().delete()
+                # Hashed once: every user gets the same hash, which is all a login checks
+                password = make_password('benchmark-password')
+                User.objects.bulk_create([
+                    User(username=f'user{n}', email=f'user{n}@example.com', password=password)
+                    for n in range(args.users)
+                ])
+                results[name] = measure(client, url, payloads)
+    finally:
+        os.remove(db_path)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Local recipe index search latency on a synthetic catalog.
+
+    python -m benchmarks.recipe_index --recipes 100000 --fridge 30
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+import django
+
+
+def synthetic_catalog(recipes, vocabulary, seed=1):
+    rng = random.Random(seed)
+    names = [f'ingredient {n}' for n in range(vocabulary)]
+    return [
+        {
+            'id': recipe_id,
+            'title': f'Recipe {recipe_id}',
+            'image': '',
+            'imageType': '',
+            'likes': rng.randint(0, 100),
+            'ingredients': [
+                {'id': 0, 'name': name, 'normalized_name': name, 'amount': None, 'unit': '', 'original': ''}
+                for name in rng.sample(names, rng.randint(3, 15))
+            ],
+        }
+        for recipe_id in range(recipes)
+    ], names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--recipes', type=int, default=100000)
+    parser.add_argument('--vocabulary', type=int, default=2000, help='Distinct ingredients in the catalog')
+    parser.add_argument('--fridge', type=int, default=30, help='Ingredients per search')
+    parser.add_argument('--searches', type=int, default=200)
+    args = parser.parse_args()
+
+    # The index itself does not touch the database, only its module imports need Django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    django.setup()
+    from api.recipe_index import RecipeIndex
+
+    recipes, names = synthetic_catalog(args.recipes, args.vocabulary)
+    started = time.perf_counter()
+    index = RecipeIndex(recipes)
+    build = time.perf_counter() - started
+
+    rng = random.Random(2)
+    fridges = [rng.sample(names, args.fridge) for _ in range(args.searches)]
+    results = {'recipes': args.recipes, 'fridge': args.fridge, 'build_seconds': round(build, 3)}
+    for ranking in (1, 2):
+        started = time.perf_counter()
+        for fridge in fridges:
+            index.search(fridge, ranking=ranking)
+        results[f'ranking{ranking}_us_per_search'] = round((time.perf_counter() - started) / len(fridges) * 1e6, 1)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Microbenchmarks of the fridge payload: FridgeSerializer + DRF's JSONRenderer
+versus api.serializers.fridge_data + FastJSONRenderer, split into
+serialization (database read included) and rendering.
+
+    python -m benchmarks.serializers --items 10 1000 100000
+"""
+import argparse
+import json
+import os
+import time
+
+from . import setup_django
+
+
+def best_of(repeat, function):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, nargs='+', default=[10, 1000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    db_path = setup_django()
+    try:
+        from django.contrib.auth.models import User
+        from rest_framework.renderers import JSONRenderer
+
+        from api.models import Fridge, FridgeItem
+        from api.renderers import FastJSONRenderer, orjson
+        from api.serializers import FridgeSerializer, fridge_data
+
+        results = []
+        for size in args.items:
+            user = User.objects.create_user(username=f'fridge-{size}')
+            fridge = Fridge.objects.create(user=user, name='Main Fridge')
+            FridgeItem.objects.bulk_create(
+                [FridgeItem(fridge=fridge, name=f'Item {n}', normalized_name=f'item {n}', quantity=n % 12 + 1)
+                 for n in range(size)],
+                batch_size=2000,
+            )
+            # Scale repetitions down for the big fridges
+            repeat = max(args.repeat * 100 // max(size // 100, 1), args.repeat)
+
+            old_serialize, old_data = best_of(repeat, lambda: FridgeSerializer(fridge).data)
+            new_serialize, new_data = best_of(repeat, lambda: fridge_data(fridge))
+            old_render, old_bytes = best_of(repeat, lambda: JSONRenderer().render(old_data))
+            new_render, new_bytes = best_of(repeat, lambda: FastJSONRenderer().render(new_data))
+            assert old_bytes == new_bytes
+
+            results.append({
+                'items': size,
+                'bytes': len(old_bytes),
+                'model_serializer_ms': round(old_serialize * 1e3, 3),
+                'values_list_ms': round(new_serialize * 1e3, 3),
+                'json_renderer_ms': round(old_render * 1e3, 3),
+                'fast_renderer_ms': round(new_render * 1e3, 3),
+                'speedup': round((old_serialize + old_render) / (new_serialize + new_render), 1),
+            })
+    finally:
+        os.remove(db_path)
+
+    print(json.dumps({'orjson': orjson is not None, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Write contention on one SQLite file from several processes, with SQLite's
+defaults (rollback journal, deferred transactions, a connection per request)
+versus the settings in backend/settings.py (WAL, IMMEDIATE transactions,
+busy_timeout, persistent connections; see api/db.py).
+
+Writers do what adding to a fridge does: read the fridge, upsert an item and
+bump the fridge version, in one transaction. Readers count fridge items.
+Reported per configuration: throughput and the rate of "database is locked"
+errors.
+
+    python -m benchmarks.sqlite_contention --writers 4 --readers 2 --seconds 5
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+from . import setup_django
+
+CONFIGS = {
+    # SQLite's own defaults, as the app ran before
+    'before': {
+        'database': {'CONN_MAX_AGE': 0, 'OPTIONS': {}},
+        'pragmas': {'journal_mode': 'delete', 'synchronous': 'full'},
+    },
+    # The settings' defaults
+    'after': {'database': {}, 'pragmas': None},
+}
+
+
+def worker(db_path, config, role, seconds, seed, results):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    import django
+    from django.conf import settings
+
+    settings.DATABASES['default'].update(CONFIGS[config]['database'], NAME=db_path)
+    if CONFIGS[config]['pragmas'] is not None:
+        settings.SQLITE_PRAGMAS = CONFIGS[config]['pragmas']
+    django.setup()
+
+    from django.db import OperationalError, close_old_connections, transaction
+    from django.db.models import F
+
+    from api.models import Fridge, FridgeItem
+
+    fridge_ids = list(Fridge.objects.values_list('pk', flat=True))
+    close_old_connections()
+    done = errors = 0
+    deadline = time.perf_counter() + seconds
+    n = seed
+    while time.perf_counter() < deadline:
+        n += 1
+        fridge_id = fridge_ids[n % len(fridge_ids)]
+        try:
+            if role == 'writer':
+                with transaction.atomic():
+                    Fridge.objects.filter(pk=fridge_id).values_list('version', flat=True).first()
+                    FridgeItem.objects.add_quantity(fridge_id, f'item {n % 50}', 1)
+                    Fridge.objects.filter(pk=fridge_id).update(version=F('version') + 1)
+            else:
+                FridgeItem.objects.filter(fridge_id=fridge_id).count()
+            done += 1
+        except OperationalError as error:
+            if 'locked' not in str(error):
+                raise
+            errors += 1
+        # End of "request": closes the connection unless CONN_MAX_AGE keeps it
+        close_old_connections()
+    results.put((role, done, errors))
+
+
+def run(config, writers, readers, seconds, fridges):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    from django.conf import settings
+
+    settings.DATABASES['default'].update(CONFIGS[config]['database'])
+    overrides = {} if CONFIGS[config]['pragmas'] is None else {'SQLITE_PRAGMAS': CONFIGS[config]['pragmas']}
+    db_path = setup_django(**overrides)
+    try:
+        from django.contrib.auth.models import User
+        from django.db import connections
+
+        from api.models import Fridge
+
+        users = User.objects.bulk_create([User(username=f'user{n}') for n in range(fridges)])
+        Fridge.objects.bulk_create([Fridge(user=user, name='Main Fridge') for user in users])
+        connections.close_all()
+
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(db_path, config, role, seconds, index * 1000, results))
+            for index, role in enumerate(['writer'] * writers + ['reader'] * readers)
+        ]
+        for process in processes:
+            process.start()
+        totals = {'writer': [0, 0], 'reader': [0, 0]}
+        for _ in processes:
+            role, done, errors = results.get()
+            totals[role][0] += done
+            totals[role][1] += errors
+        for process in processes:
+            process.join()
+    finally:
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+    report = {}
+    for role, (done, errors) in totals.items():
+        attempts = done + errors
+        report[role + 's'] = {
+            'ops_per_sec': round(done / seconds, 1),
+            'locked_errors': errors,
+            'locked_rate': round(errors / attempts, 4) if attempts else 0,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--fridges', type=int, default=20)
+    parser.add_argument('--config', choices=CONFIGS, help='Run one configuration (default: both)')
+    args = parser.parse_args()
+
+    if args.config:
+        print(json.dumps(run(args.config, args.writers, args.readers, args.seconds, args.fridges)))
+        return
+
+    # Each configuration needs its own settings, hence its own process
+    results = {'writers': args.writers, 'readers': args.readers, 'seconds': args.seconds}
+    for config in CONFIGS:
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.sqlite_contention', '--config', config, '--writers', str(args.writers),
+             '--readers', str(args.readers), '--seconds', str(args.seconds), '--fridges', str(args.fridges)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results[config] = json.loads(output)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Run the Spoonacular stub (api.testing.StubSpoonacularServer) on its own, for
+load tests against a real server:
+
+    python -m benchmarks.stub --port 8089 --latency 0.1 --error-rate 0.02
+
+then start the server with SPOONACULAR_BASE_URL=http://127.0.0.1:8089.
+"""
+import argparse
+import time
+
+from api.testing import StubSpoonacularServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.1, help='Seconds to sleep per call')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of calls that fail')
+    parser.add_argument('--error-statuses', default='429,500,503', help='Comma-separated statuses to fail with')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--daily-quota', type=float, default=None, help='Points per day, then 402')
+    args = parser.parse_args()
+
+    statuses = tuple(int(status) for status in args.error_statuses.split(','))
+    with StubSpoonacularServer(latency=args.latency, error_rate=args.error_rate, error_statuses=statuses,
+                               seed=args.seed, daily_quota=args.daily_quota, port=args.port) as stub:
+        print(f'Spoonacular stub on {stub.url} (Ctrl-C to stop)')
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Per-request cost of token authentication: DRF's TokenAuthentication (a
+token/user join per request) versus CachedTokenAuthentication, with the
+token served from the in-process tier and from the shared tier only.
+
+    python -m benchmarks.token_auth --users 1000 --requests 20000
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+from . import setup_django
+
+
+def measure(authenticator, requests):
+    from django.db import connection
+
+    queries = []
+
+    def count(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count):
+        started = time.perf_counter()
+        for request in requests:
+            authenticator.authenticate(request)
+        elapsed = time.perf_counter() - started
+    return {
+        'us_per_request': round(elapsed / len(requests) * 1e6, 2),
+        'queries_per_request': round(len(queries) / len(requests), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    db_path = setup_django()
+    try:
+        from django.contrib.auth.models import User
+        from rest_framework.authentication import TokenAuthentication
+        from rest_framework.authtoken.models import Token
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+
+        from api.authentication import CachedTokenAuthentication, token_cache
+
+        users = User.objects.bulk_create([User(username=f'user{n}') for n in range(args.users)])
+        keys = [Token.objects.create(user=user).key for user in users]
+        factory = APIRequestFactory()
+        rng = random.Random(1)
+        requests = [
+            Request(factory.get('/api/profile/', HTTP_AUTHORIZATION=f'Token {rng.choice(keys)}'))
+            for _ in range(args.requests)
+        ]
+
+        results = {'users': args.users, 'requests': args.requests}
+        results['token_authentication'] = measure(TokenAuthentication(), requests)
+
+        cached = CachedTokenAuthentication()
+        measure(cached, requests)  # warm both tiers
+        results['cached_local_tier'] = measure(cached, requests)
+
+        token_cache.local.maxsize = 0  # every lookup falls through to the shared tier
+        results['cached_shared_tier'] = measure(cached, requests)
+    finally:
+        os.remove(db_path)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()